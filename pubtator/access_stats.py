@@ -0,0 +1,146 @@
+# pubtator/access_stats.py
+"""
+Per-variant access and refresh bookkeeping for the auto-updater.
+
+The app records every look at a variant (variant page, article page,
+/result, the inference stream) under its canonical spelling: a hit count,
+first/last access time and a decayed score (each hit adds 1, the total
+halves every ACCESS_HALF_LIFE_DAYS), so "hot" means recently and
+repeatedly viewed.  The auto-updater logs each refresh here too, which
+gives it both the last refresh time of a variant and a host-wide count of
+refreshes in the last hour for its rate budget.
+
+Everything lives in one SQLite file (ACCESS_STATS_PATH, WAL mode), shared
+by all gunicorn workers and the scheduler.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from .config import ACCESS_STATS_PATH, ACCESS_HALF_LIFE_DAYS
+from .variant_norm import canonical_variant
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS access (
+    variant      TEXT PRIMARY KEY,
+    hits         INTEGER,
+    score        REAL,
+    first_access REAL,
+    last_access  REAL
+);
+CREATE TABLE IF NOT EXISTS refresh (
+    variant      TEXT PRIMARY KEY,
+    last_refresh REAL,
+    last_status  TEXT
+);
+CREATE TABLE IF NOT EXISTS refresh_log (
+    ts      REAL,
+    variant TEXT
+);
+CREATE INDEX IF NOT EXISTS refresh_log_ts ON refresh_log(ts);
+"""
+
+
+def decayed(score, since, now, half_life_days=ACCESS_HALF_LIFE_DAYS):
+    """score as of `now`, given it was `score` at time `since`."""
+    return score * 0.5 ** (max(0.0, now - since) / (half_life_days * 86400))
+
+
+class AccessStats:
+    def __init__(self, path=ACCESS_STATS_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ─── app side ──────────────────────────────────────────
+    def record(self, variant, now=None):
+        """Count one access to a variant (any spelling)."""
+        variant = canonical_variant(variant)
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT score, last_access FROM access WHERE variant = ?",
+                               (variant,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO access VALUES (?, 1, 1.0, ?, ?)", (variant, now, now))
+            else:
+                conn.execute("UPDATE access SET hits = hits + 1, score = ?, last_access = ? "
+                             "WHERE variant = ?", (decayed(row[0], row[1], now) + 1, now, variant))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ─── updater side ──────────────────────────────────────
+    def snapshot(self):
+        """({variant: access row}, {variant: refresh row}) as dicts."""
+        conn = self._conn()
+        access = {v: {"hits": h, "score": s, "first_access": f, "last_access": l}
+                  for v, h, s, f, l in conn.execute("SELECT * FROM access")}
+        refresh = {v: {"last_refresh": t, "last_status": st}
+                   for v, t, st in conn.execute("SELECT * FROM refresh")}
+        return access, refresh
+
+    def refreshes_since(self, ts):
+        return self._conn().execute("SELECT COUNT(*) FROM refresh_log WHERE ts >= ?",
+                                    (ts,)).fetchone()[0]
+
+    def claim_refresh(self, variant, due_before, max_per_hour, now=None):
+        """
+        Reserve one slot of the hourly budget for refreshing `variant`, unless
+        the budget is spent or another worker refreshed it since `due_before`.
+        Atomic across processes; returns True when the caller should refresh.
+        """
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            used = conn.execute("SELECT COUNT(*) FROM refresh_log WHERE ts >= ?",
+                                (now - 3600,)).fetchone()[0]
+            last = conn.execute("SELECT last_refresh FROM refresh WHERE variant = ?",
+                                (variant,)).fetchone()
+            if used >= max_per_hour or (last and last[0] and last[0] > due_before):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT INTO refresh_log VALUES (?, ?)", (now, variant))
+            conn.execute("INSERT OR REPLACE INTO refresh VALUES (?, ?, 'running')", (variant, now))
+            conn.execute("DELETE FROM refresh_log WHERE ts < ?", (now - 7 * 86400,))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finish_refresh(self, variant, status):
+        self._conn().execute("UPDATE refresh SET last_status = ? WHERE variant = ?",
+                             (status, variant))
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_access_stats():
+    """Process-wide AccessStats, opened on first use."""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = AccessStats()
+        return _stats
@@ -0,0 +1,212 @@
+# pubtator/admission.py
+"""
+Admission control for the heavy (BERT + LIME) endpoints.
+
+Each gate holds a fixed number of slots.  A request that cannot get a slot
+right away waits in a bounded queue for at most ``timeout`` seconds; if it
+still has no slot (or the queue is already full) the caller answers 503 with
+a Retry-After header instead of piling more work onto the GPU.
+
+Two backends are available:
+  * "thread" – a per-process BoundedSemaphore (dev server, waitress, threads)
+  * "file"   – slot lock files shared by every process on the host, so the
+               limit holds across all gunicorn workers (POSIX only)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows / waitress
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionTicket:
+    """A granted slot; ``release()`` is idempotent so it can be called from
+    both the generator ``finally`` and ``Response.call_on_close``."""
+
+    def __init__(self, gate, handle=None):
+        self._gate = gate
+        self._handle = handle
+        self._lock = threading.Lock()
+        self.released = False
+
+    def release(self):
+        with self._lock:
+            if self.released:
+                return
+            self.released = True
+        self._gate._release(self._handle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionGate:
+    def __init__(self, name, limit, timeout=30.0, max_queue=None,
+                 backend="thread", lock_dir=None, poll_interval=0.1):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.timeout = float(timeout)
+        # by default allow as many waiters as there are slots
+        self.max_queue = self.limit if max_queue is None else int(max_queue)
+        self.poll_interval = poll_interval
+
+        if backend == "file" and fcntl is None:
+            logger.warning(f"Admission gate '{name}': fcntl unavailable, "
+                           "falling back to per-process semaphore")
+            backend = "thread"
+        self.backend = backend
+
+        self._state_lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._rejected = 0
+
+        if self.backend == "thread":
+            self._sem = threading.BoundedSemaphore(self.limit)
+        else:
+            lock_dir = lock_dir or os.path.join("/tmp", "pubtator_admission")
+            os.makedirs(lock_dir, exist_ok=True)
+            self._slot_paths = [
+                os.path.join(lock_dir, f"{name}.{i}.lock")
+                for i in range(self.limit)
+            ]
+
+    # ─── public API ─────────────────────────────────────────
+    def acquire(self, timeout=None):
+        """
+        Wait up to ``timeout`` (default: gate timeout) for a slot.
+        Returns an AdmissionTicket, or None when the gate is full.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._state_lock:
+            if self._waiting >= self.max_queue and not self._has_free_slot():
+                self._rejected += 1
+                return None
+            self._waiting += 1
+        try:
+            handle = self._acquire_slot(timeout)
+        finally:
+            with self._state_lock:
+                self._waiting -= 1
+
+        if handle is None:
+            with self._state_lock:
+                self._rejected += 1
+            return None
+        with self._state_lock:
+            self._in_flight += 1
+        return AdmissionTicket(self, handle)
+
+    async def acquire_async(self, timeout=None):
+        """
+        acquire() for the asyncio server (pubtator.asgi): waiters poll for a
+        slot without holding a thread, so hundreds of queued streams cost
+        nothing but their sockets.  Same queue limit and ticket semantics.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._state_lock:
+            if self._waiting >= self.max_queue and not self._has_free_slot():
+                self._rejected += 1
+                return None
+            self._waiting += 1
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                handle = self._acquire_slot(0)
+                if handle is not None or time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            with self._state_lock:
+                self._waiting -= 1
+
+        if handle is None:
+            with self._state_lock:
+                self._rejected += 1
+            return None
+        with self._state_lock:
+            self._in_flight += 1
+        return AdmissionTicket(self, handle)
+
+    def acquire_background(self, poll_interval=1.0):
+        """
+        Block until a slot is free, for background work (API jobs).  Unlike
+        acquire() it takes no waiter slot, never counts as a rejection and
+        leaves free slots to queued requests first.
+        """
+        while True:
+            if self._waiting == 0:
+                handle = self._acquire_slot(0)
+                if handle is not None:
+                    with self._state_lock:
+                        self._in_flight += 1
+                    return AdmissionTicket(self, handle)
+            time.sleep(poll_interval)
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def stats(self):
+        with self._state_lock:
+            return {
+                "name":        self.name,
+                "backend":     self.backend,
+                "limit":       self.limit,
+                "in_flight":   self._in_flight,
+                "queue_depth": self._waiting,
+                "max_queue":   self.max_queue,
+                "rejected":    self._rejected,
+            }
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying."""
+        return max(1, int(round(self.timeout)))
+
+    # ─── backend details ────────────────────────────────────
+    def _has_free_slot(self):
+        # only meaningful for the per-process backend; the file backend
+        # always lets the caller try
+        if self.backend == "thread":
+            return self._in_flight < self.limit
+        return True
+
+    def _acquire_slot(self, timeout):
+        if self.backend == "thread":
+            return True if self._sem.acquire(timeout=timeout) else None
+
+        deadline = time.monotonic() + timeout
+        while True:
+            for path in self._slot_paths:
+                fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                return fd
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _release(self, handle):
+        with self._state_lock:
+            self._in_flight -= 1
+        if self.backend == "thread":
+            self._sem.release()
+        else:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            finally:
+                os.close(handle)
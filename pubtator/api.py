@@ -0,0 +1,433 @@
+# pubtator/api.py
+"""
+JSON batch API, for pipelines that used to scrape the HTML / SSE pages.
+
+    POST /api/classify
+    {
+      "variants":    ["c.68_69delAG", "c.5266dupC", ...],   # cached or fetched
+      "documents":   [{"id": "doc1", "paragraphs": ["...", ...]}, ...],
+      "mode":        "local-first",      # remote | local-first | offline (default SEARCH_MODE)
+      "explain":     false,              # add LIME HTML per PMID / document (slow)
+      "num_samples": 300, "adaptive": false,
+      "async":       null                # default: async above API_SYNC_MAX_ITEMS items or with explain
+    }
+
+Small requests are answered inline (200, under the inference admission
+gate).  Larger ones return 202 {"job_id", "poll"}; GET /api/jobs/<job_id>
+reports status and progress, and the result once "done".  Job state is a
+JSON file under API_JOB_DIR, so any gunicorn worker can answer the poll;
+the job itself runs in the worker that accepted it (API_JOB_WORKERS at a
+time, API_MAX_JOBS queued) and files expire after API_JOB_TTL_HOURS.
+Inline requests and running jobs both hold a slot of the inference
+admission gate, so jobs count against MAX_INFER_CONNS like the pages do;
+a job waits (status "queued") until a slot is free and no request is
+queued for it, without taking a waiter slot.
+
+A job deduplicates its work: variants are compared by canonical spelling,
+a PMID shared by several variants is fetched from PubTator once, and a
+PMID whose selected paragraphs are the same for several variants is
+classified once (its row lists all of them).  Variants are fetched
+API_FETCH_WORKERS at a time, and PMIDs and documents from all of them are
+classified together in batches of API_BATCH_SIZE.  The result:
+
+    {"variants":  [batch_classify.variant_summary rows + "pmids": [...]],
+     "pmids":     [{"pmid", "title", "variants", "n_paragraphs", "prediction", "probs"}],
+     "documents": [{"id", "n_paragraphs", "prediction", "probs"}]}
+
+with "lime_html" / "samples_used" on the PMID and document rows when
+explain is set.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from flask import Blueprint, request, jsonify, url_for
+
+from . import app as web
+from .config import (API_SYNC_MAX_ITEMS, API_MAX_ITEMS, API_MAX_NUM_SAMPLES, API_BATCH_SIZE,
+                     API_FETCH_WORKERS, API_JOB_WORKERS, API_MAX_JOBS, API_JOB_DIR, API_JOB_TTL_HOURS,
+                     DEFAULT_NUM_SAMPLES, LIME_ADAPTIVE, MODEL_WAIT_TIMEOUT)
+from .batch_classify import variant_summary
+from .paragraph_select import variant_paragraphs
+from .predict import InferenceDataset, classify_samples
+from .pub_inference import fetch_article
+from .variant_norm import canonical_variant
+from .gpu_memory import memory
+from .lime_interpret_sentences import highlight_lime_in_paragraphs
+
+logger = logging.getLogger(__name__)
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+# ─── request parsing ───────────────────────────────────────
+def _num_samples(value):
+    if value is None:
+        return DEFAULT_NUM_SAMPLES
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= API_MAX_NUM_SAMPLES:
+        raise ValueError(f"num_samples must be an integer from 1 to {API_MAX_NUM_SAMPLES}")
+    return value
+
+
+def parse_request(body):
+    """Validated job spec from the POST body; raises ValueError with a client-facing message."""
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    variants, seen = [], set()
+    for v in body.get("variants") or []:
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError("variants must be non-empty strings")
+        if canonical_variant(v.strip()) not in seen:
+            seen.add(canonical_variant(v.strip()))
+            variants.append(v.strip())
+
+    documents = []
+    for i, doc in enumerate(body.get("documents") or []):
+        if isinstance(doc, list):
+            doc = {"paragraphs": doc}
+        paras = doc.get("paragraphs") if isinstance(doc, dict) else None
+        if not isinstance(paras, list) or not all(isinstance(p, str) for p in paras):
+            raise ValueError(f"documents[{i}] must be a list of paragraphs "
+                             f"or {{\"id\": ..., \"paragraphs\": [...]}}")
+        paras = [p.strip() for p in paras if p.strip()]
+        if not paras:
+            raise ValueError(f"documents[{i}] has no text")
+        documents.append({"id": str(doc.get("id", i)), "paragraphs": paras})
+
+    n_items = len(variants) + len(documents)
+    if not n_items:
+        raise ValueError("Give at least one of variants / documents")
+    if n_items > API_MAX_ITEMS:
+        raise ValueError(f"At most {API_MAX_ITEMS} variants + documents per request")
+
+    mode = body.get("mode")
+    if mode is not None and mode not in web.SEARCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(web.SEARCH_MODES)}")
+
+    explain = bool(body.get("explain", False))
+    run_async = body.get("async")
+    if run_async is None:
+        run_async = explain or n_items > API_SYNC_MAX_ITEMS
+    elif not run_async and (explain or n_items > API_SYNC_MAX_ITEMS):
+        # inline runs hold an inference slot on the request thread
+        raise ValueError(f"async=false is only allowed without explain and for at most "
+                         f"{API_SYNC_MAX_ITEMS} variants + documents")
+    return {
+        "variants":    variants,
+        "documents":   documents,
+        "mode":        web._search_mode(mode),
+        "explain":     explain,
+        "num_samples": _num_samples(body.get("num_samples")),
+        "adaptive":    bool(body.get("adaptive", LIME_ADAPTIVE)),
+        "async":       bool(run_async),
+    }
+
+
+# ─── job execution ─────────────────────────────────────────
+class SharedFetch:
+    """fetch hook for iter_inference_for_variant: each PMID is fetched once per job."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def __call__(self, pmid):
+        with self._lock:
+            fut = self._futures.get(pmid)
+            owner = fut is None
+            if owner:
+                fut = self._futures[pmid] = Future()
+        if owner:
+            try:
+                fut.set_result(fetch_article(pmid))
+            except Exception as e:
+                fut.set_exception(e)
+        return fut.result()
+
+
+def _collect_variant(variant, mode, fetch):
+    """(articles seen, [(pmid, title, paras)], error) for one variant."""
+    config, _model, _id2label, _device, tokenizer = web._classifier()
+    articles, found = 0, []
+    try:
+        for kind, payload in web._iter_variant_articles(variant, mode, fetch=fetch):
+            if kind != "article":
+                continue
+            pmid, content = payload
+            articles += 1
+            paras = variant_paragraphs(content, variant, tokenizer, config)
+            if paras:
+                found.append((pmid, content.get("Title", "No Title").strip(), paras))
+        return articles, found, None
+    except Exception as e:
+        logger.exception(f"API fetch for {variant} failed")
+        return articles, found, f"{type(e).__name__}: {e}"
+
+
+class _Batcher:
+    """Collects (row, paras) across variants and documents; classifies them API_BATCH_SIZE at a time."""
+
+    def __init__(self):
+        self.config, self.model, self.id2label, self.device, self.tokenizer = web._classifier()
+        self.pending = []
+        self.classified = 0
+
+    def add(self, row, paras):
+        self.pending.append((row, paras))
+
+    def flush(self, full_only=False):
+        while self.pending and (len(self.pending) >= API_BATCH_SIZE or not full_only):
+            chunk, self.pending = self.pending[:API_BATCH_SIZE], self.pending[API_BATCH_SIZE:]
+            samples = InferenceDataset(
+                [paras for _row, paras in chunk], self.tokenizer,
+                max_length=self.config['data']['max_length'],
+                max_paragraphs=self.config['data']['max_paragraphs'],
+                stride=self.config['data'].get('stride', 128)
+            ).samples
+            probs = classify_samples(samples, self.model, self.device,
+                                     batch_size=len(samples)).tolist()
+            for (row, _paras), p in zip(chunk, probs):
+                row["prediction"] = self.id2label.get(max(range(len(p)), key=p.__getitem__), "Unknown")
+                row["probs"] = {self.id2label.get(i, str(i)): round(v, 6) for i, v in enumerate(p)}
+            self.classified += len(chunk)
+
+
+def _explain(row, paras, spec):
+    _config, model, _id2label, device, tokenizer = web._classifier()
+    stats = {}
+    try:
+        row["lime_html"] = highlight_lime_in_paragraphs(
+            paragraphs=paras, model=model, tokenizer=tokenizer,
+            class_names=["benign", "pathogenic"], device=device,
+            base_threshold=0.1, num_samples=spec["num_samples"],
+            adaptive=spec["adaptive"], stats=stats)
+        row["samples_used"] = stats.get("samples_used", 0)
+    except Exception as e:
+        row["lime_error"] = f"{type(e).__name__}: {e}"
+
+
+def run_classify(spec, progress=None):
+    """
+    Run one job spec (see parse_request) and return its result dict.
+    progress(payload) is called after each variant and each stage.
+    """
+    progress = progress or (lambda payload: None)
+    batcher = _Batcher()
+    fetch = SharedFetch()
+    pmid_rows = {}      # (pmid, paras) -> row, shared by the variants that select them
+    variant_keys = {}   # variant -> [(pmid, paras)]
+    ends = {}           # variant -> (articles, error)
+    work = []           # (row, paras) to explain
+
+    doc_rows = []
+    for doc in spec["documents"]:
+        row = {"id": doc["id"], "n_paragraphs": len(doc["paragraphs"])}
+        doc_rows.append(row)
+        batcher.add(row, doc["paragraphs"])
+        work.append((row, doc["paragraphs"]))
+
+    total = len(spec["variants"])
+    with ThreadPoolExecutor(max_workers=max(1, min(API_FETCH_WORKERS, total or 1)),
+                            thread_name_prefix="api-fetch") as pool:
+        futures = {pool.submit(_collect_variant, v, spec["mode"], fetch): v
+                   for v in spec["variants"]}
+        for fut in as_completed(futures):
+            variant = futures[fut]
+            articles, found, error = fut.result()
+            keys = variant_keys[variant] = []
+            for pmid, title, paras in found:
+                key = (pmid, tuple(paras))
+                row = pmid_rows.get(key)
+                if row is None:
+                    row = pmid_rows[key] = {"pmid": pmid, "title": title, "variants": [],
+                                            "n_paragraphs": len(paras)}
+                    batcher.add(row, paras)
+                    work.append((row, paras))
+                row["variants"].append(variant)
+                keys.append(key)
+            ends[variant] = (articles, error)
+            # classify full batches while the other variants are still fetching
+            batcher.flush(full_only=True)
+            progress({"stage": "fetch", "variants_done": len(ends), "variants_total": total,
+                      "unique_pmids": len(pmid_rows), "classified": batcher.classified})
+    batcher.flush()
+    progress({"stage": "classify", "variants_done": total, "variants_total": total,
+              "unique_pmids": len(pmid_rows), "classified": batcher.classified})
+
+    if spec["explain"]:
+        # same bounded pool as the SSE page, so API jobs can't starve it
+        futs = [web.lime_pool.submit(_explain, row, paras, spec) for row, paras in work]
+        for done, fut in enumerate(as_completed(futs), start=1):
+            fut.result()
+            progress({"stage": "explain", "explained": done, "to_explain": len(futs),
+                      "variants_done": total, "variants_total": total,
+                      "unique_pmids": len(pmid_rows), "classified": batcher.classified})
+
+    variants = []
+    for variant in spec["variants"]:
+        articles, error = ends[variant]
+        rows = [pmid_rows[key] for key in variant_keys[variant]]
+        summary = variant_summary(variant, articles, rows, error, batcher.id2label)
+        summary["pmids"] = [r["pmid"] for r in rows]
+        variants.append(summary)
+    return {"variants": variants, "pmids": list(pmid_rows.values()), "documents": doc_rows}
+
+
+# ─── job store ─────────────────────────────────────────────
+class JobStore:
+    """One JSON file per job under `root`, replaced atomically on every update."""
+
+    def __init__(self, root=API_JOB_DIR, ttl_hours=API_JOB_TTL_HOURS):
+        self.root = root
+        self.ttl = ttl_hours * 3600
+
+    def _path(self, job_id):
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def write(self, job):
+        os.makedirs(self.root, exist_ok=True)
+        job["updated"] = time.time()
+        tmp = self._path(job["job_id"]) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, self._path(job["job_id"]))
+
+    def read(self, job_id):
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def purge(self, now=None):
+        """Delete job files not updated within the TTL."""
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+jobs = JobStore()
+_job_pool = ThreadPoolExecutor(max_workers=API_JOB_WORKERS, thread_name_prefix="api-job")
+_active = 0
+_active_lock = threading.Lock()
+
+
+def _request_summary(spec):
+    return {"variants": len(spec["variants"]), "documents": len(spec["documents"]),
+            "mode": spec["mode"], "explain": spec["explain"]}
+
+
+def _run_job(job, spec):
+    global _active
+    last = [0.0]
+
+    def progress(payload):
+        # at most one file write per second while running
+        if time.monotonic() - last[0] >= 1.0:
+            last[0] = time.monotonic()
+            job["progress"] = payload
+            jobs.write(job)
+
+    ticket = None
+    try:
+        if not web.models.wait():
+            raise RuntimeError(f"models failed to load: {web.models.status()}")
+        # same admission limit as the inline path and the pages: wait for a slot
+        ticket = web.infer_gate.acquire_background()
+        job.update(status="running", started=time.time())
+        jobs.write(job)
+        job["result"] = run_classify(spec, progress)
+        job["status"] = "done"
+    except Exception as e:
+        logger.exception(f"API job {job['job_id']} failed")
+        job.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        if ticket is not None:
+            ticket.release()
+        job["finished"] = time.time()
+        jobs.write(job)
+        memory.request_done()
+        with _active_lock:
+            _active -= 1
+
+
+def submit_job(spec):
+    """Queue a job; returns its initial state, or None when API_MAX_JOBS are already active."""
+    global _active
+    with _active_lock:
+        if _active >= API_MAX_JOBS:
+            return None
+        _active += 1
+    jobs.purge()
+    job = {"job_id": uuid.uuid4().hex, "status": "queued", "created": time.time(),
+           "request": _request_summary(spec), "progress": None}
+    try:
+        jobs.write(job)
+        snapshot = dict(job)
+        _job_pool.submit(_run_job, job, spec)
+    except Exception:
+        with _active_lock:
+            _active -= 1
+        raise
+    return snapshot
+
+
+# ─── routes ────────────────────────────────────────────────
+@api_bp.route("/classify", methods=["POST"])
+def classify():
+    """Classify variants and/or raw paragraph sets, inline or as a polled job."""
+    try:
+        spec = parse_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if spec["async"]:
+        job = submit_job(spec)
+        if job is None:
+            return jsonify({"error": "Too many jobs queued, please retry later"}), 503, \
+                {"Retry-After": "30"}
+        poll = url_for("api.job_status", job_id=job["job_id"])
+        return jsonify({"job_id": job["job_id"], "status": job["status"], "poll": poll}), \
+            202, {"Location": poll}
+
+    if not web.models.wait(timeout=MODEL_WAIT_TIMEOUT):
+        return jsonify({"error": "Models are still loading"}), 503, web._not_ready_headers()
+    ticket = web.infer_gate.acquire()
+    if ticket is None:
+        return jsonify({"error": "Server busy"}), 503, web._busy_headers(web.infer_gate)
+    try:
+        result = run_classify(spec)
+    finally:
+        ticket.release()
+        memory.request_done()
+    return jsonify({"status": "done", "request": _request_summary(spec), "result": result})
+
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """State of an async job: queued / running (with progress) / done (with result) / error."""
+    job = jobs.read(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
@@ -2,20 +2,36 @@
 
 import json
 import os
+import hmac
 import logging
 import warnings
-import torch  # for clearing GPU cache
-from flask import Flask, render_template, request, redirect, url_for, Response, stream_with_context
-from apscheduler.schedulers.background import BackgroundScheduler
-
-from .config import FULLTEXT_DIR, PMID_LIST_FILE, Hours, Minutes
-from .pub_inference import do_inference_for_variant
-from .parser_utils import sanitize_filename
-from .file_utils import load_all_pmids
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import (Flask, render_template, request, redirect, url_for, Response,
+                   stream_with_context, jsonify, after_this_request, send_from_directory, abort,
+                   current_app)
+
+from .config import (FULLTEXT_DIR, PMID_LIST_FILE, Hours, Minutes, LIME_ADAPTIVE,
+                     MAX_INFER_CONNS, MAX_STREAM_CONNS, STREAM_WORKERS,
+                     STREAM_ORDERED, STREAM_CLASSIFY_BATCH, STREAM_MAX_PENDING, ADMISSION_BACKEND,
+                     ADMISSION_LOCK_DIR, ADMISSION_TIMEOUT, ADMISSION_MAX_QUEUE,
+                     MODEL_WAIT_TIMEOUT, PROFILE_DIR, LOCAL_INDEX, SEARCH_MODE,
+                     ADMIN_TOKEN, ADMIN_PUBLIC)
+from . import profiling
+from .admission import AdmissionGate
+from .model_loader import ModelLoader
+from .metrics import stage_timer, cache_result, render_metrics, ACTIVE_STREAMS
+from .pub_inference import do_inference_for_variant, iter_inference_for_variant, fetch_article
+from .paragraph_select import variant_paragraphs
+from .file_utils import load_all_pmids, load_variant_data, iter_variant_data
+from .variant_norm import canonical_variant, resolve_variant_file
+from .local_index import get_index, start_sync
 from .lime_interpret_sentences import highlight_lime_in_paragraphs
+from .sentence_seg import preload_segmentation, segmenter_id
 from .predict import setup_inference, predict_classification, ner_inference
-from .ner_entity import ner_bp
-from .auto_update import start_scheduler
+from .ner_entity import ner_bp, get_ner_pipe
+from .auto_update import start_scheduler, schedule_summary
+from .access_stats import get_access_stats
+from .gpu_memory import memory
 from transformers import BertTokenizer
 
 # suppress user warnings from transformers, etc.
@@ -25,32 +41,185 @@ warnings.filterwarnings("ignore", category=UserWarning)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# initialize Flask and register NER blueprint
-app = Flask(__name__)
-app.register_blueprint(ner_bp)  # mounts /ner_entity routes
+# models are loaded in the background by create_app(); nothing heavy
+# happens at import time
+models = ModelLoader()
+models.register(
+    "classifier",
+    lambda loader: setup_inference()
+)
+models.register(
+    "tokenizer",
+    lambda loader: BertTokenizer.from_pretrained(
+        loader.get("classifier")[0]['data']['tokenizer_name']
+    ),
+    # dummy classifier forward pass to prime kernels / the CUDA caching
+    # allocator; it runs here because it needs the tokenizer
+    warm_fn=lambda tok: predict_classification([["warm-up"]], *models.get("classifier")[:3],
+                                               tokenizer=tok)
+)
+# the NER pipeline only backs /ner_entity and the free-text page, so a
+# failure here does not make the whole worker unready
+models.register(
+    "ner",
+    lambda loader: get_ner_pipe(),
+    warm_fn=lambda pipe: pipe("BRCA1 c.68_69delAG"),
+    required=False
+)
+
+partial_tpl = None
+
+# admission control for the heavy BERT + LIME endpoints
+infer_gate = AdmissionGate("inference", MAX_INFER_CONNS,
+                           timeout=ADMISSION_TIMEOUT,
+                           max_queue=ADMISSION_MAX_QUEUE,
+                           backend=ADMISSION_BACKEND,
+                           lock_dir=ADMISSION_LOCK_DIR)
+stream_gate = AdmissionGate("stream", MAX_STREAM_CONNS,
+                            timeout=ADMISSION_TIMEOUT,
+                            max_queue=ADMISSION_MAX_QUEUE,
+                            backend=ADMISSION_BACKEND,
+                            lock_dir=ADMISSION_LOCK_DIR)
+
+# shared pool for per-PMID LIME work, so total LIME concurrency stays
+# bounded by STREAM_WORKERS no matter how many streams are open
+lime_pool = ThreadPoolExecutor(max_workers=STREAM_WORKERS,
+                               thread_name_prefix="lime")
+
+
+def _busy_headers(gate):
+    return {
+        "Retry-After":   str(gate.retry_after()),
+        "X-Queue-Depth": str(gate.queue_depth),
+    }
+
+
+def _classifier():
+    """(config, model, id2label, device, tokenizer) once the warm-up has loaded them."""
+    config, model, id2label, _, device = models.get("classifier")
+    return config, model, id2label, device, models.get("tokenizer")
+
+
+SEARCH_MODES = ("remote", "local-first", "offline")
+
+
+def _flag(values, default):
+    """
+    On/off request parameter: absent → default, else its last value
+    (forms send a hidden "0" before the checkbox so unchecking is seen).
+    """
+    if not values:
+        return default
+    return values[-1].lower() in ("1", "true", "yes", "on")
+
+
+def _search_mode(value):
+    """Per-request override of SEARCH_MODE ("remote" / "local-first" / "offline")."""
+    return value if value in SEARCH_MODES else SEARCH_MODE
+
+
+def _local_variant_data(variant):
+    """{pmid: content} from the local index ({} if disabled or no hits)."""
+    if not LOCAL_INDEX:
+        return {}
+    try:
+        return get_index().variant_data(variant)
+    except Exception:
+        logger.exception("Local index lookup failed")
+        return {}
+
+
+def _record_access(variant):
+    """Count a look at a variant for the refresh scheduler (never fails the request)."""
+    try:
+        get_access_stats().record(variant)
+    except Exception:
+        logger.exception("Failed to record variant access")
 
-# load classification model and tokenizer once at startup
-CONFIG, CLASS_MODEL, ID2LABEL, _, DEVICE = setup_inference()
-TOKENIZER = BertTokenizer.from_pretrained(CONFIG['data']['tokenizer_name'])
-partial_tpl = app.jinja_env.get_template("partial_results.html")
 
-# schedule daily auto-update of all cached variants
-scheduler = start_scheduler()
+def _not_ready_headers():
+    return {"Retry-After": str(max(1, int(round(MODEL_WAIT_TIMEOUT))))}
 
 
-@app.route("/")
 def index():
     """Home page: list all variants we've ever fetched."""
     variants = list(load_all_pmids(PMID_LIST_FILE).keys())
     return render_template("index.html", variants=variants)
 
 
-@app.route("/result", methods=["POST"])
+def healthz():
+    """Liveness: the process is up and serving (models may still be loading)."""
+    return jsonify({"status": "ok", "models": models.status()})
+
+
+def readyz():
+    """
+    Readiness: 200 once every required model is loaded and warmed up.
+    Also reports the sentence segmenter ("regex" = punkt data is missing).
+    """
+    ready = models.ready
+    return jsonify({"ready": ready, "models": models.status(),
+                    "sentence_segmenter": segmenter_id()}), (200 if ready else 503)
+
+
+def metrics():
+    """Prometheus text exposition of the stage / model / cache metrics."""
+    return render_metrics()
+
+
+def profile_file(trace_id, filename):
+    """Serve a file from a profile bundle to holders of PT_PROFILE_TOKEN."""
+    if not profiling.authorized(request):
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILE_DIR),
+                               os.path.join(trace_id, filename))
+
+
+def _admin_authorized():
+    """Admin routes are served with PT_ADMIN_PUBLIC=1, or to holders of PT_ADMIN_TOKEN."""
+    if ADMIN_PUBLIC:
+        return True
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token") or request.args.get("admin_token") or ""
+    # bytes: compare_digest rejects non-ASCII str
+    return hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def admission_status():
+    """Current slot usage and queue depth of each admission gate."""
+    if not _admin_authorized():
+        abort(404)
+    return jsonify({
+        "inference": infer_gate.stats(),
+        "stream":    stream_gate.stats(),
+    })
+
+
+def refresh_schedule():
+    """Auto-update queue: tiers, rate budget and the next variants to refresh."""
+    if not _admin_authorized():
+        abort(404)
+    limit = request.args.get("limit", 50, type=int)
+    return jsonify(schedule_summary(limit, current_app.extensions.get("scheduler")))
+
+
 def result():
     """Handle the basic 'Search Variant' form (no inference)."""
     variant = request.form.get("variant", "").strip()
+    mode = _search_mode(request.form.get("mode"))
     if not variant:
         return redirect(url_for("index"))
+    _record_access(variant)
+    if mode != "remote":
+        path = resolve_variant_file(FULLTEXT_DIR, variant)
+        data = load_variant_data(path) if path else _local_variant_data(variant)
+        cache_result("local_index", bool(data))
+        if data:
+            return render_template("result.html", variant=variant, variant_data=data)
+        if mode == "offline":
+            return render_template("result.html", variant=variant, variant_data=None,
+                                   error="No cached articles mention this variant (offline mode).")
     try:
         data, _ = do_inference_for_variant(
             variant,
@@ -67,44 +236,38 @@ def result():
                                variant_data=None, error=str(e))
 
 
-@app.route("/variant/<variant>")
 def variant_view(variant):
     """Show list of PMIDs & titles for a saved variant."""
     all_pmids = load_all_pmids(PMID_LIST_FILE)
-    if variant not in all_pmids:
+    if variant not in all_pmids and canonical_variant(variant) not in all_pmids:
         return render_template("index.html", alert="No data for this variant.",
                                variants=list(all_pmids.keys()))
-    san = sanitize_filename(variant)
-    path = os.path.join(FULLTEXT_DIR, f"{san}.json")
-    if not os.path.exists(path):
+    path = resolve_variant_file(FULLTEXT_DIR, variant)
+    if path is None:
         return render_template("index.html", alert="Data file missing.",
                                variants=list(all_pmids.keys()))
-    with open(path, encoding="utf-8") as f:
-        data = json.load(f)
+    _record_access(variant)
+    # 只留 pmid / title，不把整個全文檔留在記憶體
     articles = [{"pmid": pmid, "title": content.get("Title", "No Title")}
-                for pmid, content in data.items()]
+                for pmid, content in iter_variant_data(path)]
     return render_template("variant.html", variant=variant, articles=articles)
 
 
-@app.route("/article/<variant>/<pmid>")
 def article(variant, pmid):
     """Show the full text sections for a single PMID."""
-    san = sanitize_filename(variant)
-    path = os.path.join(FULLTEXT_DIR, f"{san}.json")
-    if not os.path.exists(path):
+    path = resolve_variant_file(FULLTEXT_DIR, variant)
+    if path is None:
         return render_template("index.html", alert="No data file.",
                                variants=list(load_all_pmids(PMID_LIST_FILE).keys()))
-    with open(path, encoding="utf-8") as f:
-        data = json.load(f)
-    content = data.get(pmid)
+    content = next((c for p, c in iter_variant_data(path) if p == pmid), None)
     if not content:
         return render_template("index.html", alert="PMID not found.",
                                variants=list(load_all_pmids(PMID_LIST_FILE).keys()))
+    _record_access(variant)
     return render_template("article.html", variant=variant,
                            pmid=pmid, content=content)
 
 
-@app.route("/inference_page", methods=["GET", "POST"])
 def inference_page():
     """Free‐text inference: NER paragraph extraction → classification → LIME explanation."""
     variants = list(load_all_pmids(PMID_LIST_FILE).keys())
@@ -112,6 +275,40 @@ def inference_page():
     if request.method == "POST":
         full_text   = request.form.get("inference_text", "").strip()
         num_samples = int(request.form.get("num_samples", 300) or 300)
+        adaptive    = _flag(request.form.getlist("adaptive"), LIME_ADAPTIVE)
+
+        if not models.wait(timeout=MODEL_WAIT_TIMEOUT):
+            return render_template(
+                "inference.html",
+                variants=variants,
+                error="The models are still loading, please try again shortly.",
+                inference_text=full_text,
+                num_samples=num_samples
+            ), 503, _not_ready_headers()
+        config, model, id2label, device, tokenizer = _classifier()
+
+        ticket = infer_gate.acquire()
+        if ticket is None:
+            logger.warning(f"Inference gate full (queue={infer_gate.queue_depth}), rejecting")
+            return render_template(
+                "inference.html",
+                variants=variants,
+                error="The server is busy, please try again shortly.",
+                inference_text=full_text,
+                num_samples=num_samples
+            ), 503, _busy_headers(infer_gate)
+
+        session = profiling.begin("inference_page", {"num_samples": num_samples,
+                                                     "adaptive": adaptive}) \
+            if profiling.requested(request) else None
+        if session is not None:
+            trace_url = url_for("profile_file", trace_id=session.trace_id,
+                                filename="meta.json")
+
+            @after_this_request
+            def _trace_header(resp):
+                resp.headers["X-Profile-Trace"] = trace_url
+                return resp
 
         try:
             # 1) 必填檢查
@@ -141,18 +338,22 @@ def inference_page():
             preview = "\n\n".join(focused)
 
             # 4) 分類預測
-            preds = predict_classification([focused], CONFIG, CLASS_MODEL, ID2LABEL)
+            preds = predict_classification([focused], config, model, id2label,
+                                           tokenizer=tokenizer)
             prediction = f"[Classification Result] Predicted: {preds[0]}" if preds else "[No prediction]"
 
             # 5) LIME 解释
+            lime_stats = {}
             lime_html = highlight_lime_in_paragraphs(
                 paragraphs=focused,
-                model=CLASS_MODEL,
-                tokenizer=TOKENIZER,
+                model=model,
+                tokenizer=tokenizer,
                 class_names=["benign", "pathogenic"],
-                device=DEVICE,
+                device=device,
                 base_threshold=0.1,
-                num_samples=num_samples
+                num_samples=num_samples,
+                adaptive=adaptive,
+                stats=lime_stats
             )
 
             return render_template(
@@ -162,137 +363,332 @@ def inference_page():
                 inference_text=full_text,
                 focused_preview=preview,
                 lime_html=lime_html,
+                lime_stats=lime_stats,
+                adaptive=adaptive,
                 num_samples=num_samples
             )
 
         finally:
-            # 確保釋放所有 CUDA cache，避免 GPU RAM 殘留
-            torch.cuda.empty_cache()
+            if session is not None:
+                profiling.end(session)
+            ticket.release()
+            # CUDA cache 保留給下一個 request，只在 GPU 記憶體吃緊時才釋放
+            memory.request_done()
 
     # GET 請求
     return render_template(
         "inference.html",
         variants=variants,
+        adaptive=LIME_ADAPTIVE,
         num_samples=300
     )
 
-@app.route("/search_inference", methods=["GET"])
 def search_inference():
     """Page with SSE-powered 'Query Variant + Inference' form."""
     variants = list(load_all_pmids(PMID_LIST_FILE).keys())
-    return render_template("search_inference.html", variants=variants)
+    return render_template("search_inference.html", variants=variants,
+                           adaptive=LIME_ADAPTIVE)
 
 
-@app.route("/search_inference_stream")
 def search_inference_stream():
     """
     SSE endpoint: for a given variant, fetch (or load cache),
     extract paragraphs, classify & LIME-highlight them one by one.
     """
-    variant = request.args.get("variant", "").strip()
-    num_samples = int(request.args.get("num_samples", 300) or 300)
+    params = _stream_params()
+    variant = params["variant"]
     if not variant:
         return Response(status=204)
+    _record_access(variant)
+
+    if not models.wait(timeout=MODEL_WAIT_TIMEOUT):
+        return Response("Models are still loading", status=503,
+                        headers=_not_ready_headers())
+
+    ticket = stream_gate.acquire()
+    if ticket is None:
+        logger.warning(f"Stream gate full (queue={stream_gate.queue_depth}), rejecting")
+        return Response("Server busy", status=503,
+                        headers=_busy_headers(stream_gate))
+    try:
+        profile = profiling.requested(request)
+        resp = _search_inference_stream(variant, params["num_samples"], params["ordered"],
+                                        params["adaptive"], ticket, profile, params["mode"])
+    except Exception:
+        ticket.release()
+        raise
+    # release the slot however the stream ends
+    resp.call_on_close(ticket.release)
+    return resp
 
-    san = sanitize_filename(variant)
-    json_path = os.path.join(FULLTEXT_DIR, f"{san}.json")
+
+def _stream_params():
+    """Query parameters of /search_inference_stream (also read by pubtator.asgi)."""
+    return {
+        "variant":     request.args.get("variant", "").strip(),
+        "num_samples": int(request.args.get("num_samples", 300) or 300),
+        "ordered":     _flag(request.args.getlist("ordered"), STREAM_ORDERED),
+        "adaptive":    _flag(request.args.getlist("adaptive"), LIME_ADAPTIVE),
+        "mode":        _search_mode(request.args.get("mode")),
+    }
+
+
+def _sse(payload):
+    return "data: " + json.dumps(payload) + "\n\n"
+
+
+def _iter_variant_articles(variant, mode="remote", fetch=fetch_article):
+    """
+    Yield ("progress", payload) and ("article", (pmid, content)) items:
+    from the local cache when present (read one article at a time), then
+    (local-first / offline) from the local index, otherwise while PubTator
+    is fetched (one PMID at a time with `fetch`, see iter_inference_for_variant).
+    """
+    data_path = resolve_variant_file(FULLTEXT_DIR, variant)
 
     # 1) Try local cache first
-    if os.path.exists(json_path):
-        logger.info(f"🔍 Cache hit, loading {json_path}")
-        with open(json_path, encoding="utf-8") as f:
-            variant_data = json.load(f)
-    else:
-        logger.info(f"🌐 Cache miss, fetching variant={variant}")
-        variant_data, _ = do_inference_for_variant(
-            variant,
-            base_output_dir=FULLTEXT_DIR,
-            pmid_list_file=PMID_LIST_FILE
-        )
-        # no results at all
-        if not variant_data:
-            def error_sse():
-                yield "data: " + json.dumps({
-                    "step":    "error",
-                    "message": "No PMID data found"
-                }) + "\n\n"
-            return Response(stream_with_context(error_sse()),
-                            mimetype="text/event-stream")
-
-    # 2) Extract only paragraphs containing the variant
-    extracted = []
-    for pmid, content in variant_data.items():
-        paras = []
-        for section, text in content.items():
-            if section.lower() in ("title", "pubmed_link"):
-                continue
-            for line in text.split("\n"):
-                if variant in line:
-                    paras.append(line.strip())
+    cache_result("fulltext", data_path is not None)
+    if data_path is not None:
+        logger.info(f"🔍 Cache hit, streaming {data_path}")
+        preload_segmentation(data_path)
+        yield "progress", {"cached": True, "done": 0, "total": None}
+        done = 0
+        for pmid, content in iter_variant_data(data_path):
+            done += 1
+            yield "article", (pmid, content)
+        yield "progress", {"cached": True, "done": done, "total": done}
+        return
+
+    # 2) articles cached under other variants that mention this one
+    if mode != "remote":
+        with stage_timer("local_index"):
+            variant_data = _local_variant_data(variant)
+        cache_result("local_index", bool(variant_data))
+        if variant_data or mode == "offline":
+            logger.info(f"📚 Local index: {len(variant_data)} PMIDs for {variant}")
+            yield "progress", {"cached": True, "source": "local_index",
+                               "done": len(variant_data), "total": len(variant_data)}
+            for pmid, content in variant_data.items():
+                yield "article", (pmid, content)
+            return
+
+    logger.info(f"🌐 Cache miss, fetching variant={variant}")
+    for event in iter_inference_for_variant(
+        variant,
+        base_output_dir=FULLTEXT_DIR,
+        pmid_list_file=PMID_LIST_FILE,
+        fetch=fetch
+    ):
+        if event["stage"] == "search":
+            yield "progress", {"cached": False, "done": 0,
+                               "total": event["total"]}
+        elif event["stage"] == "fetch":
+            yield "progress", {"cached": False, "done": event["done"],
+                               "total": event["total"], "pmid": event["pmid"]}
+            if event["article"]:
+                yield "article", (event["pmid"], event["article"])
+
+
+def _iter_stream_items(variant, mode="remote"):
+    """
+    _iter_variant_articles with the variant paragraphs selected:
+    ("progress", payload) and ("article", (pmid, paras, title)) items,
+    articles without a matching paragraph are skipped.
+    """
+    config, _model, _id2label, _device, tokenizer = _classifier()
+    for kind, payload in _iter_variant_articles(variant, mode):
+        if kind == "progress":
+            yield kind, payload
+            continue
+        pmid, content = payload
+        paras = variant_paragraphs(content, variant, tokenizer, config)
         if paras:
-            extracted.append((pmid, paras, content.get("Title", "No Title")))
-
-    # no matching paragraphs
-    if not extracted:
-        def nomatch_sse():
-            yield "data: " + json.dumps({
-                "step":    "error",
-                "message": "No PMID data found"
-            }) + "\n\n"
-        return Response(stream_with_context(nomatch_sse()),
-                        mimetype="text/event-stream")
-
-    # 3) Batch classify
-    all_paras = [paras for (_pmid, paras, _title) in extracted]
-    all_preds = predict_classification(all_paras,
-                                       CONFIG, CLASS_MODEL, ID2LABEL)
-
-    # 4) Stream LIME‐highlighted results one by one
+            yield "article", (pmid, paras, content.get("Title", "No Title"))
+
+
+def _classify_batch(batch):
+    """Classify [(pmid, paras, title)] together; returns [(pmid, prediction card html)]."""
+    config, model, id2label, _device, tokenizer = _classifier()
+    preds = predict_classification([paras for (_p, paras, _t) in batch],
+                                   config, model, id2label, tokenizer=tokenizer)
+    cards = []
+    for (pmid, _paras, title), pred in zip(batch, preds):
+        with stage_timer("render"):
+            html = str(partial_tpl.module.render_prediction({
+                "pmid":       pmid,
+                "title":      title,
+                "prediction": pred,
+                "pending":    True
+            }))
+        cards.append((pmid, html))
+    return cards
+
+
+def _explanation_payload(result):
+    """SSE payload for a finished _explain_pmid result."""
+    pmid, lime_stats, html = result
+    return {"step": "explanation", "pmid": pmid, "html": html,
+            "samples_used": lime_stats.get("samples_used", 0)}
+
+
+def _explain_pmid(pmid, paras, num_samples, adaptive):
+    """LIME-explain one PMID and render its explanation block (runs in lime_pool)."""
+    _config, model, _id2label, device, tokenizer = _classifier()
+    lime_stats = {}
+    lime_html = highlight_lime_in_paragraphs(
+        paragraphs=paras,
+        model=model,
+        tokenizer=tokenizer,
+        class_names=["benign", "pathogenic"],
+        device=device,
+        base_threshold=0.1,
+        num_samples=num_samples,
+        adaptive=adaptive,
+        stats=lime_stats
+    )
+    with stage_timer("render"):
+        html = str(partial_tpl.module.render_explanation(
+            {"pmid": pmid, "lime_html": lime_html, "lime_stats": lime_stats}
+        ))
+    return pmid, lime_stats, html
+
+
+def _search_inference_stream(variant, num_samples, ordered, adaptive, ticket,
+                             profile=False, mode="remote"):
+    """
+    Staged SSE protocol, every event is {"step": ...}:
+      fetch_progress → PMIDs downloaded/parsed (or the cache hit)
+      prediction     → one card per PMID as soon as its batch is classified
+      explanation    → LIME HTML for a PMID's card, filled in later
+      trace          → link to the profile bundle (profiled requests only)
+      done / error
+    """
+    trace_base = url_for("profile_file", trace_id="TRACE_ID", filename="meta.json")
+
     def generate():
         count = 0
+        # futures: LIME work whose explanation has not been sent yet
+        batch, futures = [], []
+        trace_id = None
+        ACTIVE_STREAMS.inc()
+        session = profiling.begin("search_inference_stream", {
+            "variant": variant, "num_samples": num_samples,
+            "ordered": ordered, "adaptive": adaptive, "mode": mode
+        }) if profile else None
+
+        def submit(*args):
+            if session is not None:
+                return lime_pool.submit(session.run, _explain_pmid, *args)
+            return lime_pool.submit(_explain_pmid, *args)
+
+        def classify(batch):
+            # 3) classify a batch and hand its PMIDs to the LIME pool
+            for (pmid, paras, _title), (_pmid, html) in zip(batch, _classify_batch(batch)):
+                futures.append(submit(pmid, paras, num_samples, adaptive))
+                yield _sse({"step": "prediction", "pmid": pmid, "html": html})
+
+        def explanation(fut):
+            payload = _explanation_payload(fut.result())
+            futures.remove(fut)
+            return _sse(payload)
+
+        def drain(limit):
+            # 4) send explanations until at most `limit` are outstanding: the
+            #    oldest first when ordered, else whichever finishes first
+            while len(futures) > limit:
+                fut = futures[0] if ordered else next(as_completed(futures))
+                yield explanation(fut)
+
         try:
-            for (pmid, paras, title), pred in zip(extracted, all_preds):
-                lime_html = highlight_lime_in_paragraphs(
-                    paragraphs=paras,
-                    model=CLASS_MODEL,
-                    tokenizer=TOKENIZER,
-                    class_names=["benign", "pathogenic"],
-                    device=DEVICE,
-                    base_threshold=0.1,
-                    num_samples=num_samples
-                )
-                fragment = partial_tpl.render(results=[{
-                    "pmid":       pmid,
-                    "title":      title,
-                    "prediction": pred,
-                    "lime_html":  lime_html
-                }])
-                count += 1
-                yield "data: " + json.dumps({
-                    "step":  "result",
-                    "count": count,
-                    "html":  fragment
-                }) + "\n\n"
+            # 1) + 2) fetch/load articles and extract variant paragraphs
+            for kind, payload in _iter_stream_items(variant, mode):
+                if kind == "progress":
+                    yield _sse({"step": "fetch_progress", **payload})
+                    continue
+                batch.append(payload)
+                if len(batch) >= STREAM_CLASSIFY_BATCH:
+                    count += len(batch)
+                    yield from classify(batch)
+                    batch = []
+                    # flush explanations that already finished
+                    if not ordered:
+                        for fut in [f for f in futures if f.done()]:
+                            yield explanation(fut)
+                    # backpressure: stop reading articles while LIME is behind
+                    yield from drain(STREAM_MAX_PENDING)
+            if batch:
+                count += len(batch)
+                yield from classify(batch)
+
+            # no matching paragraphs
+            if not count:
+                yield _sse({"step": "error", "message": "No PMID data found"})
+                return
+
+            # 4) remaining LIME explanations
+            yield from drain(0)
         except GeneratorExit:
             logger.info("⚠️ Client disconnected, stopping generation early")
+            return
         finally:
-            # always clear GPU cache on exit
-            torch.cuda.empty_cache()
-
+            # drop LIME work for PMIDs that were never sent
+            for fut in futures:
+                fut.cancel()
+            ACTIVE_STREAMS.dec()
+            if session is not None:
+                trace_id = profiling.end(session)
+            ticket.release()
+            # keep the allocator cache unless the GPU is under pressure
+            memory.request_done()
+
+        if trace_id:
+            yield _sse({"step": "trace", "trace_id": trace_id,
+                        "url": trace_base.replace("TRACE_ID", trace_id)})
         # done signal (if loop completes)
-        yield "data: " + json.dumps({
-            "step":  "done",
-            "total": count
-        }) + "\n\n"
+        yield _sse({"step": "done", "total": count})
 
     resp = Response(stream_with_context(generate()),
                     mimetype="text/event-stream")
-    # clear GPU also if client forcibly closes
-    resp.call_on_close(lambda: torch.cuda.empty_cache())
     return resp
 
 
+def create_app(start_background=True):
+    """
+    Build the Flask app.  Cheap routes are served immediately; the models
+    load (and warm up) in a background thread, tracked by /readyz.
+    """
+    global partial_tpl
+    app = Flask(__name__)
+    app.register_blueprint(ner_bp)  # mounts /ner_entity routes
+    from .api import api_bp          # imports this module, so not at the top
+    app.register_blueprint(api_bp)  # mounts /api/classify, /api/jobs/<id>
+    partial_tpl = app.jinja_env.get_template("partial_results.html")
+
+    app.add_url_rule("/", view_func=index)
+    app.add_url_rule("/healthz", view_func=healthz)
+    app.add_url_rule("/readyz", view_func=readyz)
+    app.add_url_rule("/metrics", view_func=metrics)
+    app.add_url_rule("/admission_status", view_func=admission_status)
+    app.add_url_rule("/refresh_schedule", view_func=refresh_schedule)
+    app.add_url_rule("/profiles/<trace_id>/<path:filename>", view_func=profile_file)
+    app.add_url_rule("/result", view_func=result, methods=["POST"])
+    app.add_url_rule("/variant/<variant>", view_func=variant_view)
+    app.add_url_rule("/article/<variant>/<pmid>", view_func=article)
+    app.add_url_rule("/inference_page", view_func=inference_page, methods=["GET", "POST"])
+    app.add_url_rule("/search_inference", view_func=search_inference, methods=["GET"])
+    app.add_url_rule("/search_inference_stream", view_func=search_inference_stream)
+
+    if start_background:
+        models.start()
+        # schedule daily auto-update of all cached variants
+        app.extensions["scheduler"] = start_scheduler()
+        if LOCAL_INDEX:
+            # pick up variant files written since the index was last synced
+            start_sync()
+    return app
+
+
 if __name__ == "__main__":
     # disable Flask reloader to avoid scheduler duplication
-    app.run(host="0.0.0.0", port=8080,
-            debug=False, use_reloader=False)
+    create_app().run(host="0.0.0.0", port=8080,
+                     debug=False, use_reloader=False)
@@ -0,0 +1,357 @@
+# pubtator/asgi.py
+"""
+ASGI front-end for the Flask app: long-lived SSE streams on an event loop.
+
+Under a sync gunicorn worker every /search_inference_stream occupies the
+worker for the whole stream, LIME included, so a handful of slow streams
+take index/article pages down with them.  AsgiApp serves the same app
+(same views, templates and storage) on asyncio instead:
+
+  * /search_inference_stream runs as a coroutine.  Waiting for a stream
+    slot, PubTator fetch steps, batch classification and LIME are awaited
+    on bounded pools (ASGI_FETCH_WORKERS, ASGI_MODEL_WORKERS, app.lime_pool),
+    so an idle or queued stream costs a socket, not a thread.  A
+    ": keepalive" comment goes out every SSE_HEARTBEAT seconds of silence
+    and a client disconnect cancels the stream's pending LIME work.
+  * every other route is the unchanged Flask view, run through a small WSGI
+    bridge: posts that run models or fetch (/inference_page, /result,
+    /ner_entity, /api/classify) on ASGI_HEAVY_WORKERS threads, everything else on
+    ASGI_PAGE_WORKERS, so heavy requests can't starve the cheap pages.
+
+Any ASGI server works, nothing beyond it is needed:
+
+    uvicorn run_app:asgi_app --host 0.0.0.0 --port 8080
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 run_app:asgi_app
+
+Profiled streams (PT_PROFILE_*) are left to the Flask view, whose
+ProfileSession follows the request thread.
+"""
+
+import io
+import sys
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+
+from . import app as web
+from . import profiling
+from .config import (SSE_HEARTBEAT, ASGI_PAGE_WORKERS, ASGI_HEAVY_WORKERS,
+                     ASGI_FETCH_WORKERS, ASGI_MODEL_WORKERS, MODEL_WAIT_TIMEOUT,
+                     STREAM_CLASSIFY_BATCH, STREAM_MAX_PENDING)
+from .metrics import ACTIVE_STREAMS
+from .gpu_memory import memory
+
+logger = logging.getLogger(__name__)
+
+HEAVY_POSTS = ("/inference_page", "/result", "/ner_entity", "/api/classify")
+KEEPALIVE = b": keepalive\n\n"
+
+
+def _environ(scope, body):
+    """PEP 3333 environ for an ASGI http scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD":    scope["method"],
+        "SCRIPT_NAME":       scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO":         scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING":      scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME":       server[0],
+        "SERVER_PORT":       str(server[1]),
+        "SERVER_PROTOCOL":   f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR":       client[0],
+        "wsgi.version":      (1, 0),
+        "wsgi.url_scheme":   scope.get("scheme", "http"),
+        "wsgi.input":        io.BytesIO(body),
+        "wsgi.errors":       sys.stderr,
+        "wsgi.multithread":  True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once":     False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = "HTTP_" + name
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    if body:
+        # the body is already buffered, chunked uploads included
+        environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _respond(send, status, body, headers=None):
+    raw = [(b"content-type", b"text/plain; charset=utf-8")]
+    raw += [(k.lower().encode("latin-1"), str(v).encode("latin-1"))
+            for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _models_ready(timeout):
+    """models.wait() without holding a thread: poll until ready, failed or timed out."""
+    deadline = time.monotonic() + timeout
+    while not web.models.ready:
+        failed = any(s["required"] and s["status"] == "failed"
+                     for s in web.models.status().values())
+        if failed or time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
+
+class AsgiApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.page_pool = ThreadPoolExecutor(ASGI_PAGE_WORKERS, thread_name_prefix="asgi-page")
+        self.heavy_pool = ThreadPoolExecutor(ASGI_HEAVY_WORKERS, thread_name_prefix="asgi-heavy")
+        self.fetch_pool = ThreadPoolExecutor(ASGI_FETCH_WORKERS, thread_name_prefix="asgi-fetch")
+        self.model_pool = ThreadPoolExecutor(ASGI_MODEL_WORKERS, thread_name_prefix="asgi-model")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        environ = _environ(scope, body)
+        if scope["path"] == "/search_inference_stream" and scope["method"] == "GET":
+            return await self._stream(environ, receive, send)
+        heavy = scope["method"] == "POST" and scope["path"].startswith(HEAVY_POSTS)
+        await self._wsgi(environ, send, self.heavy_pool if heavy else self.page_pool)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for pool in (self.page_pool, self.heavy_pool, self.fetch_pool, self.model_pool):
+                    pool.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ─── Flask views through WSGI ─────────────────────────────
+    async def _wsgi(self, environ, send, pool):
+        """
+        Run the Flask app for one request on `pool`.  The response is iterated
+        in that same thread (stream_with_context needs it) and its chunks are
+        handed to the loop through a queue.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def start_response(status, headers, exc_info=None):
+            put(("start", int(status.split(" ", 1)[0]),
+                 [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]))
+            return lambda data: put(("body", data))
+
+        def run():
+            try:
+                result = self.flask_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if chunk:
+                            put(("body", chunk))
+                        if stop.is_set():
+                            break
+                finally:
+                    if hasattr(result, "close"):
+                        result.close()
+            finally:
+                put(("end",))
+
+        job = loop.run_in_executor(pool, run)
+        started = False
+        try:
+            while True:
+                item = await queue.get()
+                if item[0] == "start":
+                    await send({"type": "http.response.start", "status": item[1],
+                                "headers": item[2]})
+                    started = True
+                elif item[0] == "body":
+                    await send({"type": "http.response.body", "body": item[1],
+                                "more_body": True})
+                else:
+                    break
+        finally:
+            stop.set()
+        try:
+            await job
+        except Exception:
+            logger.exception(f"WSGI request {environ['PATH_INFO']} failed")
+            if not started:
+                return await _respond(send, 500, b"Internal Server Error")
+        await send({"type": "http.response.body", "body": b""})
+
+    # ─── /search_inference_stream ──────────────────────────────
+    async def _stream(self, environ, receive, send):
+        with self.flask_app.request_context(environ):
+            params = web._stream_params()
+            profile = profiling.requested(request)
+        if profile or not params["variant"]:
+            return await self._wsgi(environ, send, self.heavy_pool)
+        await asyncio.get_running_loop().run_in_executor(
+            self.page_pool, web._record_access, params["variant"])
+
+        if not await _models_ready(MODEL_WAIT_TIMEOUT):
+            return await _respond(send, 503, b"Models are still loading",
+                                  web._not_ready_headers())
+        ticket = await web.stream_gate.acquire_async()
+        if ticket is None:
+            logger.warning(f"Stream gate full (queue={web.stream_gate.queue_depth}), rejecting")
+            return await _respond(send, 503, b"Server busy",
+                                  web._busy_headers(web.stream_gate))
+
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce(params, queue, ticket))
+        watcher = asyncio.create_task(_wait_disconnect(receive))
+        get = None
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+            ]})
+            while True:
+                if get is None:
+                    get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, watcher}, timeout=SSE_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if watcher in done:
+                    logger.info("⚠️ Client disconnected, stopping generation early")
+                    return
+                if get not in done:
+                    await send({"type": "http.response.body", "body": KEEPALIVE,
+                                "more_body": True})
+                    continue
+                event, get = get.result(), None
+                if event is None:
+                    break
+                await send({"type": "http.response.body", "body": event.encode("utf-8"),
+                            "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            for task in (get, watcher, producer):
+                if task is not None:
+                    task.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            ticket.release()
+
+    async def _produce(self, params, queue, ticket):
+        """
+        The staged SSE protocol of app._search_inference_stream, with each
+        blocking step awaited on a pool.  Puts SSE strings, then None.
+        """
+        loop = asyncio.get_running_loop()
+        variant, mode = params["variant"], params["mode"]
+        num_samples, adaptive = params["num_samples"], params["adaptive"]
+        items = web._iter_stream_items(variant, mode)
+        step = None
+        # futures: LIME work whose explanation has not been sent yet
+        count, batch, futures = 0, [], []
+
+        async def classify(batch):
+            cards = await loop.run_in_executor(self.model_pool, web._classify_batch, batch)
+            for (pmid, paras, _title), (_pmid, html) in zip(batch, cards):
+                futures.append(asyncio.wrap_future(web.lime_pool.submit(
+                    web._explain_pmid, pmid, paras, num_samples, adaptive)))
+                queue.put_nowait(web._sse({"step": "prediction", "pmid": pmid, "html": html}))
+
+        async def explanation(fut):
+            payload = web._explanation_payload(await fut)
+            futures.remove(fut)
+            queue.put_nowait(web._sse(payload))
+
+        async def drain(limit):
+            # oldest first when ordered, else whichever finishes first
+            while len(futures) > limit:
+                if params["ordered"]:
+                    fut = futures[0]
+                else:
+                    done, _ = await asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED)
+                    fut = next(f for f in futures if f in done)
+                await explanation(fut)
+
+        ACTIVE_STREAMS.inc()
+        try:
+            while True:
+                step = self.fetch_pool.submit(next, items, None)
+                item = await asyncio.wrap_future(step)
+                if item is None:
+                    break
+                kind, payload = item
+                if kind == "progress":
+                    queue.put_nowait(web._sse({"step": "fetch_progress", **payload}))
+                    continue
+                batch.append(payload)
+                if len(batch) >= STREAM_CLASSIFY_BATCH:
+                    count += len(batch)
+                    await classify(batch)
+                    batch = []
+                    if not params["ordered"]:
+                        for fut in [f for f in futures if f.done()]:
+                            await explanation(fut)
+                    # backpressure: stop reading articles while LIME is behind
+                    await drain(STREAM_MAX_PENDING)
+            if batch:
+                count += len(batch)
+                await classify(batch)
+
+            if not count:
+                queue.put_nowait(web._sse({"step": "error", "message": "No PMID data found"}))
+                return
+
+            await drain(0)
+            ticket.release()
+            queue.put_nowait(web._sse({"step": "done", "total": count}))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Stream for {variant} failed")
+        finally:
+            for fut in futures:
+                fut.cancel()
+            # a fetch step may still be running; close the generator after it
+            if step is None or step.done():
+                self.fetch_pool.submit(items.close)
+            else:
+                step.add_done_callback(lambda _f: self.fetch_pool.submit(items.close))
+            ACTIVE_STREAMS.dec()
+            ticket.release()
+            memory.request_done()
+            queue.put_nowait(None)
+
+
+def create_asgi_app(flask_app=None):
+    """Wrap a Flask app from app.create_app() (or a new one) for an ASGI server."""
+    return AsgiApp(flask_app if flask_app is not None else web.create_app())
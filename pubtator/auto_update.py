@@ -1,11 +1,20 @@
 import os
+import sys
 import json
+import math
+import time
 import logging
+import argparse
+from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
-from .config          import FULLTEXT_DIR, PMID_LIST_FILE, Hours, Minutes, DATA_DIR
+from .config          import (FULLTEXT_DIR, PMID_LIST_FILE, Hours, Minutes, DATA_DIR,
+                              REFRESH_HOT_DAYS, REFRESH_WARM_DAYS, REFRESH_HOT_INTERVAL,
+                              REFRESH_WARM_INTERVAL, REFRESH_COLD_INTERVAL,
+                              REFRESH_TICK_MINUTES, REFRESH_MAX_PER_HOUR)
 from .pub_inference   import do_inference_for_variant
-from .parser_utils    import sanitize_filename
 from .file_utils      import load_all_pmids
+from .variant_norm    import canonical_variant, resolve_variant_file
+from .access_stats    import get_access_stats, decayed
 
 logger = logging.getLogger(__name__)
 
@@ -14,10 +23,12 @@ CONFIG_PATH = os.path.join(DATA_DIR, "auto_update_config.json")
 
 def load_auto_config():
     """
-    Load auto-update settings from disk (enabled/hour/minute).
+    Load auto-update settings from disk (enabled/hour/minute/strategy).
     If missing, return defaults from config.py.
+    strategy: "adaptive" = refresh by access tier under a rate budget,
+              "daily"    = every variant at hour:minute (previous behaviour)
     """
-    defaults = {"enabled": True, "hour": Hours, "minute": Minutes}
+    defaults = {"enabled": True, "hour": Hours, "minute": Minutes, "strategy": "adaptive"}
     if os.path.exists(CONFIG_PATH):
         try:
             with open(CONFIG_PATH, "r") as f:
@@ -44,18 +55,16 @@ def auto_update_variants():
         return
 
     logger.info("🔄 Auto-update: scanning local full_text…")
-    try:
-        files = os.listdir(FULLTEXT_DIR)
-    except FileNotFoundError:
+    if not os.path.isdir(FULLTEXT_DIR):
         logger.warning(f"{FULLTEXT_DIR} does not exist, skipping auto-update")
         return
 
-    cached = { os.path.splitext(fn)[0] for fn in files if fn.endswith(".json") }
     all_pmids = load_all_pmids(PMID_LIST_FILE)
+    # equivalent spellings (p.Arg911X / p.Arg911Ter) are refreshed once
+    variants = list(dict.fromkeys(canonical_variant(v) for v in all_pmids))
 
-    for variant in all_pmids:
-        san = sanitize_filename(variant)
-        if san in cached:
+    for variant in variants:
+        if resolve_variant_file(FULLTEXT_DIR, variant) is not None:
             try:
                 logger.info(f"  ▶ updating {variant}")
                 do_inference_for_variant(
@@ -67,13 +76,153 @@ def auto_update_variants():
                 logger.exception(f"  ❌ failed to update {variant}")
     logger.info("🔄 Automatic Update: Complete")
 
+# ─── access-aware refresh ("adaptive") ─────────────────────
+TIERS = (
+    # (name, accessed within N days, refresh every N days)
+    ("hot",  REFRESH_HOT_DAYS,  REFRESH_HOT_INTERVAL),
+    ("warm", REFRESH_WARM_DAYS, REFRESH_WARM_INTERVAL),
+    ("cold", math.inf,          REFRESH_COLD_INTERVAL),
+)
+TIER_RANK = {name: i for i, (name, _d, _i) in enumerate(TIERS)}
+
+
+def _tier(last_access, now):
+    """(tier, interval days); never-viewed variants are cold."""
+    age_days = math.inf if last_access is None else (now - last_access) / 86400
+    for name, within, interval in TIERS:
+        if age_days <= within:
+            return name, interval
+    return TIERS[-1][0], TIERS[-1][2]
+
+
+def refresh_plan(now=None):
+    """
+    Every cached variant with its access tier, decayed score, last refresh
+    and next due time, in refresh order: due first, then hot before cold,
+    then by score.  A variant without a logged refresh counts from its
+    file's mtime; a failed refresh is retried at the hot interval.
+    """
+    now = time.time() if now is None else now
+    access, refresh = get_access_stats().snapshot()
+    variants = dict.fromkeys(canonical_variant(v) for v in load_all_pmids(PMID_LIST_FILE))
+    plan = []
+    for variant in variants:
+        path = resolve_variant_file(FULLTEXT_DIR, variant)
+        if path is None:
+            continue
+        a = access.get(variant)
+        r = refresh.get(variant, {})
+        tier, interval = _tier(a and a["last_access"], now)
+        if r.get("last_status") == "failed":
+            interval = min(interval, REFRESH_HOT_INTERVAL)
+        last_refresh = r.get("last_refresh") or os.path.getmtime(path)
+        next_due = last_refresh + interval * 86400
+        plan.append({
+            "variant":      variant,
+            "tier":         tier,
+            "hits":         a["hits"] if a else 0,
+            "score":        round(decayed(a["score"], a["last_access"], now), 3) if a else 0.0,
+            "last_access":  a["last_access"] if a else None,
+            "last_refresh": last_refresh,
+            "last_status":  r.get("last_status"),
+            "next_due":     next_due,
+            "due":          next_due <= now,
+        })
+    plan.sort(key=lambda e: (not e["due"], TIER_RANK[e["tier"]], -e["score"], e["next_due"]))
+    return plan
+
+
+def refresh_due_variants(now=None):
+    """
+    One scheduler tick: refresh the most urgent due variants, at most this
+    tick's share of REFRESH_MAX_PER_HOUR, and never more than the hourly
+    budget counted across all workers.
+    """
+    cfg = load_auto_config()
+    if not cfg["enabled"]:
+        return 0
+    now = time.time() if now is None else now
+    stats = get_access_stats()
+    per_tick = max(1, math.ceil(REFRESH_MAX_PER_HOUR * REFRESH_TICK_MINUTES / 60))
+    done = 0
+    for entry in refresh_plan(now):
+        if not entry["due"] or done >= per_tick:
+            break
+        if stats.refreshes_since(now - 3600) >= REFRESH_MAX_PER_HOUR:
+            logger.info("🔄 Refresh budget for this hour is used up")
+            break
+        variant = entry["variant"]
+        # another worker may have taken it since the plan was built
+        if not stats.claim_refresh(variant, entry["last_refresh"], REFRESH_MAX_PER_HOUR, now):
+            continue
+        try:
+            logger.info(f"  ▶ refreshing {variant} ({entry['tier']}, {entry['hits']} hits)")
+            do_inference_for_variant(
+                variant,
+                base_output_dir=FULLTEXT_DIR,
+                pmid_list_file=PMID_LIST_FILE
+            )
+            stats.finish_refresh(variant, "ok")
+        except Exception:
+            logger.exception(f"  ❌ failed to update {variant}")
+            stats.finish_refresh(variant, "failed")
+        done += 1
+    return done
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+def schedule_summary(limit=50, scheduler=None):
+    """What the updater will do next (for /refresh_schedule and the CLI)."""
+    cfg = load_auto_config()
+    now = time.time()
+    plan = refresh_plan(now)
+    job = scheduler.get_job("refresh_due_variants") if scheduler is not None else None
+    tiers = {name: {"variants": 0, "due": 0, "interval_days": interval}
+             for name, _d, interval in TIERS}
+    for e in plan:
+        tiers[e["tier"]]["variants"] += 1
+        tiers[e["tier"]]["due"] += e["due"]
+    return {
+        "enabled":   cfg["enabled"],
+        "strategy":  cfg["strategy"],
+        "next_tick": _iso(job.next_run_time.timestamp()) if job and job.next_run_time else None,
+        "budget": {
+            "max_per_hour":   REFRESH_MAX_PER_HOUR,
+            "tick_minutes":   REFRESH_TICK_MINUTES,
+            "used_last_hour": get_access_stats().refreshes_since(now - 3600),
+        },
+        "tiers": tiers,
+        "queue": [{**e, "last_access": _iso(e["last_access"]),
+                   "last_refresh": _iso(e["last_refresh"]), "next_due": _iso(e["next_due"])}
+                  for e in plan[:limit]],
+    }
+
+
 def start_scheduler():
     """
-    Configure and start the APScheduler job that runs
-    auto_update_variants daily at the configured time.
+    Configure and start the APScheduler job: with the "adaptive" strategy
+    refresh_due_variants every REFRESH_TICK_MINUTES, with "daily"
+    auto_update_variants at the configured time.
     """
     cfg = load_auto_config()
     scheduler = BackgroundScheduler(timezone="Asia/Taipei")
+    if cfg["strategy"] == "adaptive":
+        scheduler.add_job(
+            refresh_due_variants,
+            trigger="interval",
+            minutes=REFRESH_TICK_MINUTES,
+            id="refresh_due_variants",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.start()
+        logger.info(f"Scheduler started: access-aware refresh every {REFRESH_TICK_MINUTES} min, "
+                    f"≤{REFRESH_MAX_PER_HOUR}/hour (enabled={cfg['enabled']})")
+        return scheduler
     scheduler.add_job(
         auto_update_variants,
         trigger="cron",
@@ -86,3 +235,21 @@ def start_scheduler():
     scheduler.start()
     logger.info(f"Scheduler started: auto-update at {cfg['hour']:02d}:{cfg['minute']:02d} daily (enabled={cfg['enabled']})")
     return scheduler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Inspect / run the access-aware variant refresh")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_sched = sub.add_parser("schedule", help="print the refresh queue")
+    p_sched.add_argument("--limit", type=int, default=50)
+    sub.add_parser("tick", help="run one refresh tick now")
+    args = ap.parse_args(argv)
+    if args.cmd == "schedule":
+        print(json.dumps(schedule_summary(args.limit), indent=2, ensure_ascii=False))
+    else:
+        print(f"{refresh_due_variants()} variants refreshed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# pubtator/backends.py
+"""
+Runtimes for an exported classifier (see pubtator.export_model).
+
+setup_inference() serves the eager BioMedBERTClassifier unless the backend
+is switched, either with PT_CLASSIFIER_BACKEND or in the classifier config:
+
+    inference:
+      backend: onnx              # torch (default) | torchscript | onnx
+      onnx_path: ...             # default: best_model_path with .onnx
+      intra_op_threads: 0        # ONNX Runtime, 0 = one per physical core
+      inter_op_threads: 1
+      graph_optimization: all    # disable | basic | extended | all
+
+The wrappers keep the nn.Module calling convention used by
+predict.classify_samples and the LIME scorer, model(input_ids=[B, P, L],
+attention_mask=[B, P, L]) -> logits [B, C], so those run unchanged.
+ONNX Runtime is CPU-only here and optional, like the exporter's onnx
+package (pip install onnx onnxruntime); the onnx backend is untested, and
+any speedup over eager is device-dependent (see pubtator.export_model).  Exported models have no
+encode()/classify_pooled(), so the embedding cache is not used with them.
+"""
+
+import os
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+BACKENDS = ("torch", "torchscript", "onnx")
+ARTIFACT_SUFFIX = {"torchscript": ".torchscript.pt", "onnx": ".onnx"}
+
+
+def artifact_path(config, backend):
+    """Where the exported model lives: the config's <backend>_path, else next to best_model_path."""
+    path = config.get('inference', {}).get(f"{backend}_path")
+    if path:
+        return path
+    stem = os.path.splitext(config['paths']['best_model_path'])[0]
+    return stem + ARTIFACT_SUFFIX[backend]
+
+
+def model_device(model):
+    """Device the classifier takes its inputs on (eager module or exported backend)."""
+    device = getattr(model, "device", None)
+    return device if device is not None else next(model.parameters()).device
+
+
+class TorchScriptClassifier:
+    def __init__(self, path, device):
+        self.device = torch.device(device)
+        self.module = torch.jit.load(path, map_location=self.device).eval()
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask, token_type_ids=None):
+        return self.module(input_ids.to(self.device), attention_mask.to(self.device))
+
+
+class OnnxClassifier:
+    _OPT_LEVELS = {
+        "disable":  "ORT_DISABLE_ALL",
+        "basic":    "ORT_ENABLE_BASIC",
+        "extended": "ORT_ENABLE_EXTENDED",
+        "all":      "ORT_ENABLE_ALL",
+    }
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=1,
+                 graph_optimization="all"):
+        if ort is None:
+            raise RuntimeError("onnxruntime is required for the onnx backend "
+                               "(pip install onnxruntime)")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, self._OPT_LEVELS[graph_optimization])
+        opts.intra_op_num_threads = int(intra_op_threads)
+        opts.inter_op_num_threads = int(inter_op_threads)
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # LIME workers call in from several threads; idle intra-op threads
+        # should sleep instead of spinning on the cores the others need
+        opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.device = torch.device("cpu")
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask, token_type_ids=None):
+        (logits,) = self.session.run(["logits"], {
+            "input_ids":      input_ids.cpu().numpy().astype(np.int64),
+            "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+        })
+        return torch.from_numpy(logits)
+
+
+def load_backend(config, backend, device):
+    """The exported classifier for `backend` ("torchscript" / "onnx")."""
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Unknown classifier backend {backend!r}, expected one of {BACKENDS[1:]}")
+    path = artifact_path(config, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run python -m pubtator.export_model "
+                                f"export --format {backend}")
+    if backend == "torchscript":
+        return TorchScriptClassifier(path, device)
+    opts = config.get('inference', {})
+    return OnnxClassifier(path,
+                          intra_op_threads=opts.get('intra_op_threads', 0),
+                          inter_op_threads=opts.get('inter_op_threads', 1),
+                          graph_optimization=opts.get('graph_optimization', "all"))
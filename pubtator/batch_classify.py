@@ -0,0 +1,338 @@
+# pubtator/batch_classify.py
+"""
+Headless batch classification of a variant list (no Flask, no input()).
+
+The job is a pipeline; every stage runs in its own thread(s) and the stages
+are linked by bounded queues, so fetching, tokenizing, classifying and LIME
+overlap:
+
+  fetch     --fetch-workers threads: load the cached full text (any storage
+            format) or fetch it from PubTator, which also stores it, then
+            extract the variant paragraphs and tokenize them
+  classify  one thread: batches of --batch-size PMIDs, formed across
+            variants, so the model always sees full batches
+  lime      optional pool (--lime): highlight_lime_in_paragraphs per PMID
+  write     main thread: appends one row per PMID to pmids.jsonl and, once
+            all PMIDs of a variant are in, one row to variants.jsonl
+
+Both files are flushed line by line. After an interruption, rerun the same
+command: variants already in variants.jsonl are skipped, and PMID rows of
+unfinished or failed variants are dropped and redone.  --format parquet
+also writes pmids.parquet / variants.parquet at the end (needs pyarrow).
+
+    python -m pubtator.batch_classify variants.txt --output results/ \\
+        --batch-size 32 --fetch-workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from transformers import BertTokenizer
+
+from .config import (FULLTEXT_DIR, PMID_LIST_FILE, CLASSIFIER_CONFIG_YAML,
+                     DEFAULT_NUM_SAMPLES, LIME_ADAPTIVE)
+from .file_utils import ensure_dir_exists, load_variant_data
+from .variant_norm import canonical_variant, resolve_variant_file
+from .paragraph_select import variant_paragraphs
+from .pub_inference import iter_inference_for_variant
+from .predict import InferenceDataset, setup_inference, classify_samples
+from .lime_interpret_sentences import highlight_lime_in_paragraphs
+
+PMIDS_FILE    = "pmids.jsonl"
+VARIANTS_FILE = "variants.jsonl"
+
+
+def read_variant_list(path):
+    """
+    One variant per line; blank lines and # comments are skipped, and so are
+    later spellings of a variant already listed (canonical_variant).
+    """
+    variants, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and canonical_variant(line) not in seen:
+                seen.add(canonical_variant(line))
+                variants.append(line)
+    return variants
+
+
+def _read_jsonl(path):
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                pass  # line cut short by an interruption
+    return rows
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def resume_state(out_dir):
+    """
+    Keep finished variants (and their PMID rows), drop everything else;
+    returns the set of variants that need no more work.
+    """
+    var_path = os.path.join(out_dir, VARIANTS_FILE)
+    pmid_path = os.path.join(out_dir, PMIDS_FILE)
+    finished = [r for r in _read_jsonl(var_path) if r.get("status") != "error"]
+    done = {r["variant"] for r in finished}
+    _write_jsonl(var_path, finished)
+    _write_jsonl(pmid_path, [r for r in _read_jsonl(pmid_path) if r.get("variant") in done])
+    return done
+
+
+def variant_summary(variant, articles, rows, error, id2label):
+    """One variants.jsonl row: label counts, majority label and mean probs over the PMID rows."""
+    labels = [id2label[i] for i in sorted(id2label)]
+    counts = Counter(r["prediction"] for r in rows)
+    row = {
+        "variant":    variant,
+        "status":     "error" if error else ("ok" if rows else "no_data"),
+        "articles":   articles,
+        "pmids":      len(rows),
+        "labels":     {label: counts.get(label, 0) for label in labels},
+        "prediction": counts.most_common(1)[0][0] if rows else None,
+        "mean_probs": {label: round(sum(r["probs"][label] for r in rows) / len(rows), 6)
+                       for label in labels} if rows else None,
+    }
+    if error:
+        row["error"] = error
+    return row
+
+
+def iter_articles(variant, offline=False):
+    """(pmid, content) for a variant: from the store, else fetched from PubTator."""
+    path = resolve_variant_file(FULLTEXT_DIR, variant)
+    if path is not None:
+        yield from load_variant_data(path).items()
+        return
+    if offline:
+        raise FileNotFoundError(f"{variant} is not in {FULLTEXT_DIR} (--offline)")
+    for event in iter_inference_for_variant(variant, FULLTEXT_DIR, PMID_LIST_FILE):
+        if event["stage"] == "fetch" and event["article"]:
+            yield event["pmid"], event["article"]
+
+
+class BatchJob:
+    def __init__(self, config, model, id2label, device, tokenizer, args):
+        self.config = config
+        self.model = model
+        self.id2label = id2label
+        self.device = device
+        self.tokenizer = tokenizer
+        self.args = args
+        # fetch → classify carries tokenized PMIDs; bounded so fetchers can't run away
+        self.items = queue.Queue(maxsize=args.batch_size * 4)
+        # classify / lime / fetch → writer
+        self.results = queue.Queue()
+        self.lime_pool = ThreadPoolExecutor(args.lime_workers) if args.lime else None
+
+    # ─── fetch + parse + extract + tokenize ─────────────────
+    def _fetch_variant(self, variant):
+        articles, n_items = 0, 0
+        try:
+            for pmid, content in iter_articles(variant, self.args.offline):
+                articles += 1
+                paras = variant_paragraphs(content, variant, self.tokenizer, self.config)
+                if not paras:
+                    continue
+                sample = InferenceDataset(
+                    [paras], self.tokenizer,
+                    max_length=self.config['data']['max_length'],
+                    max_paragraphs=self.config['data']['max_paragraphs'],
+                    stride=self.config['data'].get('stride', 128)
+                ).samples[0]
+                self.items.put((variant, pmid, content.get("Title", "No Title").strip(), paras, sample))
+                n_items += 1
+            self.results.put(("variant_end", variant, articles, n_items, None))
+        except Exception as e:
+            self.results.put(("variant_end", variant, articles, n_items, f"{type(e).__name__}: {e}"))
+
+    def _fetcher(self, variants):
+        while True:
+            try:
+                variant = variants.get_nowait()
+            except queue.Empty:
+                return
+            self._fetch_variant(variant)
+
+    # ─── batched classification across variants ──────────────
+    def _classify(self, batch):
+        probs = classify_samples([b[4] for b in batch], self.model, self.device,
+                                 batch_size=len(batch)).tolist()
+        for (variant, pmid, title, paras, _sample), p in zip(batch, probs):
+            row = {
+                "variant":      variant,
+                "pmid":         pmid,
+                "title":        title,
+                "n_paragraphs": len(paras),
+                "prediction":   self.id2label.get(max(range(len(p)), key=p.__getitem__), "Unknown"),
+                "probs":        {self.id2label.get(i, str(i)): round(v, 6) for i, v in enumerate(p)},
+            }
+            if self.lime_pool is not None:
+                self.lime_pool.submit(self._explain, row, paras)
+            else:
+                self.results.put(("pmid", row))
+
+    def _explain(self, row, paras):
+        try:
+            row["lime_html"] = highlight_lime_in_paragraphs(
+                paragraphs=paras, model=self.model, tokenizer=self.tokenizer,
+                class_names=["benign", "pathogenic"], device=self.device,
+                base_threshold=0.1, num_samples=self.args.num_samples,
+                adaptive=self.args.adaptive)
+        except Exception as e:
+            row["lime_error"] = f"{type(e).__name__}: {e}"
+        self.results.put(("pmid", row))
+
+    def _classifier(self):
+        batch = []
+        try:
+            while True:
+                try:
+                    # wait briefly for a full batch, then run what we have
+                    item = self.items.get(timeout=self.args.max_wait if batch else None)
+                except queue.Empty:
+                    self._classify(batch)
+                    batch = []
+                    continue
+                if item is None:
+                    break
+                batch.append(item)
+                if len(batch) >= self.args.batch_size:
+                    self._classify(batch)
+                    batch = []
+            if batch:
+                self._classify(batch)
+        except Exception as e:
+            self.results.put(("fatal", e))
+
+    # ─── driver + writer ────────────────────────────────────
+    def _summary(self, variant, articles, rows, error):
+        return variant_summary(variant, articles, rows, error, self.id2label)
+
+    def run(self, variants, out_dir):
+        todo = queue.Queue()
+        for v in variants:
+            todo.put(v)
+        fetchers = [threading.Thread(target=self._fetcher, args=(todo,), daemon=True)
+                    for _ in range(max(1, min(self.args.fetch_workers, len(variants))))]
+        classifier = threading.Thread(target=self._classifier, daemon=True)
+        for t in fetchers + [classifier]:
+            t.start()
+
+        def close_items():
+            for t in fetchers:
+                t.join()
+            self.items.put(None)
+        threading.Thread(target=close_items, daemon=True).start()
+
+        pending = {}   # variant -> {"rows": [...], "end": (articles, n_items, error) or None}
+        finished, t0, n_pmids = 0, time.perf_counter(), 0
+        with open(os.path.join(out_dir, PMIDS_FILE), "a", encoding="utf-8") as pmid_f, \
+             open(os.path.join(out_dir, VARIANTS_FILE), "a", encoding="utf-8") as var_f:
+            while finished < len(variants):
+                msg = self.results.get()
+                if msg[0] == "fatal":
+                    raise msg[1]
+                if msg[0] == "pmid":
+                    row = msg[1]
+                    state = pending.setdefault(row["variant"], {"rows": [], "end": None})
+                    state["rows"].append(row)
+                    pmid_f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    pmid_f.flush()
+                    n_pmids += 1
+                    variant = row["variant"]
+                else:
+                    _kind, variant, articles, n_items, error = msg
+                    state = pending.setdefault(variant, {"rows": [], "end": None})
+                    state["end"] = (articles, n_items, error)
+
+                end = state["end"]
+                if end is None or len(state["rows"]) < end[1]:
+                    continue
+                summary = self._summary(variant, end[0], state["rows"], end[2])
+                var_f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+                var_f.flush()
+                del pending[variant]
+                finished += 1
+                rate = n_pmids / (time.perf_counter() - t0)
+                print(f"[{finished}/{len(variants)}] {variant}: {summary['status']} "
+                      f"pmids={summary['pmids']} prediction={summary['prediction']} "
+                      f"({rate:.1f} PMIDs/s)")
+
+        if self.lime_pool is not None:
+            self.lime_pool.shutdown(wait=True)
+
+
+def write_parquet(out_dir):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("--format parquet needs `pip install pyarrow`")
+    for name in (PMIDS_FILE, VARIANTS_FILE):
+        rows = _read_jsonl(os.path.join(out_dir, name))
+        keys = list(dict.fromkeys(k for r in rows for k in r))
+        table = pa.Table.from_pylist([{k: r.get(k) for k in keys} for r in rows])
+        path = os.path.join(out_dir, name.replace(".jsonl", ".parquet"))
+        pq.write_table(table, path)
+        print(f"Wrote {len(rows)} rows to {path}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch-classify a list of variants")
+    ap.add_argument("variants_file", help="text file, one variant per line")
+    ap.add_argument("--output", required=True, help="output directory")
+    ap.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    ap.add_argument("--config", default=CLASSIFIER_CONFIG_YAML, help="classifier config.yaml")
+    ap.add_argument("--batch-size", type=int, default=16, help="PMIDs per forward pass")
+    ap.add_argument("--max-wait", type=float, default=0.05,
+                    help="seconds to wait for a batch to fill before running it")
+    ap.add_argument("--fetch-workers", type=int, default=4)
+    ap.add_argument("--offline", action="store_true",
+                    help="only use the local full-text store, never call PubTator")
+    ap.add_argument("--lime", action="store_true", help="add LIME explanations (slow)")
+    ap.add_argument("--lime-workers", type=int, default=2)
+    ap.add_argument("--num-samples", type=int, default=DEFAULT_NUM_SAMPLES)
+    ap.add_argument("--adaptive", action="store_true", default=LIME_ADAPTIVE)
+    ap.add_argument("--restart", action="store_true", help="ignore earlier results in --output")
+    args = ap.parse_args(argv)
+
+    ensure_dir_exists(args.output)
+    if args.restart:
+        for name in (PMIDS_FILE, VARIANTS_FILE):
+            if os.path.exists(os.path.join(args.output, name)):
+                os.remove(os.path.join(args.output, name))
+    done = resume_state(args.output)
+    variants = [v for v in read_variant_list(args.variants_file) if v not in done]
+    print(f"{len(done)} variants already done, {len(variants)} to go")
+
+    if variants:
+        config, model, id2label, _, device = setup_inference(args.config)
+        tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+        BatchJob(config, model, id2label, device, tokenizer, args).run(variants, args.output)
+
+    if args.format == "parquet":
+        write_parquet(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# pubtator/benchmark.py
+"""
+Offline benchmark of the hot paths over the bundled PubTator3_data corpus.
+
+Each stage is timed on its own (warm-up run + N repeats):
+  parse_biocxml          synthetic BioC XML rebuilt from the stored articles
+  variant_json_load      reading the stored full-text files (any storage format)
+  paragraph_extraction   extract_variant_paragraphs (every mention line)
+  paragraph_selection    select_variant_paragraphs, as in search_inference_stream;
+                         the stages below run on its output (PT_PARA_SELECT=0:
+                         on every mention line, as before)
+  tokenization           InferenceDataset construction
+  predict_classification batched classification
+  lime                   highlight_lime_in_paragraphs
+  ner_highlight_html     NER highlighting on the extracted paragraphs
+
+By default a tiny randomly initialized BERT is built in a temp dir, so no
+network or GPU is needed; pass --config to time a real checkpoint instead.
+Results are written as JSON; --compare prints the speed-up against an
+earlier run.
+
+    python -m pubtator.benchmark --repeat 3 --output bench/before.json
+    python -m pubtator.benchmark --compare bench/before.json
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+import torch
+from transformers import BertTokenizer
+
+from .config import FULLTEXT_DIR, PARA_SELECT
+from .file_utils import load_variant_files, find_variant_file, load_variant_data
+from .parser_utils import parse_biocxml, extract_variant_paragraphs, build_biocxml
+from .paragraph_select import select_variant_paragraphs
+from .predict import InferenceDataset, setup_inference, predict_classification
+from .lime_interpret_sentences import highlight_lime_in_paragraphs
+from . import ner_entity
+from .tiny_model import build_tiny_checkpoint, build_tiny_ner_pipe
+
+
+def guess_variant(stem, data):
+    """
+    File names are sanitized (">" → "_"), so pick the spelling that matches
+    the most lines: the stem, with A_G → A>G, or just its last token.
+    """
+    fixed = re.sub(r"([A-Za-z])_([A-Za-z])", r"\1>\2", stem)
+    candidates = {stem, fixed, stem.split()[-1], fixed.split()[-1]}
+
+    def hits(v):
+        return sum(len(extract_variant_paragraphs(c, v)) for c in data.values())
+    return max(sorted(candidates), key=hits)
+
+
+def load_corpus(data_dir, max_variants=None):
+    corpus = []
+    for stem, data in load_variant_files(data_dir):
+        corpus.append((guess_variant(stem, data), find_variant_file(data_dir, stem), data))
+        if max_variants and len(corpus) >= max_variants:
+            break
+    return corpus
+
+
+def time_stage(fn, repeat, n_items):
+    """Run fn once to warm up, then `repeat` timed runs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    times.sort()
+    median = statistics.median(times)
+    return {
+        "repeat":        repeat,
+        "items":         n_items,
+        "min_s":         round(times[0], 6),
+        "median_s":      round(median, 6),
+        "mean_s":        round(statistics.fmean(times), 6),
+        "max_s":         round(times[-1], 6),
+        "p95_s":         round(times[min(len(times) - 1, int(0.95 * len(times)))], 6),
+        "items_per_s":   round(n_items / median, 3) if median > 0 else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    torch.manual_seed(args.seed)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    corpus = load_corpus(args.data_dir, args.max_variants)
+    articles = [(pmid, content) for _v, _p, data in corpus for pmid, content in data.items()]
+    xml_docs = [(pmid, build_biocxml(pmid, content)) for pmid, content in articles]
+    extracted = []
+    for variant, _path, data in corpus:
+        for pmid, content in data.items():
+            if extract_variant_paragraphs(content, variant):
+                extracted.append((variant, content))
+    extracted = extracted[:args.max_pmids]
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as restore:
+        if args.config:
+            config_path = args.config
+        else:
+            texts = [v for _pmid, c in articles for k, v in c.items() if k != "PubMed_Link" and v]
+            with contextlib.redirect_stdout(io.StringIO()):
+                config_path = build_tiny_checkpoint(tmp, texts, seed=args.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            config, model, id2label, _, device = setup_inference(config_path)
+        tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+        if args.config is None:
+            # stand-in for outputs/ner_weight (real pipeline is GPU-only);
+            # the process-wide pipeline is put back when the run ends
+            restore.callback(setattr, ner_entity, "_ner_pipe", ner_entity._ner_pipe)
+            ner_entity._ner_pipe = build_tiny_ner_pipe(config['data']['tokenizer_name'], seed=args.seed)
+
+        stages = {}
+        stages["parse_biocxml"] = time_stage(
+            lambda: [parse_biocxml(xml, pmid) for pmid, xml in xml_docs],
+            args.repeat, len(xml_docs))
+
+        stages["variant_json_load"] = time_stage(
+            lambda: [load_variant_data(path) for _v, path, _d in corpus],
+            args.repeat, len(corpus))
+
+        stages["paragraph_extraction"] = time_stage(
+            lambda: [extract_variant_paragraphs(c, v)
+                     for v, _p, data in corpus for c in data.values()],
+            args.repeat, len(articles))
+
+        stages["paragraph_selection"] = time_stage(
+            lambda: [select_variant_paragraphs(c, v, tokenizer, config) for v, c in extracted],
+            args.repeat, len(extracted))
+
+        select = select_variant_paragraphs if PARA_SELECT else \
+            (lambda c, v, _tok, _cfg: extract_variant_paragraphs(c, v))
+        paragraph_sets = [select(c, v, tokenizer, config) for v, c in extracted]
+        lime_sets = paragraph_sets[:args.lime_pmids]
+        ner_paras = [p for paras in lime_sets for p in paras]
+
+        stages["tokenization"] = time_stage(
+            lambda: InferenceDataset(paragraph_sets, tokenizer,
+                                     max_length=config['data']['max_length'],
+                                     max_paragraphs=config['data']['max_paragraphs'],
+                                     stride=config['data'].get('stride', 128)),
+            args.repeat, len(paragraph_sets))
+
+        stages["predict_classification"] = time_stage(
+            lambda: predict_classification(paragraph_sets, config, model, id2label,
+                                           tokenizer=tokenizer),
+            args.repeat, len(paragraph_sets))
+
+        stages["lime"] = time_stage(
+            lambda: [highlight_lime_in_paragraphs(
+                paragraphs=paras, model=model, tokenizer=tokenizer,
+                class_names=["benign", "pathogenic"], device=device,
+                base_threshold=0.1, num_samples=args.num_samples)
+                for paras in lime_sets],
+            args.repeat, len(lime_sets))
+
+        stages["ner_highlight_html"] = time_stage(
+            lambda: [ner_entity.ner_highlight_html(p) for p in ner_paras],
+            args.repeat, len(ner_paras))
+
+    return {
+        "meta": {
+            "commit":      _git_commit(),
+            "timestamp":   datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python":      platform.python_version(),
+            "torch":       torch.__version__,
+            "device":      str(device),
+            "threads":     torch.get_num_threads(),
+            "checkpoint":  args.config or "tiny-random",
+            "variants":    len(corpus),
+            "articles":    len(articles),
+            "pmids":       len(paragraph_sets),
+            "num_samples": args.num_samples,
+            "seed":        args.seed,
+        },
+        "stages": stages,
+    }
+
+
+def print_report(result, baseline=None):
+    base = (baseline or {}).get("stages", {})
+    print(f"{'stage':<24}{'items':>8}{'median s':>12}{'items/s':>12}"
+          + (f"{'baseline s':>12}{'speed-up':>10}" if base else ""))
+    for name, st in result["stages"].items():
+        line = f"{name:<24}{st['items']:>8}{st['median_s']:>12.4f}{(st['items_per_s'] or 0):>12.1f}"
+        if name in base:
+            old = base[name]["median_s"]
+            speedup = old / st["median_s"] if st["median_s"] else float("inf")
+            line += f"{old:>12.4f}{speedup:>9.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark pubtator hot paths offline")
+    ap.add_argument("--data-dir", default=FULLTEXT_DIR)
+    ap.add_argument("--config", default=None,
+                    help="classifier config.yaml (default: build a tiny random model)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-variants", type=int, default=None)
+    ap.add_argument("--max-pmids", type=int, default=64)
+    ap.add_argument("--lime-pmids", type=int, default=4)
+    ap.add_argument("--num-samples", type=int, default=50)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", default=None, help="write results JSON here")
+    ap.add_argument("--compare", default=None, help="baseline results JSON")
+    args = ap.parse_args(argv)
+
+    result = run_benchmarks(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
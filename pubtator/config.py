@@ -4,6 +4,24 @@ import os
 DATA_DIR        = os.getenv("PT_DATA_DIR", "PubTator3_data")
 PMID_LIST_FILE  = os.path.join(DATA_DIR, "pmid_list.json")
 FULLTEXT_DIR    = os.path.join(DATA_DIR, "full_text")
+# how new full-text files are written: "json" (legacy, indent=4),
+# "json-compact" (no indentation) or "msgpack.zst" (zstd-compressed msgpack).
+# Legacy .json files are always readable, whatever this is set to.
+STORAGE_FORMAT  = os.getenv("PT_STORAGE_FORMAT", "json")
+ZSTD_LEVEL      = int(os.getenv("PT_ZSTD_LEVEL", 10))
+
+# ─── Local full-text index (SQLite FTS5) ──────────────────
+LOCAL_INDEX_PATH = os.getenv("PT_LOCAL_INDEX_PATH", os.path.join(DATA_DIR, "local_index.sqlite"))
+# keep the index up to date at ingest / app start
+LOCAL_INDEX      = os.getenv("PT_LOCAL_INDEX", "1").lower() in ("1", "true", "yes")
+# "remote" | "local-first" | "offline" (see pubtator.local_index)
+SEARCH_MODE      = os.getenv("PT_SEARCH_MODE", "remote")
+
+# ─── PubTator3 API (point at pubtator.mock_pubtator for load tests) ─────
+PUBTATOR_API_BASE = os.getenv(
+    "PT_PUBTATOR_API_BASE",
+    "https://www.ncbi.nlm.nih.gov/research/pubtator3-api"
+).rstrip("/")
 
 # ─── Path ───────────────────────────────────────────────
 CLASSIFIER_CONFIG_YAML = os.getenv(
@@ -11,13 +29,114 @@ CLASSIFIER_CONFIG_YAML = os.getenv(
     "outputs/BioMedBERTClassifier_256_12_6/config.yaml"
 )
 
+# classifier runtime: "torch" | "torchscript" | "onnx" (see pubtator.backends);
+# empty = the "inference: backend:" key of the classifier config, else torch
+CLASSIFIER_BACKEND = os.getenv("PT_CLASSIFIER_BACKEND", "")
+
 # ─── LIME  ──────────────────────────────────────────────────
 DEFAULT_NUM_SAMPLES = int(os.getenv("PT_DEFAULT_NUM_SAMPLES", 300))
+# adaptive mode: sample in rounds, stop once sentence weights/colors settle
+LIME_ADAPTIVE             = os.getenv("PT_LIME_ADAPTIVE", "0").lower() in ("1", "true", "yes")
+LIME_ROUND_SIZE           = int(os.getenv("PT_LIME_ROUND_SIZE", 50))
+LIME_MIN_SAMPLES          = int(os.getenv("PT_LIME_MIN_SAMPLES", 100))
+LIME_SAMPLES_PER_SENTENCE = int(os.getenv("PT_LIME_SAMPLES_PER_SENTENCE", 40))
+LIME_WEIGHT_TOL           = float(os.getenv("PT_LIME_WEIGHT_TOL", 0.01))
+LIME_PATIENCE             = int(os.getenv("PT_LIME_PATIENCE", 2))
 
 # ─── Limitations ────────────────────────────────────────────
 MAX_INFER_CONNS  = int(os.getenv("PT_MAX_INFER_CONNS", 5))
 MAX_STREAM_CONNS = int(os.getenv("PT_MAX_STREAM_CONNS", 3))
 STREAM_WORKERS   = int(os.getenv("PT_STREAM_WORKERS", 4))
+# emit SSE results in document order (True) or as each PMID finishes (False)
+STREAM_ORDERED   = os.getenv("PT_STREAM_ORDERED", "0").lower() in ("1", "true", "yes")
+# PMIDs classified per batch before their "prediction" events go out
+STREAM_CLASSIFY_BATCH = int(os.getenv("PT_STREAM_CLASSIFY_BATCH", 8))
+# LIME explanations a stream may have queued / unsent before it stops
+# reading articles (keeps per-stream memory flat for large variants)
+STREAM_MAX_PENDING    = int(os.getenv("PT_STREAM_MAX_PENDING", 2 * STREAM_WORKERS))
+
+# ─── JSON batch API (pubtator.api) ───────────────────────────────────────
+# /api/classify requests with more than API_SYNC_MAX_ITEMS
+# variants + documents (or with explanations) become polled background jobs
+API_SYNC_MAX_ITEMS  = int(os.getenv("PT_API_SYNC_MAX_ITEMS", 5))
+API_MAX_ITEMS       = int(os.getenv("PT_API_MAX_ITEMS", 1000))
+API_MAX_NUM_SAMPLES = int(os.getenv("PT_API_MAX_NUM_SAMPLES", 5000))  # LIME samples per paragraph set
+API_BATCH_SIZE      = int(os.getenv("PT_API_BATCH_SIZE", 16))
+API_FETCH_WORKERS   = int(os.getenv("PT_API_FETCH_WORKERS", 4))
+API_JOB_WORKERS     = int(os.getenv("PT_API_JOB_WORKERS", 1))
+API_MAX_JOBS        = int(os.getenv("PT_API_MAX_JOBS", 20))        # queued + running per worker
+API_JOB_DIR         = os.getenv("PT_API_JOB_DIR", os.path.join(DATA_DIR, "api_jobs"))
+API_JOB_TTL_HOURS   = float(os.getenv("PT_API_JOB_TTL_HOURS", 24))
+
+# ─── ASGI serving (pubtator.asgi, e.g. uvicorn run_app:asgi_app) ─────────
+# seconds between ": keepalive" comments on an idle SSE stream
+SSE_HEARTBEAT       = float(os.getenv("PT_SSE_HEARTBEAT", 15))
+# thread pools behind the event loop: cheap pages, heavy form posts
+# (/inference_page, /result, NER), PubTator fetch steps, and batch classification
+ASGI_PAGE_WORKERS   = int(os.getenv("PT_ASGI_PAGE_WORKERS", 8))
+ASGI_HEAVY_WORKERS  = int(os.getenv("PT_ASGI_HEAVY_WORKERS", MAX_INFER_CONNS))
+ASGI_FETCH_WORKERS  = int(os.getenv("PT_ASGI_FETCH_WORKERS", 16))
+ASGI_MODEL_WORKERS  = int(os.getenv("PT_ASGI_MODEL_WORKERS", 1))
+
+# ─── GPU memory (pubtator.gpu_memory) ────────────────────
+# "" (fp32), "fp16" or "bf16": autocast for the classifier and LIME scoring
+GPU_AUTOCAST        = os.getenv("PT_GPU_AUTOCAST", "")
+# share of device memory never planned into a batch
+GPU_HEADROOM        = float(os.getenv("PT_GPU_HEADROOM", 0.10))
+# empty the allocator cache after a request only when the device is fuller than this
+GPU_PRESSURE        = float(os.getenv("PT_GPU_PRESSURE", 0.90))
+# ... or after this many seconds without GPU work (0 = never)
+GPU_IDLE_RELEASE    = float(os.getenv("PT_GPU_IDLE_RELEASE", 120))
+# starting estimate of activation memory per token, refined at run time
+GPU_BYTES_PER_TOKEN = int(os.getenv("PT_GPU_BYTES_PER_TOKEN", 64 * 1024))
+
+# ─── Admission control ─────────────────────────────────────
+# "thread" = per-process semaphore, "file" = host-wide lock files (gunicorn)
+ADMISSION_BACKEND   = os.getenv("PT_ADMISSION_BACKEND", "thread")
+ADMISSION_LOCK_DIR  = os.getenv("PT_ADMISSION_LOCK_DIR", os.path.join(DATA_DIR, ".admission"))
+ADMISSION_TIMEOUT   = float(os.getenv("PT_ADMISSION_TIMEOUT", 30))
+ADMISSION_MAX_QUEUE = int(os.getenv("PT_ADMISSION_MAX_QUEUE", 10))
+# how long a heavy request waits for the background model warm-up
+MODEL_WAIT_TIMEOUT  = float(os.getenv("PT_MODEL_WAIT_TIMEOUT", 30))
+
+# ─── Sentence segmentation ────────────────────────────────
+# local NLTK data (tokenizers/punkt_tab/...), never downloaded at runtime
+_NLTK_REL_PATH = os.getenv("PT_NLTK_DATA_DIR", "nltk_data")
+if os.path.isabs(_NLTK_REL_PATH):
+    NLTK_DATA_DIR = _NLTK_REL_PATH
+else:
+    NLTK_DATA_DIR = os.path.join(
+        os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+        _NLTK_REL_PATH
+    )
+SENT_CACHE_SIZE    = int(os.getenv("PT_SENT_CACHE_SIZE", 50000))
+# also write <variant>.sentences.json (punkt sentence offsets) next to each full-text file
+SENT_CACHE_PERSIST = os.getenv("PT_SENT_CACHE_PERSIST", "1").lower() in ("1", "true", "yes")
+
+# ─── Profiling (debug) ─────────────────────────────────────
+PROFILE_DIR   = os.getenv("PT_PROFILE_DIR", "profiles")
+PROFILE_ALL   = os.getenv("PT_PROFILE_ALL", "0").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.getenv("PT_PROFILE_TOKEN", "")   # empty = header switch disabled
+
+# ─── Admin endpoints (/admission_status, /refresh_schedule) ───
+# X-Admin-Token header or admin_token parameter; empty = endpoints disabled
+ADMIN_TOKEN  = os.getenv("PT_ADMIN_TOKEN", PROFILE_TOKEN)
+# serve them without a token (e.g. when only reachable from an internal network)
+ADMIN_PUBLIC = os.getenv("PT_ADMIN_PUBLIC", "0").lower() in ("1", "true", "yes")
+
+# ─── Paragraph embedding cache ─────────────────────────────
+# reuse BERT pooled vectors of paragraphs seen before (pubtator.embedding_cache)
+EMBED_CACHE      = os.getenv("PT_EMBED_CACHE", "0").lower() in ("1", "true", "yes")
+EMBED_CACHE_DIR  = os.getenv("PT_EMBED_CACHE_DIR", os.path.join(DATA_DIR, "embeddings"))
+# also cache LIME's perturbed texts (many repeats for short paragraphs, but
+# the store grows by ~num_samples vectors per explained PMID)
+EMBED_CACHE_LIME = os.getenv("PT_EMBED_CACHE_LIME", "0").lower() in ("1", "true", "yes")
+
+# ─── Paragraph selection (pubtator.paragraph_select) ─────────────
+# rank variant windows by section / proximity instead of taking the first ones
+PARA_SELECT       = os.getenv("PT_PARA_SELECT", "1").lower() in ("1", "true", "yes")
+# tokens per PMID across the kept windows; 0 = max_paragraphs * (max_length - 2)
+PARA_TOKEN_BUDGET = int(os.getenv("PT_PARA_TOKEN_BUDGET", 0))
 
 # ─── Sliding window  ───────────────────────────────────────
 WINDOW_SIZE = 512
@@ -34,4 +153,19 @@ else:
 
 # ─── Upadte time  ────────────────────────────────────────────────
 Hours = int(os.getenv("PT_UPDATE_HOURS", 22))
-Minutes = int(os.getenv("PT_UPDATE_MINUTES", 30))
\ No newline at end of file
+Minutes = int(os.getenv("PT_UPDATE_MINUTES", 30))
+
+# ─── Access-aware refresh (pubtator.auto_update, strategy "adaptive") ──────
+ACCESS_STATS_PATH     = os.getenv("PT_ACCESS_STATS_PATH", os.path.join(DATA_DIR, "access_stats.sqlite"))
+ACCESS_HALF_LIFE_DAYS = float(os.getenv("PT_ACCESS_HALF_LIFE_DAYS", 7))
+# tier by last access: within HOT_DAYS → hot, within WARM_DAYS → warm, else cold
+REFRESH_HOT_DAYS      = float(os.getenv("PT_REFRESH_HOT_DAYS", 7))
+REFRESH_WARM_DAYS     = float(os.getenv("PT_REFRESH_WARM_DAYS", 30))
+# refresh interval (days) of each tier
+REFRESH_HOT_INTERVAL  = float(os.getenv("PT_REFRESH_HOT_INTERVAL", 1))
+REFRESH_WARM_INTERVAL = float(os.getenv("PT_REFRESH_WARM_INTERVAL", 7))
+REFRESH_COLD_INTERVAL = float(os.getenv("PT_REFRESH_COLD_INTERVAL", 30))
+# the queue is worked off every TICK minutes, at most MAX_PER_HOUR variants
+# per hour across all workers
+REFRESH_TICK_MINUTES  = int(os.getenv("PT_REFRESH_TICK_MINUTES", 10))
+REFRESH_MAX_PER_HOUR  = int(os.getenv("PT_REFRESH_MAX_PER_HOUR", 20))
\ No newline at end of file
@@ -0,0 +1,122 @@
+# pubtator/convert_storage.py
+"""
+Convert the cached full-text store between storage formats, and measure
+what each format costs on disk and at load time.
+
+    # rewrite every variant file as zstd-compressed msgpack, drop the .json
+    python -m pubtator.convert_storage convert --to msgpack.zst --delete-old
+
+    # size / load-time table for every format (nothing is written to the store)
+    python -m pubtator.convert_storage bench --repeat 5
+
+Set PT_STORAGE_FORMAT to the same format afterwards so newly fetched
+variants are written that way too; legacy .json files stay readable.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+from .config import FULLTEXT_DIR, STORAGE_FORMAT
+from .file_utils import (STORAGE_FORMATS, variant_stem, find_variant_file,
+                         load_variant_data, save_variant_data)
+
+
+def _variant_paths(data_dir):
+    stems = {variant_stem(fn) for fn in os.listdir(data_dir)} - {None}
+    return [(stem, find_variant_file(data_dir, stem)) for stem in sorted(stems)]
+
+
+def convert(data_dir, fmt, delete_old=False):
+    """Rewrite every variant file in `fmt`; returns (converted, bytes_before, bytes_after)."""
+    converted, before, after = 0, 0, 0
+    for stem, src in _variant_paths(data_dir):
+        dst = os.path.join(data_dir, stem + STORAGE_FORMATS[fmt])
+        size_before = os.path.getsize(src)
+        save_variant_data(load_variant_data(src), dst, fmt=fmt)
+        size_after = os.path.getsize(dst)
+        if delete_old and src != dst:
+            os.remove(src)
+        converted += 1
+        before += size_before
+        after += size_after
+        print(f"{stem}: {size_before:,} → {size_after:,} bytes")
+    return converted, before, after
+
+
+def bench(data_dir, repeat=3):
+    """Write the corpus to a temp dir in every format; report size and load time."""
+    corpus = [(stem, load_variant_data(path)) for stem, path in _variant_paths(data_dir)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, ext in STORAGE_FORMATS.items():
+            fmt_dir = os.path.join(tmp, fmt)
+            os.makedirs(fmt_dir)
+            t0 = time.perf_counter()
+            for stem, data in corpus:
+                save_variant_data(data, os.path.join(fmt_dir, stem + ext), fmt=fmt)
+            write_s = time.perf_counter() - t0
+            paths = [os.path.join(fmt_dir, stem + ext) for stem, _ in corpus]
+            loads = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                for path in paths:
+                    load_variant_data(path)
+                loads.append(time.perf_counter() - t0)
+            results[fmt] = {
+                "bytes":         sum(os.path.getsize(p) for p in paths),
+                "write_s":       round(write_s, 4),
+                "load_median_s": round(statistics.median(loads), 4),
+                "load_min_s":    round(min(loads), 4),
+            }
+    return {"variants": len(corpus), "repeat": repeat, "formats": results}
+
+
+def print_bench(result):
+    base = result["formats"]["json"]
+    print(f"{result['variants']} variant files, load time = median of {result['repeat']}")
+    print(f"{'format':<14}{'bytes':>14}{'size':>8}{'write s':>10}{'load s':>10}{'speed-up':>10}")
+    for fmt, r in result["formats"].items():
+        ratio = r["bytes"] / base["bytes"] if base["bytes"] else 0
+        speedup = base["load_median_s"] / r["load_median_s"] if r["load_median_s"] else float("inf")
+        print(f"{fmt:<14}{r['bytes']:>14,}{ratio:>7.0%} {r['write_s']:>10.3f}"
+              f"{r['load_median_s']:>10.4f}{speedup:>9.2f}x")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert / benchmark the full-text storage format")
+    ap.add_argument("--data-dir", default=FULLTEXT_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_conv = sub.add_parser("convert", help="rewrite the store in another format")
+    p_conv.add_argument("--to", choices=sorted(STORAGE_FORMATS), default=STORAGE_FORMAT)
+    p_conv.add_argument("--delete-old", action="store_true",
+                        help="remove the source file once its converted copy is written")
+
+    p_bench = sub.add_parser("bench", help="compare size and load time of every format")
+    p_bench.add_argument("--repeat", type=int, default=3)
+    p_bench.add_argument("--output", default=None, help="write results JSON here")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        n, before, after = convert(args.data_dir, args.to, args.delete_old)
+        ratio = after / before if before else 0
+        print(f"Converted {n} files to {args.to}: {before:,} → {after:,} bytes ({ratio:.0%})")
+        if args.to != STORAGE_FORMAT:
+            print(f"Set PT_STORAGE_FORMAT={args.to} so new variants are stored the same way.")
+        return 0
+
+    result = bench(args.data_dir, args.repeat)
+    print_bench(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# pubtator/embedding_cache.py
+"""
+Persistent cache of BERT paragraph embeddings (pooler_output).
+
+Nearly all of BioMedBERTClassifier's cost is self.bert encoding each
+paragraph; the transformer aggregator and the linear head are cheap.  The
+same paragraphs are encoded again on every search, auto-update and LIME
+baseline, so their pooled vectors are kept on disk and only the
+aggregator + head (model.classify_pooled) run for known paragraphs.
+
+Layout, one directory per checkpoint fingerprint (sha1 of the weights file
+plus tokenizer / max_length), so a retrained model never sees stale vectors:
+
+  EMBED_CACHE_DIR/<fingerprint>/vectors.f16   row i = float16[hidden_size]
+  EMBED_CACHE_DIR/<fingerprint>/keys.bin      row i = 16-byte key
+
+The key is blake2b of the paragraph's non-padding token IDs, so the fixed
+max_length padding of InferenceDataset and LIME's dynamic padding share
+entries.  Both files are append-only; writers hold an flock and append in
+lockstep, readers memory-map vectors.f16 and pick up rows appended by
+other processes on their next miss.  Vectors are stored (and always
+served, hit or miss) in float16, so results don't depend on cache state.
+Without fcntl (Windows / waitress) the cache is not attached.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+
+import numpy as np
+import torch
+
+from .config import EMBED_CACHE_DIR
+from .metrics import CACHE
+
+try:
+    import fcntl
+except ImportError:  # Windows / waitress
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+
+
+def paragraph_key(input_ids, attention_mask):
+    """Cache key of one tokenized paragraph (1-D tensors)."""
+    n = int(attention_mask.sum())
+    ids = input_ids[:n].to("cpu", torch.int32).numpy()
+    return hashlib.blake2b(ids.tobytes(), digest_size=KEY_BYTES).digest()
+
+
+def checkpoint_fingerprint(config):
+    """sha1 over the weights file and the tokenization settings."""
+    h = hashlib.sha1()
+    with open(config['paths']['best_model_path'], "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(str(config['data'].get('tokenizer_name')).encode())
+    h.update(str(config['data'].get('max_length')).encode())
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, fingerprint, dim, root=EMBED_CACHE_DIR):
+        self.dim = dim
+        self.dir = os.path.join(root, fingerprint[:16])
+        os.makedirs(self.dir, exist_ok=True)
+        self.vec_path = os.path.join(self.dir, "vectors.f16")
+        self.key_path = os.path.join(self.dir, "keys.bin")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self._rows = {}
+        self._keys_read = 0
+        self._mm = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._refresh()
+        logger.info(f"Embedding cache {self.dir}: {len(self._rows)} paragraphs")
+
+    def _refresh(self):
+        """Read key records appended since the last look (by any process)."""
+        if not os.path.exists(self.key_path):
+            return
+        size = os.path.getsize(self.key_path) // KEY_BYTES * KEY_BYTES
+        if size <= self._keys_read:
+            return
+        with open(self.key_path, "rb") as f:
+            f.seek(self._keys_read)
+            buf = f.read(size - self._keys_read)
+        row = self._keys_read // KEY_BYTES
+        for i in range(0, len(buf), KEY_BYTES):
+            self._rows.setdefault(buf[i:i + KEY_BYTES], row)
+            row += 1
+        self._keys_read = size
+        self._mm = None  # remap to cover the new rows
+
+    def _vectors(self):
+        if self._mm is None:
+            n = self._keys_read // KEY_BYTES
+            self._mm = np.memmap(self.vec_path, dtype=np.float16, mode="r",
+                                 shape=(n, self.dim)) if n else np.zeros((0, self.dim), np.float16)
+        return self._mm
+
+    def get_many(self, keys):
+        """(float16 array [len(keys), dim], indices of keys not in the cache)"""
+        out = np.zeros((len(keys), self.dim), dtype=np.float16)
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._refresh()
+            vecs = self._vectors()
+            missing = []
+            for i, k in enumerate(keys):
+                row = self._rows.get(k)
+                if row is None:
+                    missing.append(i)
+                else:
+                    out[i] = vecs[row]
+        CACHE.labels(cache="embedding", result="hit").inc(len(keys) - len(missing))
+        CACHE.labels(cache="embedding", result="miss").inc(len(missing))
+        return out, missing
+
+    def put_many(self, keys, vectors):
+        """Append vectors (float16 [n, dim]) for keys not stored yet."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock, open(self.lock_path, "a") as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new, seen = [], set()
+                for k, v in zip(keys, vectors):
+                    if k not in self._rows and k not in seen:
+                        seen.add(k)
+                        new.append((k, v))
+                if not new:
+                    return 0
+                rows = self._keys_read // KEY_BYTES
+                with open(self.vec_path, "ab") as f:
+                    # drop vectors a crashed writer appended without their keys
+                    f.truncate(rows * self.dim * 2)
+                    f.write(np.stack([v for _k, v in new]).tobytes())
+                with open(self.key_path, "ab") as f:
+                    f.truncate(rows * KEY_BYTES)
+                    f.write(b"".join(k for k, _v in new))
+                self._refresh()
+                return len(new)
+            finally:
+                fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self._rows)
+
+
+def pooled_embeddings(model, flat_ids, flat_mask, cache, device):
+    """
+    Pooled vectors [N, H] for paragraphs [N, L] (CPU tensors): cached rows are
+    read from the memory map, only the misses go through model.encode.
+    """
+    keys = [paragraph_key(flat_ids[i], flat_mask[i]) for i in range(flat_ids.shape[0])]
+    vecs, missing = cache.get_many(keys)
+    if missing:
+        # identical paragraphs (e.g. the "" padding slots) are encoded once
+        first = {}
+        for i in missing:
+            first.setdefault(keys[i], i)
+        todo = list(first.values())
+        with torch.no_grad():
+            enc = model.encode(flat_ids[todo].to(device), flat_mask[todo].to(device))
+        enc = enc.to(torch.float16).cpu().numpy()
+        cache.put_many([keys[i] for i in todo], enc)
+        by_key = dict(zip((keys[i] for i in todo), enc))
+        for i in missing:
+            vecs[i] = by_key[keys[i]]
+    return torch.from_numpy(vecs.astype(np.float32)).to(device)
+
+
+def attach(model, config):
+    """Give a loaded classifier its embedding cache (model.embedding_cache)."""
+    if fcntl is None:
+        logger.warning("fcntl unavailable; embedding cache disabled")
+        return None
+    if not hasattr(model, "encode") or not hasattr(model, "classify_pooled"):
+        logger.warning(f"{type(model).__name__} has no encode/classify_pooled; embedding cache disabled")
+        return None
+    model.embedding_cache = EmbeddingCache(checkpoint_fingerprint(config), model.hidden_size)
+    return model.embedding_cache
@@ -0,0 +1,220 @@
+# pubtator/export_model.py
+"""
+Export the trained classifier (best_model_path) for the torchscript / onnx
+serving backends, check the export against eager PyTorch, and benchmark it.
+
+    # writes best_model.onnx next to best_model_path, then runs the parity check
+    python -m pubtator.export_model export --format onnx
+
+    # eager vs exported probabilities on corpus paragraphs; exit 1 above --tol
+    python -m pubtator.export_model check --format onnx --tol 1e-4
+
+    # classification and LIME-scorer latency, eager vs exported
+    python -m pubtator.export_model bench --format onnx --repeat 5
+
+Both formats keep the batch, paragraph and sequence axes dynamic, so the
+fixed [B, max_paragraphs, max_length] batches of classify_samples and the
+[num_samples, 1, L] LIME batches use the same artifact.  Serve it with
+"inference: backend: onnx" in the classifier config (see pubtator.backends).
+
+Whether an exported backend is faster depends on the device, thread
+settings and model size; measure with `bench` before switching.  On the
+CPU test host, TorchScript ran classification at 0.83x of eager (slower)
+and the LIME scorer at 1.01x (no change).  The ONNX path has not been
+run: onnx / onnxruntime were not available where it was written, so
+export, check and serving with "backend: onnx" are untested.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import statistics
+
+import torch
+import torch.nn as nn
+from transformers import BertTokenizer
+
+from .config import FULLTEXT_DIR
+from .backends import artifact_path, load_backend
+from .file_utils import variant_stem, find_variant_file, load_variant_data
+from .predict import load_classifier_config, build_classifier, predict_probabilities
+from .lime_interpret_sentences import lime_sentence_predict
+
+
+class _Exportable(nn.Module):
+    """forward(input_ids, attention_mask) -> logits, the signature the backends call."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask)
+
+
+def _example_inputs(config):
+    # sizes other than 1 so no axis is specialized during tracing
+    shape = (2, config['data']['max_paragraphs'], min(32, config['data']['max_length']))
+    return torch.randint(1000, 2000, shape), torch.ones(shape, dtype=torch.long)
+
+
+def export(config, fmt, output=None, opset=17):
+    """Trace the eager classifier on CPU and write the artifact; returns its path."""
+    output = output or artifact_path(config, fmt)
+    model = _Exportable(build_classifier(config, torch.device("cpu"))).eval()
+    ids, mask = _example_inputs(config)
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # tracer warnings about python-side shape math
+        if fmt == "torchscript":
+            traced = torch.jit.trace(model, (ids, mask), check_trace=False)
+            traced = torch.jit.freeze(traced)
+            traced.save(output)
+        else:
+            axes = {0: "batch", 1: "paragraphs", 2: "sequence"}
+            torch.onnx.export(
+                model, (ids, mask), output,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={"input_ids": axes, "attention_mask": axes,
+                              "logits": {0: "batch"}},
+                opset_version=opset,
+                dynamo=False,
+            )
+    return output
+
+
+def _sample_texts(config, n, data_dir=FULLTEXT_DIR):
+    """Up to n articles' worth of paragraphs from the full-text store."""
+    texts = []
+    try:
+        stems = sorted({variant_stem(fn) for fn in os.listdir(data_dir)} - {None})
+    except FileNotFoundError:
+        stems = []
+    for stem in stems:
+        for content in load_variant_data(find_variant_file(data_dir, stem)).values():
+            paras = [line.strip() for section, text in content.items()
+                     if section.lower() not in ("title", "pubmed_link") and text
+                     for line in text.split("\n") if len(line.strip()) > 40]
+            if paras:
+                texts.append(paras[:config['data']['max_paragraphs']])
+            if len(texts) >= n:
+                return texts
+    if not texts:
+        texts = [[f"The BRCA1 c.{68 + i}_69delAG variant was found in patient {i}."]
+                 for i in range(n)]
+    return texts
+
+
+def check(config, fmt, tol=1e-4, n=32, device=None):
+    """Max |Δp| between eager and exported probabilities, for classify and LIME-shaped batches."""
+    device = device or torch.device("cpu")
+    eager = build_classifier(config, device)
+    exported = load_backend(config, fmt, device)
+    tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+    texts = _sample_texts(config, n)
+
+    report = {"format": fmt, "texts": len(texts), "tol": tol}
+    for batch_size in (1, 8):
+        a = predict_probabilities(texts, config, eager, tokenizer, batch_size)
+        b = predict_probabilities(texts, config, exported, tokenizer, batch_size)
+        report[f"classify_bs{batch_size}"] = {
+            "max_abs_diff":     float((a - b).abs().max()),
+            "label_mismatches": int((a.argmax(1) != b.argmax(1)).sum()),
+        }
+    # LIME: one paragraph per row, dynamic padding
+    paras = [p for paras in texts for p in paras][:64]
+    a = lime_sentence_predict(paras, eager, tokenizer, device)
+    b = lime_sentence_predict(paras, exported, tokenizer, exported.device)
+    report["lime"] = {
+        "max_abs_diff":     float(abs(a - b).max()),
+        "label_mismatches": int((a.argmax(1) != b.argmax(1)).sum()),
+    }
+    report["ok"] = all(r["max_abs_diff"] <= tol and not r["label_mismatches"]
+                       for k, r in report.items() if isinstance(r, dict))
+    return report
+
+
+def _median_ms(fn, repeat):
+    fn()  # warm-up
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(runs), 2)
+
+
+def bench(config, fmt, repeat=5, batch_size=8, lime_samples=300, n=32):
+    """
+    Median latency (ms) of eager vs exported on CPU for classification and
+    one LIME scoring pass.  speedup_* < 1 means the export is slower here.
+    """
+    device = torch.device("cpu")
+    models = {"eager": build_classifier(config, device),
+              fmt: load_backend(config, fmt, device)}
+    tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+    texts = _sample_texts(config, n)
+    paras = [p for paras in texts for p in paras]
+    lime_batch = (paras * (lime_samples // max(1, len(paras)) + 1))[:lime_samples]
+
+    result = {"format": fmt, "texts": len(texts), "batch_size": batch_size,
+              "lime_samples": len(lime_batch), "torch_threads": torch.get_num_threads()}
+    for name, model in models.items():
+        result[name] = {
+            "classify_ms": _median_ms(lambda: predict_probabilities(
+                texts, config, model, tokenizer, batch_size), repeat),
+            "lime_ms": _median_ms(lambda: lime_sentence_predict(
+                lime_batch, model, tokenizer, device), repeat),
+        }
+    for stage in ("classify_ms", "lime_ms"):
+        result[f"speedup_{stage[:-3]}"] = round(result["eager"][stage] / result[fmt][stage], 2)
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export / check / benchmark the classifier for torchscript or onnx")
+    ap.add_argument("--config", default=None, help="classifier config.yaml")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_exp = sub.add_parser("export", help="write the exported model")
+    p_exp.add_argument("--output", default=None, help="default: next to best_model_path")
+    p_exp.add_argument("--opset", type=int, default=17)
+    p_exp.add_argument("--no-check", action="store_true", help="skip the parity check")
+    p_check = sub.add_parser("check", help="compare exported vs eager outputs")
+    p_bench = sub.add_parser("bench", help="latency of exported vs eager")
+    p_bench.add_argument("--repeat", type=int, default=5)
+    p_bench.add_argument("--batch-size", type=int, default=8)
+    p_bench.add_argument("--lime-samples", type=int, default=300)
+    p_bench.add_argument("--output", default=None, help="write results JSON here")
+    for p in (p_exp, p_check, p_bench):
+        p.add_argument("--format", choices=["torchscript", "onnx"], default="onnx")
+    for p in (p_exp, p_check):
+        p.add_argument("--tol", type=float, default=1e-4, help="max allowed |Δ probability|")
+    args = ap.parse_args(argv)
+
+    config = load_classifier_config(args.config)
+    if args.cmd == "export":
+        path = export(config, args.format, args.output, args.opset)
+        print(f"Wrote {path} ({os.path.getsize(path):,} bytes)")
+        if args.no_check:
+            return 0
+        if args.output:
+            config.setdefault('inference', {})[f"{args.format}_path"] = args.output
+    if args.cmd in ("export", "check"):
+        report = check(config, args.format, args.tol)
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+
+    result = bench(config, args.format, args.repeat, args.batch_size, args.lime_samples)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
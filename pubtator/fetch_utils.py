@@ -1,17 +1,20 @@
 # pubtator_inference/fetch_utils.py
 
 import requests
+from .metrics import PUBTATOR_REQUESTS
+from .config import PUBTATOR_API_BASE
 
 def fetch_pmid_data(variant):
     """
     以 variant (如 c.3578G>A) 去 PubTator3 API 搜尋相關的 PMID
     """
-    base_url = "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/search/"
+    base_url = f"{PUBTATOR_API_BASE}/search/"
     page = 1
     pmid_list = []
     while True:
         url = f"{base_url}?text=@{variant}&page={page}"
         response = requests.get(url)
+        PUBTATOR_REQUESTS.labels(endpoint="search", status=str(response.status_code)).inc()
         if response.status_code != 200:
             print(f"無法連接到API，狀態碼：{response.status_code}")
             break
@@ -30,12 +33,13 @@ def fetch_full_text_via_api(pmid):
     """
     以 PubTator3 API 拿到指定 PMID 的 BioC XML (full=true)
     """
-    base_url = "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/publications/export/biocxml"
+    base_url = f"{PUBTATOR_API_BASE}/publications/export/biocxml"
     params = {
         "pmids": pmid,
         "full": "true"
     }
     response = requests.get(base_url, params=params)
+    PUBTATOR_REQUESTS.labels(endpoint="biocxml", status=str(response.status_code)).inc()
     if response.status_code != 200:
         print(f"無法抓取全文資料，PMID: {pmid}，狀態碼：{response.status_code}")
         return None
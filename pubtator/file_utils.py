@@ -2,6 +2,39 @@
 
 import os
 import json
+import tempfile
+
+from .config import STORAGE_FORMAT, ZSTD_LEVEL
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON
+    orjson = None
+try:
+    import msgpack
+    import zstandard
+except ImportError:  # only needed for the msgpack.zst format
+    msgpack = zstandard = None
+try:
+    import ijson
+except ImportError:  # optional, faster incremental JSON parsing
+    ijson = None
+
+# 儲存格式 → 副檔名；json-compact 仍是合法 JSON，沿用 .json
+STORAGE_FORMATS = {
+    "json":         ".json",
+    "json-compact": ".json",
+    "msgpack.zst":  ".msgpack.zst",
+}
+SIDECAR_SUFFIX = ".sentences.json"
+
+# 目前的 umask (只能用設定再還原的方式讀出來)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+if STORAGE_FORMAT not in STORAGE_FORMATS:
+    raise ValueError(f"Unknown PT_STORAGE_FORMAT {STORAGE_FORMAT!r}; "
+                     f"expected one of {sorted(STORAGE_FORMATS)}")
 
 def ensure_dir_exists(dir_path):
     if not os.path.exists(dir_path):
@@ -24,9 +57,191 @@ def save_all_pmids(all_pmids, json_path):
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(all_pmids, f, indent=4, ensure_ascii=False)
 
-def save_variant_data(variant_data, output_file):
+def variant_stem(filename):
+    """
+    <variant>.json / <variant>.msgpack.zst → <variant>；
+    分句快取 (.sentences.json) 與其他檔案回傳 None
+    """
+    if filename.endswith(SIDECAR_SUFFIX):
+        return None
+    for ext in (".msgpack.zst", ".json"):
+        if filename.endswith(ext):
+            return filename[:-len(ext)]
+    return None
+
+def variant_data_path(base_dir, safe_variant_name, fmt=None):
+    """依儲存格式 (預設 STORAGE_FORMAT) 組出 variant 全文檔路徑"""
+    return os.path.join(base_dir, safe_variant_name + STORAGE_FORMATS[fmt or STORAGE_FORMAT])
+
+def find_variant_file(base_dir, safe_variant_name):
+    """
+    找出已存在的 variant 全文檔：先找目前設定的格式，再找其他格式
+    (舊的 .json 一律可讀)；都沒有則回傳 None
+    """
+    exts = [STORAGE_FORMATS[STORAGE_FORMAT]] + [e for e in (".msgpack.zst", ".json")
+                                                if e != STORAGE_FORMATS[STORAGE_FORMAT]]
+    for ext in exts:
+        path = os.path.join(base_dir, safe_variant_name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _require_msgpack():
+    if msgpack is None:
+        raise RuntimeError("The msgpack.zst storage format needs `pip install msgpack zstandard`")
+
+def load_variant_data(path):
+    """讀取 variant 全文檔，依副檔名決定格式；回傳 {pmid: {...}}"""
+    if path.endswith(".msgpack.zst"):
+        _require_msgpack()
+        with open(path, "rb") as f:
+            raw = zstandard.ZstdDecompressor().decompress(f.read())
+        return msgpack.unpackb(raw, raw=False)
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def _iter_json_object(f, chunk_size=1 << 16):
+    """
+    逐一解析最外層 JSON 物件的 (key, value)，只保留目前這一筆在記憶體中
+    (沒有 ijson 時的 fallback；每個 value 交給 json 的 C scanner 解析)
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def more(size):
+        nonlocal buf, pos, eof
+        chunk = f.read(size)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more(chunk_size)
+
+    def take(ch):
+        nonlocal pos
+        skip_ws()
+        if buf[pos:pos + 1] != ch:
+            raise ValueError(f"Expected {ch!r} at offset {pos} of the buffered JSON")
+        pos += 1
+
+    def decode():
+        nonlocal pos
+        skip_ws()
+        size = chunk_size
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # 數字在 chunk 邊界被切斷時 raw_decode 只會解析前半段
+                # ("1." → 1、"1.5e" → 1.5)，要看到數字後的分隔字元或 EOF 才算完整
+                if eof or (end < len(buf) and
+                           not (isinstance(value, (int, float)) and buf[end] in _NUMBER_CHARS)):
+                    pos = end
+                    return value
+            except ValueError:
+                if eof:
+                    raise
+            more(size)
+            size *= 2
+
+    take("{")
+    skip_ws()
+    if buf[pos:pos + 1] == "}":
+        return
+    while True:
+        key = decode()
+        take(":")
+        yield key, decode()
+        skip_ws()
+        if buf[pos:pos + 1] == "}":
+            return
+        take(",")
+
+def iter_variant_data(path):
+    """
+    逐篇 yield variant 全文檔的 (pmid, {...段落...})，不把整個檔案載入記憶體：
+    .json 用 ijson (有安裝時) 或 _iter_json_object，.msgpack.zst 用串流解壓 + Unpacker。
+    """
+    if path.endswith(".msgpack.zst"):
+        _require_msgpack()
+        with open(path, "rb") as f:
+            unpacker = msgpack.Unpacker(zstandard.ZstdDecompressor().stream_reader(f),
+                                        raw=False)
+            for _ in range(unpacker.read_map_header()):
+                pmid = unpacker.unpack()
+                yield pmid, unpacker.unpack()
+        return
+    if ijson is not None:
+        with open(path, "rb") as f:
+            yield from ijson.kvitems(f, "", use_float=True)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _iter_json_object(f)
+
+def save_variant_data(variant_data, output_file, fmt=None):
+    """
+    將 {pmid: {...段落...}, pmid2: {...}} 寫成 variant 全文檔。
+    格式依副檔名：.msgpack.zst → zstd 壓縮的 msgpack；
+    .json → STORAGE_FORMAT 為 json-compact 時不縮排，否則 indent=4。
+    先寫暫存檔再 rename，讀取端不會讀到寫一半的檔案。
+    """
+    if fmt is None:
+        if output_file.endswith(".msgpack.zst"):
+            fmt = "msgpack.zst"
+        else:
+            fmt = "json-compact" if STORAGE_FORMAT == "json-compact" else "json"
+
+    if fmt == "msgpack.zst":
+        _require_msgpack()
+        packed = msgpack.packb(variant_data, use_bin_type=True)
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(packed)
+    elif fmt == "json-compact":
+        if orjson is not None:
+            payload = orjson.dumps(variant_data)
+        else:
+            payload = json.dumps(variant_data, ensure_ascii=False,
+                                 separators=(",", ":")).encode("utf-8")
+    else:
+        payload = json.dumps(variant_data, indent=4, ensure_ascii=False).encode("utf-8")
+
+    atomic_write(output_file, payload)
+
+def atomic_write(path, payload):
+    """
+    先寫同目錄的暫存檔再 os.replace，讀取端 (含其他 worker) 不會讀到寫一半的檔案；
+    暫存檔名每次不同，兩個寫入者同時存同一個檔也不會互相覆蓋暫存檔
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".",
+                                     prefix="." + os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False) as f:
+        tmp = f.name
+        try:
+            f.write(payload)
+        except BaseException:
+            f.close()
+            os.remove(tmp)
+            raise
+    # NamedTemporaryFile 固定建成 0600，改回一般 open() 會給的權限
+    os.chmod(tmp, 0o666 & ~_UMASK)
+    os.replace(tmp, path)
+
+def load_variant_files(dir_path):
     """
-    將 {pmid: {...段落...}, pmid2: {...}} 寫成 JSON 檔
+    逐一讀取 dir_path 底下的 variant 全文檔 (任何儲存格式)，
+    yield (檔名去副檔名, {pmid: {...}})；略過 .sentences.json 分句快取。
+    同一 variant 有多種格式時只讀 find_variant_file 選到的那一個。
     """
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(variant_data, f, indent=4, ensure_ascii=False)
+    stems = {variant_stem(fn) for fn in os.listdir(dir_path)} - {None}
+    for stem in sorted(stems):
+        yield stem, load_variant_data(find_variant_file(dir_path, stem))
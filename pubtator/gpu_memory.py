@@ -0,0 +1,212 @@
+# pubtator/gpu_memory.py
+"""
+Device-memory policy for the classifier and the LIME scorer.
+
+Requests used to end with torch.cuda.empty_cache(), which hands the caching
+allocator's blocks back to the driver, so the next request paid for
+cudaMalloc again.  Instead, every forward pass goes through `memory`
+(one GpuMemoryManager per process):
+
+  * batch sizing: run_batched() caps the caller's batch so that
+    rows * tokens * bytes-per-token fits in what is free on the device
+    (driver free + the allocator's unused cache, minus GPU_HEADROOM of the
+    card, shared between the threads using the GPU right now).
+    Bytes-per-token starts at GPU_BYTES_PER_TOKEN and is re-measured from
+    the peak allocation of batches that ran alone on the device.
+  * OOM: a batch that still runs out of memory is split in half and
+    retried (down to one row); the size that worked becomes a ceiling on
+    tokens per batch until the next idle release.
+  * release: the cache is emptied only when the device is more than
+    GPU_PRESSURE full after a request, or after GPU_IDLE_RELEASE seconds
+    without GPU work, so memory goes back when others (other workers, the
+    NER pipeline) need it, not on every request.
+  * autocast: GPU_AUTOCAST=fp16 / bf16 runs eager models under
+    torch.autocast (bf16 also on CPU); exported backends are left alone.
+
+Allocator state goes to /metrics as pubtator_gpu_memory_bytes{kind},
+pubtator_gpu_memory_releases_total{reason} and pubtator_gpu_oom_splits_total.
+On a CPU-only host everything but autocast is a pass-through.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+from .config import (GPU_AUTOCAST, GPU_HEADROOM, GPU_PRESSURE, GPU_IDLE_RELEASE,
+                     GPU_BYTES_PER_TOKEN)
+from .metrics import GPU_MEMORY, GPU_RELEASES, GPU_OOM_SPLITS
+
+logger = logging.getLogger(__name__)
+
+AUTOCAST_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+_OOM_ERRORS = tuple(e for e in (getattr(torch, "OutOfMemoryError", None),
+                                getattr(torch.cuda, "OutOfMemoryError", None)) if e is not None)
+
+
+def _is_cuda(device):
+    return torch.device(device).type == "cuda"
+
+
+class GpuMemoryManager:
+    def __init__(self, headroom=GPU_HEADROOM, pressure=GPU_PRESSURE,
+                 idle_release=GPU_IDLE_RELEASE, bytes_per_token=GPU_BYTES_PER_TOKEN,
+                 autocast=GPU_AUTOCAST):
+        if autocast and autocast not in AUTOCAST_DTYPES:
+            raise ValueError(f"PT_GPU_AUTOCAST must be one of {sorted(AUTOCAST_DTYPES)}, got {autocast!r}")
+        self.headroom = headroom
+        self.pressure = pressure
+        self.idle_release = idle_release
+        self.bytes_per_token = float(bytes_per_token)
+        self.autocast_dtype = AUTOCAST_DTYPES.get(autocast)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._max_tokens = None   # tokens per batch known to fit after an OOM
+        self._last_used = time.monotonic()
+        self._idle_thread = None
+
+    # ─── autocast ───────────────────────────────────────────
+    def autocast(self, model, device):
+        """torch.autocast for an eager model when GPU_AUTOCAST is set, else a no-op."""
+        if self.autocast_dtype is None or not isinstance(model, torch.nn.Module):
+            return nullcontext()
+        device_type = torch.device(device).type
+        if device_type == "cpu" and self.autocast_dtype is not torch.bfloat16:
+            return nullcontext()  # fp16 autocast is CUDA-only
+        return torch.autocast(device_type=device_type, dtype=self.autocast_dtype)
+
+    # ─── batch sizing ───────────────────────────────────────
+    def available_bytes(self, device):
+        """Memory a new batch may use: driver free + unused cache - headroom, split across active users."""
+        free, total = torch.cuda.mem_get_info(device)
+        cached = torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+        usable = free + cached - self.headroom * total
+        return max(0, usable) / max(1, self._active)
+
+    def batch_size(self, requested, tokens_per_row, device):
+        """requested, capped by what fits on the device right now (at least 1)."""
+        if not _is_cuda(device):
+            return requested
+        fits = int(self.available_bytes(device) // max(1.0, tokens_per_row * self.bytes_per_token))
+        if self._max_tokens is not None:
+            fits = min(fits, self._max_tokens // max(1, tokens_per_row))
+        return max(1, min(requested, fits))
+
+    @contextmanager
+    def _using(self, device):
+        with self._lock:
+            self._active += 1
+            self._last_used = time.monotonic()
+        self._start_idle_thread()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    def _measure(self, device, fn, chunk, tokens):
+        """fn(chunk), learning bytes-per-token from its peak when it runs alone on the device."""
+        alone = self._active == 1
+        if alone:
+            torch.cuda.reset_peak_memory_stats(device)
+            base = torch.cuda.memory_allocated(device)
+        out = fn(chunk)
+        if alone and tokens:
+            per_token = (torch.cuda.max_memory_allocated(device) - base) / tokens
+            with self._lock:
+                # follow increases at once, decreases slowly
+                self.bytes_per_token = max(per_token, 0.9 * self.bytes_per_token + 0.1 * per_token)
+        return out
+
+    def run_batched(self, fn, rows, batch_size, tokens_per_row, device):
+        """
+        [fn(rows[i:j]) ...] over consecutive chunks of at most batch_size rows,
+        sized to free device memory and split in half on CUDA OOM.
+        tokens_per_row: padded tokens per row (e.g. P * L for classify).
+        """
+        if not _is_cuda(device):
+            return [fn(rows[i:i + batch_size]) for i in range(0, len(rows), batch_size)]
+
+        outs = []
+        with self._using(device):
+            start = 0
+            while start < len(rows):
+                size = self.batch_size(batch_size, tokens_per_row, device)
+                while True:
+                    chunk = rows[start:start + size]
+                    try:
+                        outs.append(self._measure(device, fn, chunk, len(chunk) * tokens_per_row))
+                        break
+                    except _OOM_ERRORS:
+                        if size == 1:
+                            raise
+                        size = max(1, size // 2)
+                        self._max_tokens = size * tokens_per_row
+                        GPU_OOM_SPLITS.inc()
+                        # fragments of the failed batch are what the retry needs
+                        self.release(device, "oom")
+                        logger.warning(f"CUDA OOM, retrying with batch size {size}")
+                start += len(chunk)
+        self.report(device)
+        return outs
+
+    # ─── release policy ─────────────────────────────────────
+    def release(self, device=None, reason="pressure"):
+        torch.cuda.empty_cache()
+        GPU_RELEASES.labels(reason=reason).inc()
+
+    def request_done(self, device=None):
+        """End of a request: empty the cache only if the device is under pressure."""
+        if not torch.cuda.is_available():
+            return
+        device = device or torch.device("cuda")
+        free, total = torch.cuda.mem_get_info(device)
+        cached = torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+        if cached > 0 and 1 - free / total > self.pressure:
+            self.release(device, "pressure")
+        self.report(device)
+
+    def _start_idle_thread(self):
+        if self.idle_release <= 0 or self._idle_thread is not None:
+            return
+        with self._lock:
+            if self._idle_thread is None:
+                self._idle_thread = threading.Thread(target=self._idle_loop, daemon=True,
+                                                     name="gpu-idle-release")
+                self._idle_thread.start()
+
+    def _idle_loop(self):
+        while True:
+            time.sleep(max(1.0, self.idle_release / 4))
+            with self._lock:
+                idle = self._active == 0 and time.monotonic() - self._last_used >= self.idle_release
+            if idle and torch.cuda.memory_reserved() > torch.cuda.memory_allocated():
+                self.release(reason="idle")
+                self._max_tokens = None
+                self.report()
+
+    # ─── metrics ────────────────────────────────────────────
+    def stats(self, device=None):
+        if not torch.cuda.is_available():
+            return {}
+        device = device or torch.device("cuda")
+        free, total = torch.cuda.mem_get_info(device)
+        return {
+            "allocated":      torch.cuda.memory_allocated(device),
+            "reserved":       torch.cuda.memory_reserved(device),
+            "peak_allocated": torch.cuda.max_memory_allocated(device),
+            "free":           free,
+            "total":          total,
+            "bytes_per_token": round(self.bytes_per_token),
+        }
+
+    def report(self, device=None):
+        for kind, value in self.stats(device).items():
+            GPU_MEMORY.labels(kind=kind).set(value)
+
+
+memory = GpuMemoryManager()
@@ -1,15 +1,19 @@
 import re
+import numpy as np
 import torch
 from typing import List
-from lime.lime_text import LimeTextExplainer
-import nltk
-# Ensure that the NLTK punkt tokenizer is downloaded
-nltk.download('punkt_tab')
+from lime.lime_text import LimeTextExplainer, IndexedString
+from .sentence_seg import segment, segment_batch, segmenter_id
+from .metrics import stage_timer, BATCH_SIZE, TOKENS, LIME_SAMPLES
+from .config import (LIME_ROUND_SIZE, LIME_MIN_SAMPLES, LIME_SAMPLES_PER_SENTENCE,
+                     LIME_WEIGHT_TOL, LIME_PATIENCE, EMBED_CACHE_LIME)
+from .embedding_cache import pooled_embeddings
+from .gpu_memory import memory
 SENT_TOKEN = "<<<SENT_BREAK>>>"
 
 def custom_sent_tokenize(text: str) -> List[str]:
-    from nltk.tokenize import sent_tokenize
-    return sent_tokenize(text)
+    # punkt is loaded once from local data and results are cached (sentence_seg.py)
+    return segment(text)
 
 def lime_sentence_predict(texts, model, tokenizer, device):
     model.eval()
@@ -22,13 +26,179 @@ def lime_sentence_predict(texts, model, tokenizer, device):
         return_attention_mask=True,
         return_tensors='pt'
     )
-    input_ids = encoding["input_ids"].unsqueeze(1).to(device)
-    attention_mask = encoding["attention_mask"].unsqueeze(1).to(device)
+    LIME_SAMPLES.inc(len(texts))
+    BATCH_SIZE.labels(model="lime").observe(len(texts))
+    TOKENS.labels(model="lime").inc(int(encoding["attention_mask"].sum()))
+    cache = getattr(model, "embedding_cache", None) if EMBED_CACHE_LIME else None
+    rows = list(zip(encoding["input_ids"], encoding["attention_mask"]))
 
+    def forward(chunk):
+        ids = torch.stack([r[0] for r in chunk])
+        mask = torch.stack([r[1] for r in chunk])
+        with memory.autocast(model, device):
+            if cache is not None:
+                pooled = pooled_embeddings(model, ids, mask, cache, device)
+                logits = model.classify_pooled(pooled.unsqueeze(1))
+            else:
+                logits = model(input_ids=ids.unsqueeze(1).to(device),
+                               attention_mask=mask.unsqueeze(1).to(device))
+        return torch.softmax(logits.float(), dim=1).cpu()
+
+    # all perturbed texts in as few forwards as fit in device memory
     with torch.no_grad():
-        logits = model(input_ids=input_ids, attention_mask=attention_mask)
-        probs = torch.softmax(logits, dim=1).cpu().numpy()
-    return probs
+        probs = memory.run_batched(forward, rows, len(rows),
+                                   encoding["input_ids"].shape[1], device)
+    return torch.cat(probs).numpy()
+
+def weight_color(w: float, base_threshold: float = 0.1):
+    """Map a LIME sentence weight to its highlight color (None = no highlight)."""
+    low, med, high = base_threshold, base_threshold*2, base_threshold*4
+    if w >= high:
+        return "darkred"
+    elif w >= med:
+        return "red"
+    elif w >= low:
+        return "lightcoral"
+    elif w <= -high:
+        return "darkgreen"
+    elif w <= -med:
+        return "green"
+    elif w <= -low:
+        return "lightgreen"
+    return None
+
+def _sample_neighborhood(indexed, n, random_state, include_original=False):
+    """
+    Same perturbation scheme as LimeTextExplainer: drop a random number of
+    sentences per sample.  Returns (binary data matrix, perturbed texts).
+    """
+    d = indexed.num_words()
+    data = np.ones((n, d))
+    texts = []
+    start = 0
+    if include_original:
+        texts.append(indexed.raw_string())
+        start = 1
+    sizes = random_state.randint(1, d + 1, n - start)
+    for i, size in enumerate(sizes, start=start):
+        inactive = random_state.choice(range(d), size, replace=False)
+        data[i, inactive] = 0
+        texts.append(indexed.inverse_removing(inactive))
+    return data, texts
+
+def adaptive_explain(
+    joined: str,
+    explainer: LimeTextExplainer,
+    classifier_fn,
+    max_samples: int,
+    base_threshold: float = 0.1,
+    round_size: int = 50,
+    min_samples: int = 100,
+    samples_per_sentence: int = 40,
+    weight_tol: float = 0.01,
+    patience: int = 2,
+    num_features: int = 10
+):
+    """
+    LIME 分輪取樣：每輪加 round_size 個樣本後重新 fit 局部線性模型，
+    當句子權重 (max |Δw| < weight_tol) 與顏色等級連續 patience 輪都不變就停止。
+    預算上限為 min(max_samples, max(min_samples, samples_per_sentence * 句數))。
+
+    回傳 ({sentence: weight}, samples_used)
+    """
+    indexed = IndexedString(joined, bow=explainer.bow,
+                            split_expression=explainer.split_expression,
+                            mask_string=explainer.mask_string)
+    d = indexed.num_words()
+    budget = min(max_samples, max(min_samples, samples_per_sentence * d))
+    rs = explainer.random_state
+
+    data, texts = _sample_neighborhood(indexed, min(round_size, budget), rs,
+                                       include_original=True)
+    labels = classifier_fn(texts)
+    top_label = int(np.argmax(labels[0]))
+
+    prev_w, prev_buckets, stable = None, None, 0
+    while True:
+        # cosine distance to the original (all-ones) row, as in lime_text
+        kept = data.sum(axis=1)
+        distances = (1 - np.sqrt(kept) / np.sqrt(d)) * 100
+        _, exp, _, _ = explainer.base.explain_instance_with_data(
+            data, labels, distances, top_label, num_features,
+            feature_selection=explainer.feature_selection
+        )
+        w = np.zeros(d)
+        for idx, weight in exp:
+            w[idx] = weight
+        buckets = [weight_color(x, base_threshold) for x in w]
+
+        if prev_w is not None and len(data) >= min_samples:
+            if buckets == prev_buckets and np.max(np.abs(w - prev_w)) < weight_tol:
+                stable += 1
+            else:
+                stable = 0
+        prev_w, prev_buckets = w, buckets
+        if stable >= patience or len(data) >= budget:
+            break
+
+        n = min(round_size, budget - len(data))
+        new_data, new_texts = _sample_neighborhood(indexed, n, rs)
+        data = np.vstack([data, new_data])
+        labels = np.vstack([labels, classifier_fn(new_texts)])
+
+    weights = {indexed.word(i).strip(): float(w[i]) for i in range(d) if w[i] != 0}
+    return weights, len(data)
+
+def make_explainer(class_names: List[str], random_state=None) -> LimeTextExplainer:
+    """句子層級的 LimeTextExplainer；random_state 固定時取樣可重現 (見 pubtator.parity)。"""
+    return LimeTextExplainer(
+        split_expression=re.escape(SENT_TOKEN),
+        bow=False,
+        class_names=class_names,
+        random_state=random_state
+    )
+
+def explain_sentences(
+    sentences: List[str],
+    explainer: LimeTextExplainer,
+    model,
+    tokenizer,
+    device,
+    base_threshold: float = 0.1,
+    num_samples: int = 300,
+    adaptive: bool = False
+):
+    """
+    對一個段落的句子跑 LIME，回傳 ({句子: 權重}, 實際使用樣本數)。
+    highlight_paragraph 與 parity harness 共用這一段，確保兩邊算的是同一個權重。
+    """
+    joined = f" {SENT_TOKEN} ".join(sentences)
+    classifier_fn = lambda x: lime_sentence_predict(x, model, tokenizer, device)
+    if adaptive:
+        weights, used = adaptive_explain(
+            joined, explainer, classifier_fn,
+            max_samples=num_samples,
+            base_threshold=base_threshold,
+            round_size=LIME_ROUND_SIZE,
+            min_samples=LIME_MIN_SAMPLES,
+            samples_per_sentence=LIME_SAMPLES_PER_SENTENCE,
+            weight_tol=LIME_WEIGHT_TOL,
+            patience=LIME_PATIENCE
+        )
+    else:
+        explanation = explainer.explain_instance(
+            joined,
+            classifier_fn=classifier_fn,
+            num_samples=num_samples,   # 正確放在這裡
+            top_labels=2
+        )
+
+        # 取出最重要的標籤
+        top_label = explanation.top_labels[0]
+        exp_list = explanation.as_list(label=top_label)
+        weights = {feat.strip(): w for feat, w in exp_list}
+        used = num_samples
+    return weights, used
 
 def highlight_paragraph(
     paragraph_text: str,
@@ -38,52 +208,38 @@ def highlight_paragraph(
     class_names: List[str],
     device,
     base_threshold: float = 0.1,
-    num_samples: int = 300
+    num_samples: int = 300,
+    adaptive: bool = False,
+    stats: dict = None,
+    sentences: List[str] = None
 ) -> str:
     """
     對單一段落做 LIME 解釋，並回傳 HTML 字串。
-    num_samples 只傳給 explain_instance()。
+    sentences 可傳入預先切好的句子 (見 highlight_lime_in_paragraphs)。
+    num_samples 只傳給 explain_instance()；adaptive=True 時則為取樣上限。
+    若給了 stats dict，會把實際使用的樣本數累加到 stats["samples_used"]，
+    並在 stats["segmenter"] 記下分句用的是 punkt 還是 regex fallback。
     """
     if not paragraph_text.strip():
         return paragraph_text
 
-    sentences = custom_sent_tokenize(paragraph_text)
+    if sentences is None:
+        sentences = custom_sent_tokenize(paragraph_text)
     if not sentences:
         return paragraph_text
 
-    # join sentences with a unique token
-    joined = f" {SENT_TOKEN} ".join(sentences)
-    explanation = explainer.explain_instance(
-        joined,
-        classifier_fn=lambda x: lime_sentence_predict(x, model, tokenizer, device),
-        num_samples=num_samples,   # 正確放在這裡
-        top_labels=2
-    )
-
-    # 取出最重要的標籤
-    top_label = explanation.top_labels[0]
-    exp_list = explanation.as_list(label=top_label)
-    weights = {feat.strip(): w for feat, w in exp_list}
-
-    low, med, high = base_threshold, base_threshold*2, base_threshold*4
+    weights, used = explain_sentences(sentences, explainer, model, tokenizer, device,
+                                      base_threshold=base_threshold,
+                                      num_samples=num_samples, adaptive=adaptive)
+    if stats is not None:
+        stats["samples_used"] = stats.get("samples_used", 0) + used
+        stats["samples_budget"] = stats.get("samples_budget", 0) + num_samples
+        stats["segmenter"] = segmenter_id()
 
     highlighted = []
     for sent in sentences:
         w = weights.get(sent.strip(), 0.0)
-        if w >= high:
-            color = "darkred"
-        elif w >= med:
-            color = "red"
-        elif w >= low:
-            color = "lightcoral"
-        elif w <= -high:
-            color = "darkgreen"
-        elif w <= -med:
-            color = "green"
-        elif w <= -low:
-            color = "lightgreen"
-        else:
-            color = None
+        color = weight_color(w, base_threshold)
 
         if color:
             highlighted.append(
@@ -101,30 +257,36 @@ def highlight_lime_in_paragraphs(
     class_names: List[str],
     device,
     base_threshold: float = 0.1,
-    num_samples: int = 300
+    num_samples: int = 300,
+    adaptive: bool = False,
+    stats: dict = None
 ) -> str:
     """
     對多個段落做 LIME 解釋，回傳整段 HTML。
     num_samples 從前端傳進來，由 highlight_paragraph 使用。
+    adaptive / stats 直接轉給 highlight_paragraph。
     """
-    explainer = LimeTextExplainer(
-        split_expression=re.escape(SENT_TOKEN),
-        bow=False,
-        class_names=class_names
-    )
+    explainer = make_explainer(class_names)
+
+    # segment every paragraph of the request in one pass (cached)
+    seg_iter = iter(segment_batch([p for p in paragraphs if p.strip()]))
 
     html_paras = []
     for para in paragraphs:
-        html = highlight_paragraph(
-            paragraph_text=para,
-            explainer=explainer,
-            model=model,
-            tokenizer=tokenizer,
-            class_names=class_names,
-            device=device,
-            base_threshold=base_threshold,
-            num_samples=num_samples
-        )
+        with stage_timer("lime"):
+            html = highlight_paragraph(
+                paragraph_text=para,
+                explainer=explainer,
+                model=model,
+                tokenizer=tokenizer,
+                class_names=class_names,
+                device=device,
+                base_threshold=base_threshold,
+                num_samples=num_samples,
+                adaptive=adaptive,
+                stats=stats,
+                sentences=next(seg_iter) if para.strip() else None
+            )
         html_paras.append(f"<p>{html}</p>")
 
     return "\n".join(html_paras)
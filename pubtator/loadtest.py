@@ -0,0 +1,127 @@
+# pubtator/loadtest.py
+"""
+SSE load generator for /search_inference_stream.
+
+Opens many concurrent EventSource-style connections and reports time to
+first event, time to the last event, event throughput and error rates
+(HTTP errors such as 503 from admission control, "error" events, dropped
+connections).  Pair it with pubtator.mock_pubtator so nothing hits NCBI:
+
+    python -m pubtator.loadtest --url http://127.0.0.1:8080 \\
+        --variants "c.608T>C" "c.3578G>A" --concurrency 20 --requests 100 \\
+        --output load/before.json
+"""
+
+import json
+import time
+import random
+import argparse
+import statistics
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def run_stream(url, variant, num_samples, timeout):
+    """Consume one SSE stream; returns a dict of timings and outcome."""
+    params = {"variant": variant, "num_samples": num_samples}
+    rec = {"variant": variant, "status": None, "ttfe": None, "total": None,
+           "events": Counter(), "error": None}
+    t0 = time.perf_counter()
+    try:
+        with requests.get(f"{url}/search_inference_stream", params=params,
+                          stream=True, timeout=timeout) as resp:
+            rec["status"] = resp.status_code
+            if resp.status_code != 200:
+                rec["error"] = f"http_{resp.status_code}"
+                return rec
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                if rec["ttfe"] is None:
+                    rec["ttfe"] = time.perf_counter() - t0
+                step = json.loads(line[6:]).get("step", "?")
+                rec["events"][step] += 1
+                if step == "error":
+                    rec["error"] = "error_event"
+                if step in ("done", "error"):
+                    break
+            if not rec["error"] and not rec["events"].get("done"):
+                rec["error"] = "incomplete"
+    except requests.RequestException as e:
+        rec["error"] = type(e).__name__
+    finally:
+        rec["total"] = time.perf_counter() - t0
+    return rec
+
+
+def _pct(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+def summarize(records, wall):
+    ok = [r for r in records if not r["error"]]
+    ttfe = [r["ttfe"] for r in records if r["ttfe"] is not None]
+    totals = [r["total"] for r in ok]
+    events = sum(sum(r["events"].values()) for r in records)
+    return {
+        "requests":       len(records),
+        "ok":             len(ok),
+        "error_rate":     round(1 - len(ok) / len(records), 4) if records else None,
+        "errors":         dict(Counter(r["error"] for r in records if r["error"])),
+        "wall_s":         round(wall, 3),
+        "streams_per_s":  round(len(ok) / wall, 3) if wall else None,
+        "events_per_s":   round(events / wall, 3) if wall else None,
+        "ttfe_s":         {"p50": _pct(ttfe, 0.5), "p95": _pct(ttfe, 0.95),
+                           "max": _pct(ttfe, 1.0),
+                           "mean": round(statistics.fmean(ttfe), 4) if ttfe else None},
+        "stream_total_s": {"p50": _pct(totals, 0.5), "p95": _pct(totals, 0.95),
+                           "max": _pct(totals, 1.0)},
+        "events":         dict(sum((r["events"] for r in records), Counter())),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Concurrent SSE load test")
+    ap.add_argument("--url", default="http://127.0.0.1:8080")
+    ap.add_argument("--variants", nargs="+", required=True)
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--requests", type=int, default=50, help="total streams to open")
+    ap.add_argument("--num-samples", type=int, default=300)
+    ap.add_argument("--timeout", type=float, default=600)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", default=None)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    plan = [rng.choice(args.variants) for _ in range(args.requests)]
+    records, lock = [], threading.Lock()
+
+    def worker(variant):
+        rec = run_stream(args.url, variant, args.num_samples, args.timeout)
+        with lock:
+            records.append(rec)
+            print(f"[{len(records)}/{len(plan)}] {variant}: "
+                  f"{rec['error'] or 'ok'} ttfe={rec['ttfe'] and round(rec['ttfe'], 3)}s "
+                  f"total={round(rec['total'], 3)}s")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, plan))
+    summary = summarize(records, time.perf_counter() - t0)
+    summary["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
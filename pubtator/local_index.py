@@ -0,0 +1,268 @@
+# pubtator/local_index.py
+"""
+Local full-text index over the cached articles (SQLite FTS5, trigram).
+
+Every stored article is indexed once per PMID, whichever variant file it
+came from, one row per paragraph line (the unit extract_variant_paragraphs
+works on).  A variant lookup runs a trigram query for its core notation
+(core_terms: "Arg911" / "R911", "c.608T") and then filters the hits with
+variant_pattern, so equivalent spellings are found and false substring
+hits are dropped.  That answers "which cached PMIDs and paragraphs mention
+X" in milliseconds, without PubTator.
+
+The index lives in LOCAL_INDEX_PATH.  It is updated incrementally at ingest
+(iter_inference_for_variant) and synced against the full-text store when
+the app starts (only new or changed files are read).  SEARCH_MODE decides
+how the routes use it:
+  remote       stored variant file → PubTator (previous behaviour)
+  local-first  stored variant file → local index → PubTator
+  offline      stored variant file → local index, never PubTator
+
+    python -m pubtator.local_index build           # sync with the store
+    python -m pubtator.local_index search "p.R911X"
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+
+from .config import FULLTEXT_DIR, LOCAL_INDEX_PATH
+from .file_utils import variant_stem, find_variant_file, load_variant_data
+from .variant_norm import core_terms, variant_pattern
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    stem  TEXT PRIMARY KEY,
+    mtime REAL,
+    size  INTEGER
+);
+CREATE TABLE IF NOT EXISTS source_articles (
+    stem TEXT,
+    pmid TEXT,
+    PRIMARY KEY (stem, pmid)
+);
+CREATE TABLE IF NOT EXISTS articles (
+    pmid    TEXT PRIMARY KEY,
+    title   TEXT,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    id      INTEGER PRIMARY KEY,
+    pmid    TEXT,
+    section TEXT,
+    text    TEXT
+);
+CREATE INDEX IF NOT EXISTS paragraphs_pmid ON paragraphs(pmid);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs_fts USING fts5(
+    text, content='paragraphs', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS paragraphs_ai AFTER INSERT ON paragraphs BEGIN
+    INSERT INTO paragraphs_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS paragraphs_ad AFTER DELETE ON paragraphs BEGIN
+    INSERT INTO paragraphs_fts(paragraphs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def _article_lines(content):
+    """(section, stripped line) pairs, same split as extract_variant_paragraphs."""
+    for section, text in content.items():
+        if section.lower() in ("title", "pubmed_link") or not text:
+            continue
+        for line in text.split("\n"):
+            line = line.strip()
+            if line:
+                yield section, line
+
+
+def _fts_query(terms):
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+class LocalIndex:
+    def __init__(self, path=LOCAL_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ─── ingest ───────────────────────────────────────────
+    def add_variant_data(self, stem, variant_data, mtime=None, size=None):
+        """Index (or re-index) the articles of one variant file."""
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM source_articles WHERE stem = ?", (stem,))
+            for pmid, content in variant_data.items():
+                blob = json.dumps(content, ensure_ascii=False)
+                old = conn.execute("SELECT content FROM articles WHERE pmid = ?", (pmid,)).fetchone()
+                if old is None or old[0] != blob:
+                    conn.execute("DELETE FROM paragraphs WHERE pmid = ?", (pmid,))
+                    conn.execute("INSERT OR REPLACE INTO articles VALUES (?, ?, ?)",
+                                 (pmid, (content.get("Title") or "").strip(), blob))
+                    conn.executemany(
+                        "INSERT INTO paragraphs (pmid, section, text) VALUES (?, ?, ?)",
+                        [(pmid, section, line) for section, line in _article_lines(content)])
+                conn.execute("INSERT OR IGNORE INTO source_articles VALUES (?, ?)", (stem, pmid))
+            conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (stem, mtime, size))
+
+    def remove_source(self, stem):
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM source_articles WHERE stem = ?", (stem,))
+            conn.execute("DELETE FROM sources WHERE stem = ?", (stem,))
+            orphans = [r[0] for r in conn.execute(
+                "SELECT pmid FROM articles WHERE pmid NOT IN (SELECT pmid FROM source_articles)")]
+            for pmid in orphans:
+                conn.execute("DELETE FROM paragraphs WHERE pmid = ?", (pmid,))
+                conn.execute("DELETE FROM articles WHERE pmid = ?", (pmid,))
+
+    def sync(self, base_dir=FULLTEXT_DIR):
+        """Index new/changed variant files, drop deleted ones; returns (indexed, removed)."""
+        try:
+            stems = {variant_stem(fn) for fn in os.listdir(base_dir)} - {None}
+        except FileNotFoundError:
+            stems = set()
+        known = {stem: (mtime, size) for stem, mtime, size in
+                 self._conn().execute("SELECT stem, mtime, size FROM sources")}
+        indexed = 0
+        for stem in sorted(stems):
+            path = find_variant_file(base_dir, stem)
+            st = os.stat(path)
+            if known.get(stem) == (st.st_mtime, st.st_size):
+                continue
+            self.add_variant_data(stem, load_variant_data(path), st.st_mtime, st.st_size)
+            indexed += 1
+        removed = [stem for stem in known if stem not in stems]
+        for stem in removed:
+            self.remove_source(stem)
+        return indexed, len(removed)
+
+    # ─── queries ──────────────────────────────────────────
+    def search(self, variant, limit=None):
+        """[(pmid, title, [paragraphs mentioning the variant])], PMIDs in index order."""
+        terms = [t for t in core_terms(variant) if len(t) >= 3]
+        if not terms:
+            return []
+        pattern = variant_pattern(variant)
+        with stage_timer("local_index_search"):
+            rows = self._conn().execute(
+                "SELECT p.pmid, p.text FROM paragraphs_fts f "
+                "JOIN paragraphs p ON p.id = f.rowid "
+                "WHERE paragraphs_fts MATCH ? ORDER BY p.id",
+                (_fts_query(terms),)).fetchall()
+        hits = {}
+        for pmid, text in rows:
+            if pmid not in hits and limit and len(hits) >= limit:
+                break
+            if variant in text or pattern.search(text):
+                hits.setdefault(pmid, []).append(text)
+        if not hits:
+            return []
+        titles = self.titles(list(hits))
+        return [(pmid, titles.get(pmid, ""), paras) for pmid, paras in hits.items()]
+
+    def titles(self, pmids):
+        q = ",".join("?" * len(pmids))
+        return dict(self._conn().execute(
+            f"SELECT pmid, title FROM articles WHERE pmid IN ({q})", pmids))
+
+    def get_article(self, pmid):
+        row = self._conn().execute("SELECT content FROM articles WHERE pmid = ?", (pmid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def variant_data(self, variant):
+        """{pmid: content} for every cached article mentioning the variant."""
+        return {pmid: self.get_article(pmid) for pmid, _t, _p in self.search(variant)}
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "sources":    conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0],
+            "articles":   conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0],
+            "paragraphs": conn.execute("SELECT COUNT(*) FROM paragraphs").fetchone()[0],
+            "bytes":      os.path.getsize(self.path),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide LocalIndex, opened on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LocalIndex()
+        return _index
+
+
+def start_sync(base_dir=FULLTEXT_DIR):
+    """Sync the index with the store in a background thread (app start-up)."""
+    def run():
+        try:
+            t0 = time.perf_counter()
+            indexed, removed = get_index().sync(base_dir)
+            logger.info(f"Local index synced: {indexed} files indexed, {removed} removed "
+                        f"({time.perf_counter() - t0:.2f}s)")
+        except Exception:
+            logger.exception("Local index sync failed")
+    t = threading.Thread(target=run, name="local-index-sync", daemon=True)
+    t.start()
+    return t
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local full-text index over the cached corpus")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="sync the index with the full-text store")
+    p_build.add_argument("--data-dir", default=FULLTEXT_DIR)
+    p_build.add_argument("--rebuild", action="store_true", help="drop the index first")
+    p_search = sub.add_parser("search", help="PMIDs / paragraphs mentioning a variant")
+    p_search.add_argument("variant")
+    p_search.add_argument("--limit", type=int, default=None)
+    sub.add_parser("stats")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build" and args.rebuild and os.path.exists(LOCAL_INDEX_PATH):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(LOCAL_INDEX_PATH + suffix):
+                os.remove(LOCAL_INDEX_PATH + suffix)
+    index = get_index()
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        indexed, removed = index.sync(args.data_dir)
+        print(f"{indexed} files indexed, {removed} removed in {time.perf_counter() - t0:.2f}s")
+        print(json.dumps(index.stats()))
+    elif args.cmd == "search":
+        t0 = time.perf_counter()
+        hits = index.search(args.variant, args.limit)
+        ms = (time.perf_counter() - t0) * 1000
+        for pmid, title, paras in hits:
+            print(f"{pmid}  {title[:80]}  ({len(paras)} paragraphs)")
+        print(f"{len(hits)} PMIDs in {ms:.1f} ms")
+    else:
+        print(json.dumps(index.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
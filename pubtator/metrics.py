@@ -0,0 +1,130 @@
+# pubtator/metrics.py
+"""
+Prometheus metrics for the pipeline stages, served at /metrics.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory
+before the workers start; every worker then writes its samples there and
+/metrics aggregates them, so a scrape sees the whole server rather than the
+one worker that answered.  (Add ``child_exit = lambda server, worker:
+pubtator.metrics.mark_process_dead(worker.pid)`` to the gunicorn config.)
+
+If prometheus_client is not installed every metric is a no-op and /metrics
+answers 501.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from . import profiling
+
+try:
+    from prometheus_client import (Counter, Histogram, Gauge, CollectorRegistry,
+                                   generate_latest, CONTENT_TYPE_LATEST, multiprocess)
+except ImportError:  # metrics are optional
+    Counter = Histogram = Gauge = None
+
+ENABLED = Counter is not None
+
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1, 2.5, 5, 10, 30, 60, 120, 300)
+_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _NoOp:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+if ENABLED:
+    STAGE_SECONDS = Histogram(
+        "pubtator_stage_seconds",
+        "Wall time per pipeline stage",
+        ["stage"], buckets=_STAGE_BUCKETS)
+    BATCH_SIZE = Histogram(
+        "pubtator_model_batch_size",
+        "Rows per model forward pass",
+        ["model"], buckets=_BATCH_BUCKETS)
+    TOKENS = Counter(
+        "pubtator_tokens_total",
+        "Non-padding tokens fed to a model",
+        ["model"])
+    LIME_SAMPLES = Counter(
+        "pubtator_lime_samples_total",
+        "Perturbed texts scored by the classifier for LIME")
+    CACHE = Counter(
+        "pubtator_cache_requests_total",
+        "Cache lookups",
+        ["cache", "result"])
+    PUBTATOR_REQUESTS = Counter(
+        "pubtator_api_requests_total",
+        "Requests sent to the PubTator3 API",
+        ["endpoint", "status"])
+    ACTIVE_STREAMS = Gauge(
+        "pubtator_active_sse_streams",
+        "Open /search_inference_stream connections",
+        multiprocess_mode="livesum")
+    GPU_MEMORY = Gauge(
+        "pubtator_gpu_memory_bytes",
+        "CUDA caching allocator state (allocated / reserved / peak_allocated / free / total)",
+        ["kind"], multiprocess_mode="liveall")
+    GPU_RELEASES = Counter(
+        "pubtator_gpu_memory_releases_total",
+        "torch.cuda.empty_cache() calls by the memory manager",
+        ["reason"])
+    GPU_OOM_SPLITS = Counter(
+        "pubtator_gpu_oom_splits_total",
+        "Batches split in half after a CUDA out-of-memory error")
+else:
+    STAGE_SECONDS = BATCH_SIZE = TOKENS = LIME_SAMPLES = CACHE = \
+        PUBTATOR_REQUESTS = ACTIVE_STREAMS = GPU_MEMORY = GPU_RELEASES = \
+        GPU_OOM_SPLITS = _NoOp()
+
+
+@contextmanager
+def stage_timer(stage):
+    """with stage_timer("classify"): ... → pubtator_stage_seconds{stage="classify"}"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t1 = time.perf_counter()
+        STAGE_SECONDS.labels(stage=stage).observe(t1 - t0)
+        session = profiling.current()
+        if session is not None:
+            session.record_stage(stage, t0, t1)
+
+
+def cache_result(cache, hit):
+    CACHE.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """(body, status, headers) for the /metrics endpoint."""
+    if not ENABLED:
+        return "prometheus_client is not installed\n", 501, {"Content-Type": "text/plain"}
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        body = generate_latest(registry)
+    else:
+        body = generate_latest()
+    return body, 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+
+def mark_process_dead(pid):
+    """gunicorn child_exit hook: drop a dead worker's live gauges."""
+    if ENABLED and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,102 @@
+# pubtator/mock_pubtator.py
+"""
+Local stand-in for the PubTator3 API, served from stored full-text fixtures.
+
+  GET /search/?text=@<variant>&page=N            → {"results": [{"_id": pmid}], "total_pages": M}
+  GET /publications/export/biocxml?pmids=<pmid>  → BioC XML rebuilt with build_biocxml
+
+A variant is found when sanitize_filename(variant) matches a fixture file
+(<fixtures>/<variant>.json or .msgpack.zst), exactly like the app's own
+cache.  Latency, jitter, error rate and page size are configurable so
+fetch/parse/infer can be load-tested without touching NCBI:
+
+    python -m pubtator.mock_pubtator --port 8090 --latency 0.2 --error-rate 0.02
+    PT_PUBTATOR_API_BASE=http://127.0.0.1:8090 gunicorn -w 4 -b 0.0.0.0:8080 run_app:app
+"""
+
+import os
+import math
+import time
+import random
+import argparse
+
+from flask import Flask, request, jsonify, Response
+
+from .config import FULLTEXT_DIR
+from .file_utils import load_variant_files
+from .parser_utils import sanitize_filename, build_biocxml
+from .variant_norm import variant_key
+
+
+def create_mock_app(fixtures_dir=FULLTEXT_DIR, latency=0.0, jitter=0.0,
+                    error_rate=0.0, page_size=10, seed=None):
+    app = Flask(__name__)
+    rng = random.Random(seed)
+
+    variants, articles = {}, {}
+    for stem, data in load_variant_files(fixtures_dir):
+        variants[stem] = list(data.keys())
+        articles.update(data)
+
+    def delay_or_fail():
+        """Simulated network latency; returns an error response or None."""
+        wait = latency + rng.uniform(-jitter, jitter) if jitter else latency
+        if wait > 0:
+            time.sleep(wait)
+        if error_rate and rng.random() < error_rate:
+            status = rng.choice([429, 500, 502, 503])
+            return Response(f"simulated error {status}", status=status)
+        return None
+
+    @app.route("/search/")
+    def search():
+        err = delay_or_fail()
+        if err is not None:
+            return err
+        text = request.args.get("text", "").lstrip("@")
+        page = max(1, int(request.args.get("page", 1) or 1))
+        pmids = variants.get(sanitize_filename(text)) or variants.get(variant_key(text), [])
+        total_pages = max(1, math.ceil(len(pmids) / page_size))
+        chunk = pmids[(page - 1) * page_size: page * page_size]
+        return jsonify({
+            "results":     [{"_id": pmid} for pmid in chunk],
+            "count":       len(pmids),
+            "page":        page,
+            "total_pages": total_pages,
+        })
+
+    @app.route("/publications/export/biocxml")
+    def export_biocxml():
+        err = delay_or_fail()
+        if err is not None:
+            return err
+        pmid = request.args.get("pmids", "").split(",")[0].strip()
+        content = articles.get(pmid)
+        if content is None:
+            # PubTator answers an empty collection for unknown PMIDs
+            return Response("<collection><source>PubTator</source></collection>",
+                            mimetype="application/xml")
+        return Response(build_biocxml(pmid, content), mimetype="application/xml")
+
+    @app.route("/healthz")
+    def healthz():
+        return jsonify({"variants": len(variants), "articles": len(articles)})
+
+    return app
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Mock PubTator3 API for load tests")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--fixtures", default=FULLTEXT_DIR,
+                    help="directory of <variant> full-text files (any storage format)")
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    ap.add_argument("--jitter", type=float, default=0.0, help="± seconds around --latency")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    ap.add_argument("--page-size", type=int, default=10, help="PMIDs per search page")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    create_mock_app(os.path.abspath(args.fixtures), args.latency, args.jitter,
+                    args.error_rate, args.page_size, args.seed) \
+        .run(host=args.host, port=args.port, threaded=True)
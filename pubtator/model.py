@@ -32,6 +32,7 @@ class BioMedBERTClassifier(nn.Module):
         )
         self.dropout = nn.Dropout(dropout_rate)
         self.use_transformer = use_transformer
+        self.hidden_size = cfg.hidden_size
 
         if self.use_transformer:
             transformer_config = transformer_config or {}
@@ -59,13 +60,25 @@ class BioMedBERTClassifier(nn.Module):
         flat_mask = attention_mask.view(B * P, L)
         flat_token = token_type_ids.view(B * P, L) if token_type_ids is not None else None
 
+        pooled = self.encode(flat_ids, flat_mask, flat_token).view(B, P, -1)
+        return self.classify_pooled(pooled)
+
+    def encode(
+        self,
+        input_ids: torch.LongTensor,
+        attention_mask: torch.LongTensor,
+        token_type_ids: torch.LongTensor = None
+    ) -> torch.Tensor:
+        """段落 [N, L] → BERT pooler_output [N, H]（整個模型最貴的部分）"""
         outputs = self.bert(
-            input_ids=flat_ids,
-            attention_mask=flat_mask,
-            token_type_ids=flat_token
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids
         )
-        pooled = outputs.pooler_output.view(B, P, -1)
+        return outputs.pooler_output
 
+    def classify_pooled(self, pooled: torch.Tensor) -> torch.Tensor:
+        """已算好的段落向量 [B, P, H] → logits [B, num_labels]（只跑聚合層與分類頭）"""
         if self.use_transformer:
             t_in = pooled.permute(1, 0, 2) # [P, B, H]
             t_out = self.transformer_encoder(t_in)
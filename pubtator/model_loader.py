@@ -0,0 +1,102 @@
+# pubtator/model_loader.py
+"""
+Background model loading / warm-up for the Flask app.
+
+Models are registered with a load function (and an optional warm-up that
+runs a dummy forward pass to prime kernels and allocators) and loaded one by
+one in a daemon thread, so cheap routes can be served while workers boot.
+Each model's state and timings are exposed for /healthz and /readyz.
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+class ModelLoader:
+    def __init__(self):
+        self._specs = []                 # [(name, load_fn, warm_fn, required)]
+        self._models = {}
+        self._state = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, load_fn, warm_fn=None, required=True):
+        """
+        load_fn(loader) -> model object; it may call loader.get() for models
+        registered before it.  warm_fn(model) runs once after loading.
+        """
+        self._specs.append((name, load_fn, warm_fn, required))
+        self._events[name] = threading.Event()
+        self._state[name] = {
+            "status":         "pending",
+            "required":       required,
+            "load_seconds":   None,
+            "warmup_seconds": None,
+            "error":          None,
+        }
+
+    def start(self):
+        """Load every registered model in a background thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-warmup",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name, load_fn, warm_fn, _required in self._specs:
+            state = self._state[name]
+            try:
+                state["status"] = "loading"
+                t0 = time.perf_counter()
+                model = load_fn(self)
+                state["load_seconds"] = round(time.perf_counter() - t0, 3)
+                self._models[name] = model
+
+                if warm_fn is not None:
+                    state["status"] = "warming"
+                    t0 = time.perf_counter()
+                    warm_fn(model)
+                    state["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+                state["status"] = "ready"
+                logger.info(f"Model '{name}' ready (load {state['load_seconds']}s, "
+                            f"warm-up {state['warmup_seconds']}s)")
+            except Exception as e:
+                state["status"] = "failed"
+                state["error"] = f"{type(e).__name__}: {e}"
+                logger.exception(f"Failed to load model '{name}'")
+            finally:
+                self._events[name].set()
+
+    def wait(self, names=None, timeout=None):
+        """Block until the given models (default: required ones) are ready."""
+        names = names or [n for n, *_rest, req in self._specs if req]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not self._events[name].wait(remaining):
+                return False
+            if self._state[name]["status"] != "ready":
+                return False
+        return True
+
+    def get(self, name, timeout=None):
+        if not self.wait([name], timeout):
+            raise ModelNotReady(f"model '{name}' is {self._state[name]['status']}")
+        return self._models[name]
+
+    @property
+    def ready(self):
+        return all(s["status"] == "ready" for s in self._state.values() if s["required"])
+
+    def status(self):
+        return {name: dict(state) for name, state in self._state.items()}
@@ -1,16 +1,20 @@
 # pubtator/ner_entity.py
 import os
 import html
+import threading
 from collections import Counter
 from flask import Blueprint, render_template, request
 from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
 from .config import NER_MODEL_DIR, WINDOW_SIZE, STRIDE
+from .metrics import stage_timer
 
 # Blueprint
 ner_bp = Blueprint("ner_entity", __name__, template_folder="templates")
 
 # 只有真正调用时才加载模型
 _ner_pipe = None
+# create_app() 的背景 warm-up 和 /ner_entity 可能同時第一次呼叫，只能載入一份
+_ner_lock = threading.Lock()
 _COLOR_MAP = {
     "gene": "lightblue", "disease": "lightgreen", "chemical": "lightpink",
     "variant": "red", "species": "khaki", "cellline": "lightcoral",
@@ -20,15 +24,17 @@ _COLOR_MAP = {
 def get_ner_pipe():
     global _ner_pipe
     if _ner_pipe is None:
-        tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_DIR)
-        model     = AutoModelForTokenClassification.from_pretrained(NER_MODEL_DIR)
-        _ner_pipe = pipeline(
-            "token-classification",
-            model=model,
-            tokenizer=tokenizer,
-            aggregation_strategy="simple",
-            device=0  # 如果没有 GPU，改成 device=-1
-        )
+        with _ner_lock:
+            if _ner_pipe is None:
+                tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_DIR)
+                model     = AutoModelForTokenClassification.from_pretrained(NER_MODEL_DIR)
+                _ner_pipe = pipeline(
+                    "token-classification",
+                    model=model,
+                    tokenizer=tokenizer,
+                    aggregation_strategy="simple",
+                    device=0  # 如果没有 GPU，改成 device=-1
+                )
     return _ner_pipe
 
 def ner_highlight_html(text: str):
@@ -38,13 +44,14 @@ def ner_highlight_html(text: str):
 
     spans = []
     length = len(raw)
-    for start in range(0, length, STRIDE):
-        seg = raw[start:start+WINDOW_SIZE]
-        for ent in get_ner_pipe()(seg):
-            s, e = ent["start"], ent["end"]
-            spans.append((start + s, start + e, ent["entity_group"]))
-        if start + WINDOW_SIZE >= length:
-            break
+    with stage_timer("ner"):
+        for start in range(0, length, STRIDE):
+            seg = raw[start:start+WINDOW_SIZE]
+            for ent in get_ner_pipe()(seg):
+                s, e = ent["start"], ent["end"]
+                spans.append((start + s, start + e, ent["entity_group"]))
+            if start + WINDOW_SIZE >= length:
+                break
 
     unique_spans = sorted(set(spans), key=lambda x: x[0])
 
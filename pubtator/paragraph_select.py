@@ -0,0 +1,137 @@
+# pubtator/paragraph_select.py
+"""
+Relevance-ranked paragraph selection for one article.
+
+extract_variant_paragraphs returns every line that mentions the variant,
+however many and however long, and InferenceDataset then keeps the first
+max_paragraphs lines / stride windows in document order.  So compute per
+PMID grows with article length, and a Results paragraph can be dropped in
+favour of a Methods line that happened to come first.
+
+select_variant_paragraphs turns the variant-mentioning lines into
+candidate windows of at most max_length - 2 tokens (short lines as they
+are, long lines as stride windows like InferenceDataset's, but cut at
+word boundaries of the original text),
+scores each one and keeps the best within a per-document budget:
+
+  score = SECTION_WEIGHTS[section] + proximity
+  proximity = 1 / (1 + d / window), d = tokens from the window to the
+              nearest variant mention (1.0 when the window contains one)
+
+Windows are taken best-first until max_paragraphs or PARA_TOKEN_BUDGET
+tokens are used, then returned in document order.  Every window fits the
+model input, so InferenceDataset neither splits nor drops them and the
+classifier and LIME see exactly these texts.
+"""
+
+import re
+import bisect
+import itertools
+
+from .config import PARA_SELECT, PARA_TOKEN_BUDGET
+from .metrics import stage_timer
+from .parser_utils import extract_variant_paragraphs
+from .variant_norm import variant_pattern
+
+# Results / Discussion carry the evidence a curator looks for; Methods
+# mostly lists the variant among genotyped ones
+SECTION_WEIGHTS = {
+    "results":      1.0,
+    "discussion":   0.9,
+    "abstract":     0.8,
+    "conclusion":   0.7,
+    "introduction": 0.4,
+    "methods":      0.3,
+}
+DEFAULT_SECTION_WEIGHT = 0.5
+
+
+def _mention_offsets(line, variant, pattern):
+    starts = {m.start() for m in pattern.finditer(line)}
+    pos = line.find(variant)
+    while pos != -1:
+        starts.add(pos)
+        pos = line.find(variant, pos + 1)
+    return sorted(starts)
+
+
+def candidate_windows(content, variant, tokenizer, window, stride):
+    """
+    [(order, section, text, n_tokens, distance)] for the lines of an
+    article that mention the variant; distance is in tokens (0 = contains it).
+    Long lines are cut at word boundaries, so windows keep the original text.
+    """
+    pattern = variant_pattern(variant)
+    out = []
+    for section, text in content.items():
+        if section.lower() in ("title", "pubmed_link") or not text:
+            continue
+        for line in text.split("\n"):
+            line = line.strip()
+            offsets = _mention_offsets(line, variant, pattern)
+            if not offsets:
+                continue
+            words = [(m.start(), m.end()) for m in re.finditer(r"\S+", line)]
+            n_toks = [len(tokenizer.tokenize(line[s:e])) for s, e in words]
+            if sum(n_toks) <= window:
+                out.append((len(out), section, line, sum(n_toks), 0))
+                continue
+            # token offset of every word, and of every mention
+            tok_start = list(itertools.accumulate([0] + n_toks[:-1]))
+            mentions = [tok_start[bisect.bisect_right(words, (o, len(line))) - 1]
+                        for o in offsets]
+            first = 0
+            for start in range(0, tok_start[-1] + n_toks[-1], stride):
+                while first < len(words) - 1 and tok_start[first] < start:
+                    first += 1
+                last, used = first, n_toks[first]
+                while last + 1 < len(words) and used + n_toks[last + 1] <= window:
+                    last += 1
+                    used += n_toks[last]
+                lo, hi = tok_start[first], tok_start[first] + used
+                dist = min(0 if lo <= m < hi else min(abs(m - lo), abs(m - hi + 1))
+                           for m in mentions)
+                out.append((len(out), section, line[words[first][0]:words[last][1]],
+                            used, dist))
+                if last == len(words) - 1:
+                    break
+    return out
+
+
+def window_score(section, distance, window):
+    weight = SECTION_WEIGHTS.get(section.lower(), DEFAULT_SECTION_WEIGHT)
+    return weight + 1.0 / (1.0 + distance / window)
+
+
+def select_variant_paragraphs(content, variant, tokenizer, config, token_budget=None):
+    """
+    Top-scoring variant windows of one article, in document order: at most
+    max_paragraphs of them and token_budget tokens (default PARA_TOKEN_BUDGET,
+    0 = max_paragraphs * window).  [] when the article never mentions it.
+    """
+    max_length = config['data']['max_length']
+    max_paragraphs = config['data']['max_paragraphs']
+    window = max_length - 2
+    stride = config['data'].get('stride', 128)
+    budget = token_budget if token_budget is not None else PARA_TOKEN_BUDGET
+    budget = budget or max_paragraphs * window
+
+    candidates = candidate_windows(content, variant, tokenizer, window, stride)
+    ranked = sorted(candidates, key=lambda c: (-window_score(c[1], c[4], window), c[0]))
+    chosen, used = [], 0
+    for cand in ranked:
+        if len(chosen) >= max_paragraphs:
+            break
+        if chosen and used + cand[3] > budget:
+            continue
+        chosen.append(cand)
+        used += cand[3]
+    return [text for _order, _section, text, _n, _d in sorted(chosen)]
+
+
+def variant_paragraphs(content, variant, tokenizer, config):
+    """The paragraphs of an article that go to the classifier and LIME (PT_PARA_SELECT=0: all mentions)."""
+    if not PARA_SELECT:
+        return extract_variant_paragraphs(content, variant)
+    with stage_timer("paragraph_select"):
+        return select_variant_paragraphs(content, variant, tokenizer, config)
@@ -0,0 +1,323 @@
+# pubtator/parity.py
+"""
+Prediction-parity harness: golden outputs for the bundled corpus, and a
+check of any backend / batching configuration against them.
+
+`record` runs the reference configuration over the corpus and stores, per
+(variant, PMID), the classifier input paragraphs, the predicted label, the
+class probabilities and the LIME sentence weights (first --lime-pmids
+PMIDs).  `check` replays the stored paragraphs through the configuration
+under test (tokenization, batched classification, LIME scoring) and
+reports the drift of every PMID:
+
+  label        predicted label differs (always a failure)
+  prob         max |Δp| over the classes            > --prob-tol fails
+  weight       max |Δw| over the sentence weights   > --weight-tol fails
+  buckets      sentences whose highlight color changed (reported)
+
+LIME is seeded per PMID (--seed and the PMID), so sampling is identical
+between runs and weight drift comes from the scorer alone.  By default the
+model is the tiny random checkpoint of pubtator.tiny_model, rebuilt
+deterministically from the corpus, so no download or GPU is needed; pass
+--config for a real checkpoint.  The configuration under test is the
+command line (--backend, --batch-size, --device) plus the usual switches
+(PT_EMBED_CACHE, PT_GPU_AUTOCAST, ...).  Goldens are tied to the checkpoint
+weights and to the sentence segmenter (punkt or the regex fallback; check
+exits 2 on a mismatch of either), so record them on the commit before a
+change and check on the change, with the same torch / transformers / NLTK
+data.
+
+    python -m pubtator.parity record --output parity/golden.json
+    PT_GPU_AUTOCAST=bf16 python -m pubtator.parity check --golden parity/golden.json \\
+        --batch-size 16 --prob-tol 5e-3 --report parity/bf16.json
+    python -m pubtator.parity check --golden parity/golden.json --backend torchscript
+"""
+
+import io
+import os
+import sys
+import json
+import zlib
+import pickle
+import hashlib
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+
+import numpy as np
+import torch
+from transformers import BertTokenizer
+
+from .config import FULLTEXT_DIR, EMBED_CACHE, PARA_SELECT
+from . import embedding_cache
+from .backends import BACKENDS, artifact_path, load_backend
+from .benchmark import load_corpus, _git_commit
+from .paragraph_select import variant_paragraphs
+from .predict import load_classifier_config, build_classifier, predict_probabilities
+from .sentence_seg import segment_batch, segmenter_id
+from .lime_interpret_sentences import make_explainer, explain_sentences, weight_color
+from .tiny_model import build_tiny_checkpoint, corpus_texts
+
+CLASS_NAMES = ["benign", "pathogenic"]
+
+
+# ─── model under test ──────────────────────────────────────
+def weights_digest(model_path):
+    """sha1 over the checkpoint tensors (stable across re-saves and temp dirs)."""
+    state = torch.load(model_path, map_location="cpu")
+    h = hashlib.sha1()
+    for name in sorted(state):
+        h.update(name.encode())
+        h.update(state[name].cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def classifier_config(config_path, data_dir, seed):
+    """The given config, or a tiny random checkpoint built from the corpus in a temp dir."""
+    if config_path:
+        yield load_classifier_config(config_path), False
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = build_tiny_checkpoint(tmp, corpus_texts(data_dir), seed=seed)
+        yield load_classifier_config(path), True
+
+
+def load_model(config, backend, device, tiny):
+    """The classifier as setup_inference would serve it with this backend."""
+    if backend == "torch":
+        model = build_classifier(config, device)
+        if EMBED_CACHE:
+            embedding_cache.attach(model, config)
+        return model
+    if tiny and not os.path.exists(artifact_path(config, backend)):
+        from .export_model import export
+        export(config, backend)
+    return load_backend(config, backend, device)
+
+
+def load_id2label(config):
+    with open(os.path.join(config['paths']['split_data_dir'], 'id2label.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+# ─── one run over the items ────────────────────────────────
+def _pmid_seed(seed, variant, pmid):
+    return (seed * 1_000_003 + zlib.crc32(f"{variant}\t{pmid}".encode())) % (2 ** 32)
+
+
+def lime_weights(paragraphs, model, tokenizer, device, num_samples, adaptive, seed):
+    """[[sentence, weight], ...] per paragraph, with the production LIME path and a fixed seed."""
+    explainer = make_explainer(CLASS_NAMES, random_state=np.random.RandomState(seed))
+    out = []
+    for sentences in segment_batch(paragraphs):
+        if not sentences:
+            out.append([])
+            continue
+        weights, _used = explain_sentences(sentences, explainer, model, tokenizer, device,
+                                           num_samples=num_samples, adaptive=adaptive)
+        out.append([[s.strip(), float(weights.get(s.strip(), 0.0))] for s in sentences])
+    return out
+
+
+def run_items(items, config, model, tokenizer, id2label, device, args):
+    """Fill prediction / probs (and lime for the first args.lime_pmids) into copies of items."""
+    probs = predict_probabilities([it["paragraphs"] for it in items], config, model,
+                                  tokenizer, args.batch_size).tolist()
+    labels = [id2label[i] for i in sorted(id2label)]
+    out = []
+    for i, (item, p) in enumerate(zip(items, probs)):
+        row = {"variant": item["variant"], "pmid": item["pmid"], "paragraphs": item["paragraphs"],
+               "prediction": id2label.get(int(np.argmax(p)), "Unknown"),
+               "probs": dict(zip(labels, p)), "lime": None}
+        if i < args.lime_pmids:
+            row["lime"] = lime_weights(item["paragraphs"], model, tokenizer, device,
+                                       args.num_samples, args.adaptive,
+                                       _pmid_seed(args.seed, item["variant"], item["pmid"]))
+        out.append(row)
+    return out
+
+
+def corpus_items(config, tokenizer, data_dir, max_variants, max_pmids):
+    """(variant, PMID, classifier paragraphs) for the bundled corpus, in a stable order."""
+    items = []
+    for variant, _path, data in load_corpus(data_dir, max_variants):
+        for pmid in sorted(data):
+            paras = variant_paragraphs(data[pmid], variant, tokenizer, config)
+            if paras:
+                items.append({"variant": variant, "pmid": pmid, "paragraphs": paras})
+    return items[:max_pmids] if max_pmids else items
+
+
+def _meta(args, config, tiny, device):
+    return {
+        "commit":       _git_commit(),
+        "timestamp":    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "torch":        torch.__version__,
+        "device":       str(device),
+        "checkpoint":   "tiny-random" if tiny else args.config,
+        "weights_sha1": weights_digest(config['paths']['best_model_path']),
+        "segmenter":    segmenter_id(),
+        "backend":      args.backend,
+        "batch_size":   args.batch_size,
+        "seed":         args.seed,
+        "num_samples":  args.num_samples,
+        "adaptive":     args.adaptive,
+        "para_select":  PARA_SELECT,
+        "embed_cache":  EMBED_CACHE,
+        "autocast":     os.getenv("PT_GPU_AUTOCAST", ""),
+    }
+
+
+# ─── comparison ────────────────────────────────────────────
+def compare_item(golden, current, prob_tol, weight_tol):
+    """Drift of one PMID between the golden and the current run."""
+    prob_diff = max(abs(golden["probs"][k] - current["probs"].get(k, 0.0)) for k in golden["probs"])
+    row = {
+        "variant":    golden["variant"],
+        "pmid":       golden["pmid"],
+        "golden":     golden["prediction"],
+        "prediction": current["prediction"],
+        "label_flip": golden["prediction"] != current["prediction"],
+        "prob_diff":  prob_diff,
+        "weight_diff": None,
+        "bucket_changes": 0,
+        "sentences_changed": False,
+    }
+    if golden.get("lime") is not None and current.get("lime") is not None:
+        diffs = []
+        for g_para, c_para in zip(golden["lime"], current["lime"]):
+            if [s for s, _w in g_para] != [s for s, _w in c_para]:
+                row["sentences_changed"] = True
+                continue
+            for (_s, gw), (_s2, cw) in zip(g_para, c_para):
+                diffs.append(abs(gw - cw))
+                row["bucket_changes"] += weight_color(gw) != weight_color(cw)
+        row["weight_diff"] = max(diffs, default=0.0)
+    row["ok"] = (not row["label_flip"] and prob_diff <= prob_tol
+                 and not row["sentences_changed"]
+                 and (row["weight_diff"] is None or row["weight_diff"] <= weight_tol))
+    return row
+
+
+def summarize(rows, prob_tol, weight_tol):
+    probs = sorted(r["prob_diff"] for r in rows)
+    weights = sorted(r["weight_diff"] for r in rows if r["weight_diff"] is not None)
+    return {
+        "pmids":          len(rows),
+        "failed":         sum(not r["ok"] for r in rows),
+        "label_flips":    sum(r["label_flip"] for r in rows),
+        "bucket_changes": sum(r["bucket_changes"] for r in rows),
+        "max_prob_diff":  probs[-1] if probs else 0.0,
+        "p95_prob_diff":  probs[int(0.95 * (len(probs) - 1))] if probs else 0.0,
+        "max_weight_diff": weights[-1] if weights else None,
+        "prob_tol":       prob_tol,
+        "weight_tol":     weight_tol,
+    }
+
+
+def print_report(summary, rows, top=20):
+    print(f"{'variant':<22}{'pmid':>10}{'golden':>12}{'now':>12}{'|Δp|':>11}{'|Δw|':>10}{'colors':>8}  ok")
+    worst = sorted(rows, key=lambda r: (r["ok"], -r["prob_diff"], -(r["weight_diff"] or 0)))
+    for r in worst[:top]:
+        wd = "-" if r["weight_diff"] is None else f"{r['weight_diff']:.2e}"
+        print(f"{r['variant'][:21]:<22}{r['pmid']:>10}{r['golden']:>12}{r['prediction']:>12}"
+              f"{r['prob_diff']:>11.2e}{wd:>10}{r['bucket_changes']:>8}  {'✓' if r['ok'] else '✗'}")
+    print(json.dumps(summary, indent=2))
+
+
+# ─── commands ──────────────────────────────────────────────
+def record(args):
+    device = torch.device(args.device)
+    with classifier_config(args.config, args.data_dir, args.seed) as (config, tiny):
+        tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+        model = load_model(config, args.backend, device, tiny)
+        items = corpus_items(config, tokenizer, args.data_dir, args.max_variants, args.max_pmids)
+        rows = run_items(items, config, model, tokenizer, load_id2label(config), device, args)
+        golden = {"meta": _meta(args, config, tiny, device), "items": rows}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1)
+    n_lime = sum(r["lime"] is not None for r in rows)
+    print(f"Recorded {len(rows)} PMIDs ({n_lime} with LIME weights) to {args.output}")
+    return 0
+
+
+def check(args):
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+    meta = golden["meta"]
+    # replay the golden's sampling settings unless overridden
+    args.seed = meta["seed"] if args.seed is None else args.seed
+    args.num_samples = meta["num_samples"] if args.num_samples is None else args.num_samples
+    args.adaptive = meta["adaptive"] if args.adaptive is None else args.adaptive
+    args.lime_pmids = sum(r["lime"] is not None for r in golden["items"])
+    device = torch.device(args.device)
+
+    with classifier_config(args.config, args.data_dir, meta["seed"]) as (config, tiny):
+        sha = weights_digest(config['paths']['best_model_path'])
+        if sha != meta["weights_sha1"]:
+            print(f"Checkpoint differs from the golden's ({sha[:12]} vs {meta['weights_sha1'][:12]}); "
+                  f"record new goldens or pass the same --config", file=sys.stderr)
+            return 2
+        # LIME rows are per sentence; another segmenter is an environment
+        # difference, not drift (goldens from before this key skip the check)
+        if meta.get("segmenter", segmenter_id()) != segmenter_id():
+            print(f"Sentence segmenter differs from the golden's ({segmenter_id()} vs "
+                  f"{meta['segmenter']}); install the same NLTK punkt data or record "
+                  f"new goldens", file=sys.stderr)
+            return 2
+        tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+        model = load_model(config, args.backend, device, tiny)
+        current = run_items(golden["items"], config, model, tokenizer,
+                            load_id2label(config), device, args)
+        run_meta = _meta(args, config, tiny, device)
+
+    rows = [compare_item(g, c, args.prob_tol, args.weight_tol)
+            for g, c in zip(golden["items"], current)]
+    summary = summarize(rows, args.prob_tol, args.weight_tol)
+    print_report(summary, rows, args.top)
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"golden": meta, "run": run_meta, "summary": summary, "pmids": rows},
+                      f, ensure_ascii=False, indent=1)
+        print(f"Report written to {args.report}")
+    return 0 if not summary["failed"] else 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Record / check golden classifier and LIME outputs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_rec = sub.add_parser("record", help="write goldens for the bundled corpus")
+    p_rec.add_argument("--output", required=True, help="golden JSON to write")
+    p_rec.add_argument("--max-variants", type=int, default=None)
+    p_rec.add_argument("--max-pmids", type=int, default=200)
+    p_rec.add_argument("--lime-pmids", type=int, default=16, help="PMIDs that also get LIME weights")
+    p_rec.add_argument("--seed", type=int, default=0)
+    p_rec.add_argument("--num-samples", type=int, default=100)
+    p_rec.add_argument("--adaptive", action="store_true")
+    p_chk = sub.add_parser("check", help="compare a configuration against goldens")
+    p_chk.add_argument("--golden", required=True)
+    p_chk.add_argument("--prob-tol", type=float, default=1e-4, help="max allowed |Δ probability|")
+    p_chk.add_argument("--weight-tol", type=float, default=1e-3, help="max allowed |Δ LIME weight|")
+    p_chk.add_argument("--report", default=None, help="write the per-PMID drift JSON here")
+    p_chk.add_argument("--top", type=int, default=20, help="PMIDs to list, worst first")
+    p_chk.add_argument("--seed", type=int, default=None, help="default: the golden's")
+    p_chk.add_argument("--num-samples", type=int, default=None, help="default: the golden's")
+    p_chk.add_argument("--adaptive", action="store_true", default=None)
+    for p in (p_rec, p_chk):
+        p.add_argument("--data-dir", default=FULLTEXT_DIR)
+        p.add_argument("--config", default=None,
+                       help="classifier config.yaml (default: the tiny random checkpoint)")
+        p.add_argument("--backend", choices=BACKENDS, default="torch")
+        p.add_argument("--batch-size", type=int, default=8, help="PMIDs per classifier forward")
+        p.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    args = ap.parse_args(argv)
+    return record(args) if args.cmd == "record" else check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import os
 import requests
 import json
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from .fetch_utils import fetch_pmid_data, fetch_full_text_via_api
 
 
@@ -134,6 +135,57 @@ def parse_biocxml(xml_data, pmid):
     return {pmid: result_sections}
 
 
+# 存檔用的 section 名稱 → BioC section_type (build_biocxml 用)
+_SECTION_TYPES = {
+    "Title": "TITLE", "Abstract": "ABSTRACT", "Introduction": "INTRO",
+    "Methods": "METHODS", "Results": "RESULTS", "Conclusion": "CONCL",
+    "Discussion": "DISCUSS",
+}
+
+
+def build_biocxml(pmid, content):
+    """
+    parse_biocxml 的反向：把存好的 {section: text} 還原成 PubTator 風格的 BioC XML，
+    給 mock server 與 benchmark 使用。
+    """
+    passages = []
+    for section, text in content.items():
+        sec_type = _SECTION_TYPES.get(section)
+        if not sec_type or not text:
+            continue
+        for para in text.split("\n\n"):
+            passages.append(
+                "<passage>"
+                f'<infon key="section_type">{sec_type}</infon>'
+                '<infon key="type">paragraph</infon>'
+                f"<text>{escape(para.strip())}</text>"
+                "</passage>"
+            )
+    return (
+        "<collection><source>PubTator</source>"
+        f'<document><id>{pmid}</id><infon key="article-id_pmid">{pmid}</infon>'
+        + "".join(passages) +
+        "</document></collection>"
+    )
+
+
+def extract_variant_paragraphs(content, variant):
+    """
+    回傳一篇文章中 (Title / PubMed_Link 以外) 所有提到 variant 的段落 (已 strip)。
+    同一變異的其他寫法 (p.Arg911Ter / p.R911X / p.Arg911*) 也算提到。
+    """
+    from .variant_norm import variant_pattern  # variant_norm 需要 sanitize_filename
+    pattern = variant_pattern(variant)
+    paras = []
+    for section, text in content.items():
+        if section.lower() in ("title", "pubmed_link"):
+            continue
+        for line in text.split("\n"):
+            if variant in line or pattern.search(line):
+                paras.append(line.strip())
+    return paras
+
+
 def sanitize_filename(name):
     invalid_chars = ['\\', '/', ':', '*', '?', '"', '<', '>', '|']
     for c in invalid_chars:
@@ -141,6 +193,8 @@ def sanitize_filename(name):
     return name
 
 if __name__ == "__main__":
+    from .file_utils import variant_data_path, save_variant_data
+
     base_output_dir = "PubTator3_data/full_text"
     pmid_list_file = "PubTator3_data/pmid_list.json"
     os.makedirs(base_output_dir, exist_ok=True)
@@ -193,9 +247,8 @@ if __name__ == "__main__":
             already_fetched_pmids.add(pmid)
 
         if variant_data:
-            output_file = os.path.join(base_output_dir, f"{sanitized_variant}.json")
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(variant_data, f, indent=4, ensure_ascii=False)
+            output_file = variant_data_path(base_output_dir, sanitized_variant)
+            save_variant_data(variant_data, output_file)
             print(f"variant {variant} 的全文數據已保存到 {output_file}")
         else:
             print(f"variant {variant} 沒有任何文章符合指定段落。")
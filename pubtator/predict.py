@@ -3,8 +3,12 @@ import os, yaml, pickle, json, warnings, inspect
 import torch
 from torch.utils.data import Dataset, DataLoader
 from transformers import BertTokenizer
-from .config import CLASSIFIER_CONFIG_YAML
+from .config import CLASSIFIER_CONFIG_YAML, EMBED_CACHE, CLASSIFIER_BACKEND
 from .ner_entity import ner_pipe
+from .metrics import stage_timer, BATCH_SIZE, TOKENS
+from . import embedding_cache
+from . import backends
+from .gpu_memory import memory
 import importlib  # 新增
 
 # 載入本 package 底下的 model.py
@@ -58,14 +62,13 @@ class InferenceDataset(Dataset):
         return {"input_ids":ids, "attention_mask":mask}
 
 
-def setup_inference(config_path=None):
-    cfg_file = config_path or CLASSIFIER_CONFIG_YAML
-    with open(cfg_file) as f:
-        config = yaml.safe_load(f)
-    print("Starting inference setup...")
-    split = config['paths']['split_data_dir']
-    with open(os.path.join(split,'id2label.pkl'),'rb') as f: id2label = pickle.load(f)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+def load_classifier_config(config_path=None):
+    with open(config_path or CLASSIFIER_CONFIG_YAML) as f:
+        return yaml.safe_load(f)
+
+
+def build_classifier(config, device):
+    """依 config 建立 eager PyTorch 分類模型並載入 best_model_path 權重"""
     model_type = config['model']['type']
     ModelCls = MODEL_CLASSES[model_type]
     # 過濾 __init__ 可接受的參數
@@ -78,38 +81,87 @@ def setup_inference(config_path=None):
     params = {k:v for k,v in allp.items() if k in valid}
     model  = ModelCls(**params)
     model.load_state_dict(torch.load(config['paths']['best_model_path'],map_location=device))
-    model.to(device).eval()
+    return model.to(device).eval()
+
+
+def setup_inference(config_path=None):
+    config = load_classifier_config(config_path)
+    print("Starting inference setup...")
+    split = config['paths']['split_data_dir']
+    with open(os.path.join(split,'id2label.pkl'),'rb') as f: id2label = pickle.load(f)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # backend: torch（預設）/ torchscript / onnx，見 pubtator.backends
+    backend = CLASSIFIER_BACKEND or config.get('inference', {}).get('backend', 'torch')
+    if backend != "torch":
+        model = backends.load_backend(config, backend, device)
+        print(f"Classification model loaded ({backend}).")
+        return config, model, id2label, None, model.device
+    model = build_classifier(config, device)
+    if EMBED_CACHE:
+        embedding_cache.attach(model, config)
     print("Classification model loaded.")
     return config, model, id2label, None, device
 
 
-def predict_classification(texts, config, model, id2label):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    tokenizer = BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
-    ds = InferenceDataset(texts, tokenizer,
-                          max_length=config['data']['max_length'],
-                          max_paragraphs=config['data']['max_paragraphs'],
-                          stride=config['data'].get('stride',128))
-    dl = DataLoader(ds, batch_size=1, shuffle=False)
-    preds = []
+def classify_samples(samples, model, device, batch_size=1):
+    """
+    samples: InferenceDataset.samples 的 (input_ids, attention_mask) list，
+    可以來自不同文章/variant；每 batch_size 筆一起 forward。回傳 softmax 機率 [N, C]。
+    model 掛了 embedding_cache 時，已知段落直接讀快取向量，只跑聚合層與分類頭。
+    GPU 上實際 batch 大小由 gpu_memory.memory 依剩餘記憶體決定，OOM 時自動對半切重跑。
+    """
+    cache = getattr(model, "embedding_cache", None)
     model.eval()
-    with torch.no_grad():
-        for batch in dl:
-            ids  = batch['input_ids'].to(device)
-            attn = batch['attention_mask'].to(device)
-            out  = model(input_ids=ids, attention_mask=attn)
-            idxs = torch.argmax(out, dim=1).cpu().tolist()
-            for i in idxs:
-                preds.append(id2label.get(i,"Unknown"))
-    return preds
+
+    def forward(chunk):
+        ids  = torch.stack([s[0] for s in chunk]).to(device)
+        attn = torch.stack([s[1] for s in chunk]).to(device)
+        BATCH_SIZE.labels(model="classifier").observe(ids.shape[0] * ids.shape[1])
+        TOKENS.labels(model="classifier").inc(int(attn.sum()))
+        with memory.autocast(model, device):
+            if cache is not None:
+                B, P, L = ids.shape
+                pooled = embedding_cache.pooled_embeddings(
+                    model, ids.view(B * P, L).cpu(), attn.view(B * P, L).cpu(), cache, device)
+                out = model.classify_pooled(pooled.view(B, P, -1))
+            else:
+                out  = model(input_ids=ids, attention_mask=attn)
+        return torch.softmax(out.float(), dim=1).cpu()
+
+    if not samples:
+        return torch.empty(0)
+    with torch.no_grad(), stage_timer("classify"):
+        probs = memory.run_batched(forward, samples, batch_size,
+                                   samples[0][0].numel(), device)
+    return torch.cat(probs)
+
+
+def predict_probabilities(texts, config, model, tokenizer=None, batch_size=1):
+    """texts: 每篇文章一個段落 list；回傳 softmax 機率 [len(texts), C]"""
+    device = backends.model_device(model)
+    tokenizer = tokenizer or BertTokenizer.from_pretrained(config['data']['tokenizer_name'])
+    with stage_timer("tokenize"):
+        ds = InferenceDataset(texts, tokenizer,
+                              max_length=config['data']['max_length'],
+                              max_paragraphs=config['data']['max_paragraphs'],
+                              stride=config['data'].get('stride',128))
+    return classify_samples(ds.samples, model, device, batch_size)
+
+
+def predict_classification(texts, config, model, id2label, tokenizer=None, batch_size=1):
+    if not texts:
+        return []
+    probs = predict_probabilities(texts, config, model, tokenizer, batch_size)
+    return [id2label.get(i,"Unknown") for i in torch.argmax(probs, dim=1).tolist()]
 
 
 def ner_inference(paragraphs):
     """
     Return True if any paragraph contains a 'variant' entity.
     """
-    for para in paragraphs:
-        for ent in ner_pipe(para):
-            if ent.get("entity_group","").lower()=="variant":
-                return True
+    with stage_timer("ner"):
+        for para in paragraphs:
+            for ent in ner_pipe(para):
+                if ent.get("entity_group","").lower()=="variant":
+                    return True
     return False
\ No newline at end of file
@@ -0,0 +1,175 @@
+# pubtator/profiling.py
+"""
+Opt-in profiling of a single heavy request.
+
+A request is profiled when PT_PROFILE_ALL=1, or when it carries the admin
+token (PT_PROFILE_TOKEN) in the X-Profile-Token header or, for EventSource
+clients that cannot set headers, the profile_token query parameter.  Only
+one request per process is profiled at a time.  The session lives in a
+context variable of the profiled request, and ProfileSession.run() carries
+it into LIME workers, so stage_timer() in other, concurrent requests never
+records into it.  The bundle files are served only to requests carrying the
+same token.
+
+Each profiled request writes a bundle to PROFILE_DIR/<trace_id>/:
+  timeline.json    pipeline stages (from metrics.stage_timer) with start/end
+  python.pstats    cProfile of the request thread + LIME workers
+                   (open with `snakeviz python.pstats` for a flame view)
+  python_top.txt   top functions by cumulative time
+  torch_trace.json torch.profiler Chrome trace (chrome://tracing, Perfetto)
+  torch_ops.txt    operator-level model timings
+  meta.json        route, parameters and total duration
+"""
+
+import os
+import io
+import json
+import time
+import hmac
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+import contextvars
+from datetime import datetime
+
+import torch
+
+from .config import PROFILE_DIR, PROFILE_ALL, PROFILE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+_active = None            # the one session running in this process, if any
+_active_lock = threading.Lock()
+# session of the request (or LIME task) running in this context
+_current = contextvars.ContextVar("pubtator_profile_session", default=None)
+
+
+def authorized(req):
+    """Does this Flask request carry PT_PROFILE_TOKEN?"""
+    if not PROFILE_TOKEN:
+        return False
+    token = req.headers.get("X-Profile-Token") or req.args.get("profile_token") or ""
+    # bytes: compare_digest rejects non-ASCII str
+    return hmac.compare_digest(token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def requested(req):
+    """Should this Flask request be profiled?"""
+    return PROFILE_ALL or authorized(req)
+
+
+class ProfileSession:
+    def __init__(self, route, params=None):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.trace_id = f"{stamp}-{uuid.uuid4().hex[:8]}"
+        self.route = route
+        self.params = params or {}
+        self.out_dir = os.path.join(PROFILE_DIR, self.trace_id)
+        self._stages = []
+        self._worker_profiles = []
+        self._lock = threading.Lock()
+        self._profile = cProfile.Profile()
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._torch = torch.profiler.profile(activities=activities, record_shapes=True)
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._torch.__enter__()
+        self._profile.enable()
+
+    def record_stage(self, stage, start, end):
+        with self._lock:
+            self._stages.append({
+                "stage":  stage,
+                "thread": threading.current_thread().name,
+                "start":  round(start - self._t0, 6),
+                "end":    round(end - self._t0, 6),
+            })
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn in a worker thread as part of this session, under its own cProfile."""
+        token = _current.set(self)
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            _current.reset(token)
+            with self._lock:
+                self._worker_profiles.append(prof)
+
+    def stop(self):
+        """Stop profiling and write the bundle; returns the trace id."""
+        self._profile.disable()
+        self._torch.__exit__(None, None, None)
+        total = time.perf_counter() - self._t0
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for prof in self._worker_profiles:
+                stats.add(prof)
+            stages = sorted(self._stages, key=lambda s: s["start"])
+        stats.dump_stats(os.path.join(self.out_dir, "python.pstats"))
+        buf = io.StringIO()
+        pstats.Stats(os.path.join(self.out_dir, "python.pstats"), stream=buf) \
+            .sort_stats("cumulative").print_stats(60)
+        with open(os.path.join(self.out_dir, "python_top.txt"), "w") as f:
+            f.write(buf.getvalue())
+
+        self._torch.export_chrome_trace(os.path.join(self.out_dir, "torch_trace.json"))
+        sort_key = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        with open(os.path.join(self.out_dir, "torch_ops.txt"), "w") as f:
+            f.write(self._torch.key_averages().table(sort_by=sort_key, row_limit=50))
+
+        with open(os.path.join(self.out_dir, "timeline.json"), "w") as f:
+            json.dump(stages, f, indent=2)
+        with open(os.path.join(self.out_dir, "meta.json"), "w") as f:
+            json.dump({"trace_id": self.trace_id, "route": self.route,
+                       "params": self.params, "total_seconds": round(total, 6)},
+                      f, indent=2)
+        logger.info(f"Profile bundle written to {self.out_dir}")
+        return self.trace_id
+
+
+def begin(route, params=None):
+    """
+    Start a session for the calling request, or return None if another
+    request is being profiled.
+    """
+    global _active
+    with _active_lock:
+        if _active is not None:
+            logger.warning("A profiled request is already running; skipping profiling")
+            return None
+        session = _active = ProfileSession(route, params)
+    session.start()
+    session._token = _current.set(session)
+    return session
+
+
+def end(session):
+    """Finish a session from begin(); returns the trace id (None on failure)."""
+    global _active
+    try:
+        return session.stop()
+    except Exception:
+        logger.exception("Failed to write profile bundle")
+        return None
+    finally:
+        try:
+            _current.reset(session._token)
+        except ValueError:   # ended from another context
+            _current.set(None)
+        with _active_lock:
+            _active = None
+
+
+def current():
+    """Session of the calling request or LIME task, or None."""
+    return _current.get()
@@ -1,64 +1,113 @@
 # pubtator_inference/pub_inference.py
 
 from .fetch_utils import fetch_pmid_data, fetch_full_text_via_api
-from .parser_utils import parse_biocxml, sanitize_filename
-from .file_utils import ensure_dir_exists, load_all_pmids, save_all_pmids, save_variant_data
+from .parser_utils import parse_biocxml
+from .variant_norm import canonical_variant, variant_key
+from .file_utils import ensure_dir_exists, load_all_pmids, save_all_pmids, save_variant_data, variant_data_path
+from .sentence_seg import save_segmentation
+from .config import SENT_CACHE_PERSIST, LOCAL_INDEX
+from .local_index import get_index
+from .metrics import stage_timer
 import os
+import threading
 
-def do_inference_for_variant(variant, base_output_dir, pmid_list_file):
-    """
-    給定一個 variant (e.g. 'c.3578G>A')，會：
-      1) 用 PubTator 搜尋 pmid_list
-      2) 讀取/更新 pmid_list_file (保存所有 variant->pmid_list 的紀錄)
-      3) 逐篇 pmid 解析 BioC XML
-      4) 存成一個 {pmid: {...}} 的 JSON 到 base_output_dir/<variant>.json
-      5) 若同一次執行出現重複 PMIDs，不會重複下載
+# pmid_list.json 是「讀 → 改 → 寫」，同一 process 內多個執行緒 (app / batch) 要排隊
+_pmid_list_lock = threading.Lock()
+
+def fetch_article(pmid):
+    """抓一篇 PMID 的 BioC XML 並解析，回傳 {pmid: {...}}（抓不到或無內容則為 {}）"""
+    with stage_timer("pubtator_fetch"):
+        xml_data = fetch_full_text_via_api(pmid)
+    with stage_timer("xml_parse"):
+        return parse_biocxml(xml_data, pmid) if xml_data else {}
 
-    回傳: (variant_data, output_file_path)
-    """
 
-    # 讀取/初始化 all_pmids
-    all_pmids = load_all_pmids(pmid_list_file)
+def iter_inference_for_variant(variant, base_output_dir, pmid_list_file, fetch=fetch_article):
+    """
+    do_inference_for_variant 的 generator 版本，邊抓邊回報進度：
+      {"stage": "search",  "total": N}
+      {"stage": "fetch",   "done": i, "total": N, "pmid": pmid, "article": {...} or None}
+      {"stage": "done",    "variant_data": {...}, "output_file": path or None}
+    最後一個事件一定是 "done"。
+    variant 會先正規化 (canonical_variant)，等價寫法共用同一份快取與 pmid_list 紀錄。
+    fetch(pmid) 預設為 fetch_article；批次 API 會換成跨 variant 共用、同一 PMID 只抓一次的版本。
+    """
+    variant = canonical_variant(variant)
 
     # 取得指定 variant 的 pmid_list
-    pmid_list = fetch_pmid_data(variant)
+    with stage_timer("pubtator_search"):
+        pmid_list = fetch_pmid_data(variant)
     if not pmid_list:
         print(f"variant {variant} 未找到任何PMID資料。")
-        return {}, None
+        yield {"stage": "search", "total": 0}
+        yield {"stage": "done", "variant_data": {}, "output_file": None}
+        return
 
-    # 更新全域的 all_pmids
-    all_pmids[variant] = pmid_list
-    save_all_pmids(all_pmids, pmid_list_file)
+    # 更新全域的 all_pmids (讀取/初始化後立即寫回)
+    with _pmid_list_lock:
+        all_pmids = load_all_pmids(pmid_list_file)
+        all_pmids[variant] = pmid_list
+        save_all_pmids(all_pmids, pmid_list_file)
     print(f"variant {variant} 的PMID數據已保存到 {pmid_list_file}")
+    yield {"stage": "search", "total": len(pmid_list)}
 
     # 開始抓取並解析
     variant_data = {}
     already_fetched_pmids = set()  # 本次執行中已經下載過的PMID
 
-    for pmid in pmid_list:
+    for i, pmid in enumerate(pmid_list, start=1):
         if pmid in already_fetched_pmids:
             print(f"PMID {pmid} 已經下載過，跳過重複下載。")
             continue
 
         print(f"正在查詢PMID: {pmid} 的全文資料...")
-        xml_data = fetch_full_text_via_api(pmid)
-        if xml_data:
-            parsed_obj = parse_biocxml(xml_data, pmid)
-            if parsed_obj:
-                variant_data.update(parsed_obj)
+        parsed_obj = fetch(pmid)
+        if parsed_obj:
+            variant_data.update(parsed_obj)
 
         already_fetched_pmids.add(pmid)
+        yield {"stage": "fetch", "done": i, "total": len(pmid_list),
+               "pmid": pmid, "article": parsed_obj.get(pmid)}
 
     # 寫檔
     if variant_data:
-        safe_variant_name = sanitize_filename(variant)
+        safe_variant_name = variant_key(variant)
         ensure_dir_exists(base_output_dir)
-        output_file = os.path.join(base_output_dir, f"{safe_variant_name}.json")
-        save_variant_data(variant_data, output_file)
+        output_file = variant_data_path(base_output_dir, safe_variant_name)
+        with stage_timer("save"):
+            save_variant_data(variant_data, output_file)
         print(f"variant {variant} 的全文數據已保存到 {output_file}")
-        return variant_data, output_file
+        if SENT_CACHE_PERSIST:
+            # 順便把分句結果存在旁邊，之後 LIME 不用再切句
+            try:
+                save_segmentation(variant_data, output_file)
+            except Exception as e:
+                print(f"variant {variant} 分句快取寫入失敗: {e}")
+        if LOCAL_INDEX:
+            # 本地全文索引同步更新，之後 local-first / offline 查得到
+            try:
+                st = os.stat(output_file)
+                get_index().add_variant_data(safe_variant_name, variant_data,
+                                             st.st_mtime, st.st_size)
+            except Exception as e:
+                print(f"variant {variant} 本地索引更新失敗: {e}")
+        yield {"stage": "done", "variant_data": variant_data, "output_file": output_file}
     else:
         print(f"variant {variant} 沒有任何文章符合指定段落。")
-        return {}, None
+        yield {"stage": "done", "variant_data": {}, "output_file": None}
+
 
+def do_inference_for_variant(variant, base_output_dir, pmid_list_file):
+    """
+    給定一個 variant (e.g. 'c.3578G>A')，會：
+      1) 用 PubTator 搜尋 pmid_list
+      2) 讀取/更新 pmid_list_file (保存所有 variant->pmid_list 的紀錄)
+      3) 逐篇 pmid 解析 BioC XML
+      4) 存成一個 {pmid: {...}} 到 base_output_dir/<variant>.json (或 STORAGE_FORMAT 指定的格式)
+      5) 若同一次執行出現重複 PMIDs，不會重複下載
 
+    回傳: (variant_data, output_file_path)
+    """
+    for event in iter_inference_for_variant(variant, base_output_dir, pmid_list_file):
+        pass
+    return event["variant_data"], event["output_file"]
@@ -0,0 +1,187 @@
+# pubtator/sentence_seg.py
+"""
+Cached sentence segmentation for the LIME explainer.
+
+The punkt model is loaded once from local NLTK data (PT_NLTK_DATA_DIR first,
+then NLTK's default search path) and never downloaded at runtime; if it is
+missing we fall back to a simple regex splitter so the app still boots
+offline.  Results are memoized as sentence offsets by (segmenter, paragraph
+hash) and punkt results can be persisted next to a variant's full-text file
+as ``<variant>.sentences.json``:
+
+    {"segmenter": "punkt_tab/english@nltk-3.9.1",
+     "spans": {"<sha1 of paragraph>": [[0, 42], [43, 97]], ...}}
+
+A sidecar written by a different segmenter (another punkt model, or the
+regex fallback) is ignored, and fallback output is never written.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import nltk
+from .config import NLTK_DATA_DIR, SENT_CACHE_SIZE
+from .metrics import cache_result
+from .file_utils import variant_stem, SIDECAR_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+_tokenizer = None
+_segmenter = None         # identity of _tokenizer, part of every cache key
+_tokenizer_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# fallback: split after . ! ? followed by whitespace and an upper-case/digit start
+_FALLBACK_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[])")
+FALLBACK_SEGMENTER = "regex"
+
+
+def _fallback_spans(text):
+    start = 0
+    for m in _FALLBACK_SPLIT.finditer(text):
+        if text[start:m.start()].strip():
+            yield start, m.start()
+        start = m.end()
+    if text[start:].strip():
+        yield start, len(text)
+
+
+def _load_tokenizer():
+    """(segmenter identity, text → [(start, end)])"""
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    try:
+        from nltk.tokenize.punkt import PunktTokenizer  # nltk >= 3.8.2 (punkt_tab)
+        return f"punkt_tab/english@nltk-{nltk.__version__}", PunktTokenizer("english").span_tokenize
+    except (ImportError, LookupError, OSError):
+        pass
+    try:
+        punkt = nltk.data.load("tokenizers/punkt/english.pickle")
+        return f"punkt/english@nltk-{nltk.__version__}", punkt.span_tokenize
+    except (LookupError, OSError):
+        logger.warning("NLTK punkt data not found locally, using regex sentence splitter")
+        return FALLBACK_SEGMENTER, _fallback_spans
+
+
+def get_sentence_tokenizer():
+    """Load the punkt tokenizer once per process (no network); text → [(start, end)]."""
+    global _tokenizer, _segmenter
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _segmenter, _tokenizer = _load_tokenizer()
+    return _tokenizer
+
+
+def segmenter_id() -> str:
+    """Which segmenter this process uses, e.g. "punkt_tab/english@nltk-3.9.1" or "regex"."""
+    get_sentence_tokenizer()
+    return _segmenter
+
+
+def paragraph_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        sents = _cache.get(key)
+        if sents is not None:
+            _cache.move_to_end(key)
+        return sents
+
+
+def _cache_put(key, sents):
+    with _cache_lock:
+        _cache[key] = sents
+        _cache.move_to_end(key)
+        while len(_cache) > SENT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def segment(text: str) -> List[str]:
+    """Split one paragraph into sentences, memoized by paragraph hash."""
+    return segment_batch([text])[0]
+
+
+def segment_spans(paragraphs: List[str]) -> List[List[Tuple[int, int]]]:
+    """Sentence offsets of every paragraph; only cache misses are tokenized."""
+    span_tokenize = get_sentence_tokenizer()
+    out = []
+    for text in paragraphs:
+        key = (_segmenter, paragraph_key(text))
+        spans = _cache_get(key)
+        cache_result("segmentation", spans is not None)
+        if spans is None:
+            spans = [tuple(span) for span in span_tokenize(text)]
+            _cache_put(key, spans)
+        out.append(spans)
+    return out
+
+
+def segment_batch(paragraphs: List[str]) -> List[List[str]]:
+    """Segment all paragraphs of a request at once; only cache misses are tokenized."""
+    return [[text[start:end] for start, end in spans]
+            for text, spans in zip(paragraphs, segment_spans(paragraphs))]
+
+
+# ─── persistence next to the full-text store ─────────────────
+def sidecar_path(variant_file: str) -> str:
+    """PubTator3_data/full_text/<v>.json (or .msgpack.zst) → .../<v>.sentences.json"""
+    stem = variant_stem(os.path.basename(variant_file)) or \
+        os.path.splitext(os.path.basename(variant_file))[0]
+    return os.path.join(os.path.dirname(variant_file), stem + SIDECAR_SUFFIX)
+
+
+def article_paragraphs(variant_data: dict) -> List[str]:
+    """Every stripped, non-empty line the app may feed to LIME."""
+    paras = []
+    for content in variant_data.values():
+        for section, text in content.items():
+            if section.lower() in ("title", "pubmed_link") or not text:
+                continue
+            paras.extend(line.strip() for line in text.split("\n") if line.strip())
+    return paras
+
+
+def save_segmentation(variant_data: dict, variant_file: str) -> Dict[str, list]:
+    """
+    Segment every paragraph of a variant and write the sidecar file.
+    Nothing is written when only the regex fallback is available.
+    """
+    paras = article_paragraphs(variant_data)
+    spans = segment_spans(paras)
+    if _segmenter == FALLBACK_SEGMENTER:
+        return {}
+    seg = {paragraph_key(p): [list(span) for span in s] for p, s in zip(paras, spans)}
+    with open(sidecar_path(variant_file), "w", encoding="utf-8") as f:
+        json.dump({"segmenter": _segmenter, "spans": seg}, f)
+    return seg
+
+
+def preload_segmentation(variant_file: str) -> int:
+    """Warm the in-memory cache from a variant's sidecar, if it exists and matches our segmenter."""
+    path = sidecar_path(variant_file)
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        logger.exception(f"Failed to read segmentation sidecar {path}")
+        return 0
+    segmenter = segmenter_id()
+    if not isinstance(data, dict) or data.get("segmenter") != segmenter:
+        logger.debug(f"Ignoring segmentation sidecar {path} (not written by {segmenter})")
+        return 0
+    seg = data.get("spans") or {}
+    for key, spans in seg.items():
+        _cache_put((segmenter, key), [tuple(span) for span in spans])
+    return len(seg)
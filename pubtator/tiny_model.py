@@ -0,0 +1,150 @@
+# pubtator/tiny_model.py
+"""
+Build a small, randomly initialized classifier checkpoint (and NER pipeline)
+entirely offline, laid out exactly like a real training output so the
+normal code paths (setup_inference, predict_classification, LIME) can run
+without network access or a GPU.  Used by the benchmark and regression tools.
+
+    python -m pubtator.tiny_model --out outputs/tiny_test
+"""
+
+import os
+import re
+import argparse
+from collections import Counter
+
+import torch
+import yaml
+from transformers import BertConfig, BertModel, BertTokenizer, BertForTokenClassification, pipeline
+
+from .model import BioMedBERTClassifier
+
+_SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+_NER_LABELS = ["O", "B-Gene", "I-Gene", "B-Disease", "I-Disease", "B-Variant", "I-Variant"]
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+SPLIT_DATA_DIR = os.path.join(_PROJECT_ROOT, "data", "split")
+
+
+def build_vocab(texts, max_words=4000):
+    """WordPiece vocab: special tokens, every character (+ ## form) and frequent words."""
+    chars, words = set(), Counter()
+    for t in texts:
+        t = t.lower()
+        chars.update(t)
+        words.update(re.findall(r"[a-z]+|\d+", t))
+    chars = sorted(c for c in chars if not c.isspace())
+    vocab = list(_SPECIAL_TOKENS)
+    vocab += chars + ["##" + c for c in chars]
+    vocab += [w for w, _ in words.most_common(max_words) if len(w) > 1]
+    seen, out = set(), []
+    for tok in vocab:
+        if tok not in seen:
+            seen.add(tok)
+            out.append(tok)
+    return out
+
+
+def build_tiny_checkpoint(out_dir, texts, seed=0, hidden_size=64, num_layers=2,
+                          num_heads=2, max_length=128, max_paragraphs=4):
+    """
+    Write tokenizer/, bert/, best_model.pt and config.yaml under out_dir and
+    return the config.yaml path (usable as PT_CLASSIFIER_CONFIG).
+    """
+    torch.manual_seed(seed)
+    tok_dir = os.path.join(out_dir, "tokenizer")
+    bert_dir = os.path.join(out_dir, "bert")
+    os.makedirs(tok_dir, exist_ok=True)
+    os.makedirs(bert_dir, exist_ok=True)
+
+    vocab_file = os.path.join(tok_dir, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(build_vocab(texts)) + "\n")
+    tokenizer = BertTokenizer(vocab_file, do_lower_case=True)
+    tokenizer.save_pretrained(tok_dir)
+
+    bert_cfg = BertConfig(
+        vocab_size=len(tokenizer.vocab),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=max(512, max_length),
+    )
+    BertModel(bert_cfg).save_pretrained(bert_dir)
+
+    transformer = {"hidden_size": hidden_size * 2, "num_heads": num_heads, "num_layers": 1}
+    model = BioMedBERTClassifier(
+        pretrained_model_name_or_path=bert_dir,
+        num_labels=2,
+        dropout_rate=0.1,
+        transformer_config=transformer,
+        use_transformer=True,
+    )
+    model_path = os.path.join(out_dir, "best_model.pt")
+    torch.save(model.state_dict(), model_path)
+
+    config = {
+        "paths": {
+            "split_data_dir":  SPLIT_DATA_DIR,
+            "best_model_path": model_path,
+        },
+        "data": {
+            "tokenizer_name": tok_dir,
+            "max_length":     max_length,
+            "max_paragraphs": max_paragraphs,
+            "stride":         max_length // 2,
+        },
+        "model": {
+            "type":                          "BioMedBERTClassifier",
+            "pretrained_model_name_or_path": bert_dir,
+            "num_labels":                    2,
+            "dropout_rate":                  0.1,
+            "use_transformer":               True,
+        },
+        "transformer": transformer,
+    }
+    config_path = os.path.join(out_dir, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return config_path
+
+
+def build_tiny_ner_pipe(tokenizer_dir, seed=0, hidden_size=64):
+    """Randomly initialized token-classification pipeline on CPU (stand-in for outputs/ner_weight)."""
+    torch.manual_seed(seed)
+    tokenizer = BertTokenizer.from_pretrained(tokenizer_dir)
+    cfg = BertConfig(
+        vocab_size=len(tokenizer.vocab),
+        hidden_size=hidden_size,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=hidden_size * 2,
+        num_labels=len(_NER_LABELS),
+        id2label=dict(enumerate(_NER_LABELS)),
+        label2id={l: i for i, l in enumerate(_NER_LABELS)},
+    )
+    model = BertForTokenClassification(cfg).eval()
+    return pipeline("token-classification", model=model, tokenizer=tokenizer,
+                    aggregation_strategy="simple", device=-1)
+
+
+def corpus_texts(fulltext_dir):
+    """All section texts of the stored corpus (for building the vocab)."""
+    from .file_utils import load_variant_files
+    texts = []
+    for _variant, data in load_variant_files(fulltext_dir):
+        for content in data.values():
+            texts.extend(v for k, v in content.items() if k != "PubMed_Link" and v)
+    return texts
+
+
+if __name__ == "__main__":
+    from .config import FULLTEXT_DIR
+    ap = argparse.ArgumentParser(description="Build a tiny offline classifier checkpoint")
+    ap.add_argument("--out", default="outputs/tiny_test")
+    ap.add_argument("--data-dir", default=FULLTEXT_DIR)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    path = build_tiny_checkpoint(args.out, corpus_texts(args.data_dir), seed=args.seed)
+    print(f"Tiny checkpoint written, use PT_CLASSIFIER_CONFIG={path}")
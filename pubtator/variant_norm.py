@@ -0,0 +1,422 @@
+# pubtator/variant_norm.py
+"""
+Normalization of HGVS-style variant notations into one canonical cache key.
+
+    canonical_variant("MSH6 p.Arg911X")   → "MSH6 p.Arg911Ter"
+    canonical_variant("msh6  p.(R911*)")  → "MSH6 p.Arg911Ter"
+    canonical_variant("c.608T>C BPES")    → "c.608T>C"
+    canonical_variant(" C.1118c>t ")      → "c.1118C>T"
+    canonical_variant("ivs46+1g>a")       → "IVS46+1G>A"
+    canonical_variant("nm_000249.3:c.1852_1853delaainsgc")
+                                          → "NM_000249.3:c.1852_1853delAAinsGC"
+
+Rules:
+  * protein (p.)  three-letter amino acids, one-letter codes and Ter/X/*
+                  all map to the three-letter form ("p.Arg911Ter")
+  * DNA (c./g./n./m.) and IVS notations: fixed prefix case, upper-case
+                  nucleotides, lower-case del/ins/dup/inv, no inner spaces
+  * a gene symbol right before the notation ("MSH6 p...", "MSH6:c...") is
+                  kept, upper-cased; words after the notation are dropped
+  * a reference-sequence accession before the notation ("NM_000249.3:c...",
+                  "NM_000249.3(MLH1):c...") is kept as "ACCESSION:notation",
+                  since c./n. positions only mean something on that transcript
+Anything that does not parse — including a reference prefix that is neither
+a gene nor a known accession ("chr3:g...") — is returned as typed, with its
+whitespace collapsed.
+
+variant_key() is the file-name key (sanitize_filename of the canonical
+form).  Files stored under older, raw keys keep resolving through the alias
+table (variant_aliases.json next to the full_text directory: canonical key →
+legacy file stems), which is rebuilt from the store when missing.  To fold the legacy files
+into their canonical ones for good:
+
+    python -m pubtator.variant_norm migrate            # show what would change
+    python -m pubtator.variant_norm migrate --apply    # merge files + pmid_list.json
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+import threading
+
+from .config import FULLTEXT_DIR, PMID_LIST_FILE
+from .parser_utils import sanitize_filename
+from .file_utils import (variant_stem, find_variant_file, load_variant_data,
+                         save_variant_data, variant_data_path, load_all_pmids,
+                         save_all_pmids, atomic_write, SIDECAR_SUFFIX)
+
+logger = logging.getLogger(__name__)
+
+
+def alias_file_for(base_dir):
+    """Alias table of a data directory: <data>/variant_aliases.json for <data>/full_text."""
+    return os.path.join(os.path.dirname(os.path.normpath(base_dir)), "variant_aliases.json")
+
+
+ALIAS_FILE = alias_file_for(FULLTEXT_DIR)
+
+_AA3 = {
+    "Ala": "A", "Arg": "R", "Asn": "N", "Asp": "D", "Cys": "C", "Gln": "Q",
+    "Glu": "E", "Gly": "G", "His": "H", "Ile": "I", "Leu": "L", "Lys": "K",
+    "Met": "M", "Phe": "F", "Pro": "P", "Ser": "S", "Thr": "T", "Trp": "W",
+    "Tyr": "Y", "Val": "V", "Sec": "U", "Pyl": "O", "Ter": "*",
+}
+_AA1 = {one: three for three, one in _AA3.items()}
+_AA1["X"] = "Ter"
+_AA3_LOWER = {k.lower(): k for k in _AA3}
+
+_AA_TOKEN = r"(?:[A-Za-z]{3}|[A-Z*])"
+_PROTEIN_RE = re.compile(
+    rf"^p\.\(?(?P<ref>{_AA_TOKEN})(?P<pos>\d+)(?P<alt>{_AA_TOKEN}|=)?(?P<rest>[^)]*)\)?$")
+_DNA_RE = re.compile(r"^(?P<prefix>[cgnm])\.(?P<body>[-+*\d_?()]+.*)$", re.IGNORECASE)
+_IVS_RE = re.compile(r"^ivs(?P<body>[-+\d]+.*)$", re.IGNORECASE)
+# "MSH6", "msh6", "FOXL2", "ATM" — but not "variant" or "The"
+_GENE_RE = re.compile(r"^(?:(?=.*\d)[A-Za-z][A-Za-z0-9-]*|[A-Z][A-Z0-9-]+)$")
+# "NM_000249.3", "NM_000249.3(MLH1)", "ENST00000231790.8", "LRG_216t1"
+_ACCESSION_RE = re.compile(
+    r"^(?P<acc>(?:N[CGMPRTW]|X[MPR])_\d+(?:\.\d+)?|ENS[TGP]?\d+(?:\.\d+)?|LRG_\d+(?:[tp]\d+)?)"
+    r"(?:\((?P<gene>[A-Za-z0-9-]+)\))?$", re.IGNORECASE)
+# reference-like tokens _ACCESSION_RE doesn't take: "chr3", "NM000249", "NM_000249.x"
+_REF_LIKE_RE = re.compile(r"^(?:chr[0-9XYM]|(?:N[CGMPRTW]|X[MPR])_?\d|ENS[TGP]?\d|LRG_)", re.IGNORECASE)
+_NOTATION_START = re.compile(r"^(?:[pcgnm]\.|ivs\d)", re.IGNORECASE)
+_EDIT_WORDS = re.compile(r"(del|ins|dup|inv|fs|ext)", re.IGNORECASE)
+
+
+def _aa3(token):
+    """'Arg' / 'arg' / 'R' / 'X' / '*' → 'Arg' / 'Ter'; None if unknown."""
+    if token == "*":
+        return "Ter"
+    if len(token) == 3:
+        return _AA3_LOWER.get(token.lower())
+    return _AA1.get(token)
+
+
+def _canonical_protein(text):
+    m = _PROTEIN_RE.match(text)
+    if not m:
+        return None
+    ref = _aa3(m.group("ref"))
+    if ref is None:
+        return None
+    alt, rest = m.group("alt"), m.group("rest")
+    if alt and alt != "=":
+        if _aa3(alt) is None:
+            # "p.Leu100del": the three letters are an edit, not an amino acid
+            alt, rest = None, alt + rest
+        else:
+            alt = _aa3(alt)
+    # trailing "fsTer5" / "fs*5" / "fsX5": normalize the stop codon too
+    rest = re.sub(r"(?i)fs(?:ter|x|\*)", "fsTer", rest)
+    return f"p.{ref}{m.group('pos')}{alt or ''}{rest}"
+
+
+def _canonical_dna_body(body):
+    body = re.sub(r"\s+", "", body)
+    body = _EDIT_WORDS.sub(lambda w: w.group(1).lower(), body)
+    # nucleotides upper-case, edit words stay lower-case
+    return "".join(part if _EDIT_WORDS.fullmatch(part) else part.upper()
+                   for part in _EDIT_WORDS.split(body))
+
+
+def _canonical_notation(text):
+    if text[:2].lower() == "p.":
+        return _canonical_protein("p." + text[2:])
+    m = _DNA_RE.match(text)
+    if m:
+        return f"{m.group('prefix').lower()}.{_canonical_dna_body(m.group('body'))}"
+    m = _IVS_RE.match(text)
+    if m:
+        return f"IVS{_canonical_dna_body(m.group('body'))}"
+    return None
+
+
+def _canonical_accession(token):
+    """'nm_000249.3(mlh1)' → 'NM_000249.3(MLH1)'; None if not an accession."""
+    m = _ACCESSION_RE.match(token)
+    if not m:
+        return None
+    acc = m.group("acc").upper()
+    if acc.startswith("LRG_"):
+        acc = "LRG_" + acc[4:].lower()   # "LRG_216t1"
+    return f"{acc}({m.group('gene').upper()})" if m.group("gene") else acc
+
+
+def _prefix(token, attached):
+    """
+    (prefix, ok) for the token before a notation: a gene symbol or an
+    accession → (prefix, True); an ordinary word → (None, True); a
+    reference-like prefix that is neither ("chr3:", "NM000249:") → (None, False).
+    """
+    acc = _canonical_accession(token)
+    if acc:
+        return acc, True
+    if _REF_LIKE_RE.match(token):
+        return None, False
+    if _GENE_RE.match(token):
+        return token.upper(), True
+    if attached or (re.search(r"[_.()]", token) and re.search(r"\d", token)):
+        return None, False
+    return None, True
+
+
+def split_variant(text):
+    """
+    (gene or accession or None, canonical notation) — (None, None) if no
+    notation is found or the prefix before it can't be parsed.
+    """
+    text = re.sub(r"\s+", " ", (text or "").strip())
+    # "c. 608T > C" → "c.608T>C"
+    text = re.sub(r"(?i)\b([pcgnm])\.\s+", r"\1.", text)
+    text = re.sub(r"\s*>\s*", ">", text)
+    # "MSH6:c.2731C>T" → "MSH6", "c.2731C>T" (remembering the prefix was attached)
+    tokens, attached = [], set()
+    for tok in text.split(" "):
+        m = re.match(r"^(?P<ref>\S+?):(?P<notation>(?:[pcgnm]\.|ivs\d).*)$", tok, re.IGNORECASE)
+        if m:
+            tokens.append(m.group("ref"))
+            attached.add(len(tokens))
+            tok = m.group("notation")
+        tokens.append(tok)
+    for i, tok in enumerate(tokens):
+        if not _NOTATION_START.match(tok):
+            continue
+        # IVS notations are sometimes written with spaces: "IVS46 + 1 G>A"
+        parts = [tok]
+        if tok.lower().startswith("ivs"):
+            for nxt in tokens[i + 1:]:
+                if re.search(r"(?i)>|del|ins|dup", parts[-1]):
+                    break
+                parts.append(nxt)
+        candidate = "".join(parts)
+        notation = _canonical_notation(candidate)
+        if notation is None and candidate != tok:
+            notation = _canonical_notation(tok)
+        if notation is None:
+            continue
+        if i == 0:
+            return None, notation
+        prefix, ok = _prefix(tokens[i - 1], i in attached)
+        return (prefix, notation) if ok else (None, None)
+    return None, None
+
+
+def canonical_variant(text):
+    """Canonical spelling of a variant query (see module docstring)."""
+    prefix, notation = split_variant(text)
+    if notation is None:
+        return re.sub(r"\s+", " ", (text or "").strip())
+    if prefix is None:
+        return notation
+    return f"{prefix}:{notation}" if _ACCESSION_RE.match(prefix) else f"{prefix} {notation}"
+
+
+def variant_key(text):
+    """File-name / cache key for a variant query."""
+    return sanitize_filename(canonical_variant(text))
+
+
+# ─── paragraph matching ───────────────────────────────────
+def _aa_alternatives(aa3):
+    if aa3 == "Ter":
+        return r"(?:Ter|X|\*)"
+    return f"(?:{aa3}|{_AA3[aa3]})"
+
+
+def _variant_pattern(text):
+    gene, notation = split_variant(text)
+    if notation is None:
+        return re.compile(re.escape(re.sub(r"\s+", " ", (text or "").strip())))
+    if notation.startswith("p."):
+        m = re.match(rf"^p\.(?P<ref>[A-Z][a-z]{{2}})(?P<pos>\d+)(?P<alt>[A-Z][a-z]{{2}}|=)?(?P<rest>.*)$",
+                     notation)
+        alt = m.group("alt")
+        alt_re = "" if not alt else ("=" if alt == "=" else _aa_alternatives(alt))
+        rest = re.escape(m.group("rest")).replace("Ter", r"(?:Ter|X|\*)")
+        body = (rf"p\.\(?{_aa_alternatives(m.group('ref'))}{m.group('pos')}"
+                rf"{alt_re}{rest}\)?")
+        if rest or alt_re:
+            body += r"(?![A-Za-z0-9*])"
+        else:
+            body += r"(?!\d)"
+    else:
+        body = re.escape(notation).replace(">", r"\s*>\s*")
+        body = r"(?<![\w.])" + body + r"(?![\w>])"
+    if gene:
+        # "NM_000249.3(MLH1)" also matches "NM_000249.3:c…" in running text
+        ref = re.escape(gene)
+        acc = _ACCESSION_RE.match(gene)
+        if acc and acc.group("gene"):
+            ref = rf"{re.escape(acc.group('acc'))}(?:\({re.escape(acc.group('gene'))}\))?"
+        body = rf"\b{ref}[\s:]+" + body
+    return re.compile(body, re.IGNORECASE if not notation.startswith("p.") else 0)
+
+
+def core_terms(text):
+    """
+    Literal substrings of which every spelling of the variant contains at
+    least one: ["Arg911", "R911"] for p.Arg911Ter, ["c.608T"] for c.608T>C.
+    """
+    _gene, notation = split_variant(text)
+    if notation is None:
+        return [re.sub(r"\s+", " ", (text or "").strip())]
+    if notation.startswith("p."):
+        m = re.match(r"^p\.([A-Z][a-z]{2})(\d+)", notation)
+        return [f"{m.group(1)}{m.group(2)}", f"{_AA3[m.group(1)]}{m.group(2)}"]
+    return [notation.split(">")[0]]
+
+
+_pattern_cache = {}
+_pattern_lock = threading.Lock()
+
+
+def variant_pattern(text):
+    """
+    Compiled regex matching any equivalent spelling of the variant in running
+    text: p.Arg911Ter also matches p.Arg911X, p.R911*, p.(Arg911Ter) …
+    """
+    with _pattern_lock:
+        pat = _pattern_cache.get(text)
+        if pat is None:
+            pat = _pattern_cache[text] = _variant_pattern(text)
+        return pat
+
+
+# ─── alias table: canonical key → legacy file stems ─────────────
+_aliases = None
+_aliases_lock = threading.Lock()
+
+
+def _guess_raw(stem):
+    """Legacy stems are sanitized ('>' → '_'); undo that where it is unambiguous."""
+    return re.sub(r"([A-Za-z])_([A-Za-z])", r"\1>\2", stem)
+
+
+def build_alias_table(base_dir=FULLTEXT_DIR, pmid_list_file=PMID_LIST_FILE):
+    """{canonical key: [legacy stems]} for every stored file whose stem isn't canonical."""
+    raw_by_stem = {sanitize_filename(v): v for v in load_all_pmids(pmid_list_file)}
+    table = {}
+    try:
+        stems = {variant_stem(fn) for fn in os.listdir(base_dir)} - {None}
+    except FileNotFoundError:
+        stems = set()
+    for stem in sorted(stems):
+        key = variant_key(raw_by_stem.get(stem) or _guess_raw(stem))
+        if key != stem:
+            table.setdefault(key, []).append(stem)
+    return table
+
+
+def load_alias_table():
+    global _aliases
+    with _aliases_lock:
+        if _aliases is None:
+            if os.path.exists(ALIAS_FILE):
+                with open(ALIAS_FILE, encoding="utf-8") as f:
+                    _aliases = json.load(f)
+            else:
+                _aliases = build_alias_table()
+                save_alias_table(_aliases)
+        return _aliases
+
+
+def save_alias_table(table, path=ALIAS_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # other workers may be reading it (load_alias_table)
+    atomic_write(path, json.dumps(table, indent=4, ensure_ascii=False).encode("utf-8"))
+
+
+def resolve_variant_file(base_dir, variant):
+    """
+    Stored full-text file for a variant query, or None: the canonical key
+    first, then legacy stems from the alias table, then the raw query.
+    """
+    key = variant_key(variant)
+    path = find_variant_file(base_dir, key)
+    if path is not None:
+        return path
+    for stem in load_alias_table().get(key, []):
+        path = find_variant_file(base_dir, stem)
+        if path is not None:
+            return path
+    return find_variant_file(base_dir, sanitize_filename(variant))
+
+
+# ─── migration CLI ─────────────────────────────────────────
+def migrate(base_dir=FULLTEXT_DIR, pmid_list_file=None, apply=False):
+    """
+    Merge legacy files into canonical ones and re-key pmid_list.json.
+    pmid_list.json and the alias table are those of base_dir's data
+    directory unless pmid_list_file is given.
+    """
+    global _aliases
+    data_dir = os.path.dirname(os.path.normpath(base_dir))
+    if pmid_list_file is None:
+        pmid_list_file = os.path.join(data_dir, os.path.basename(PMID_LIST_FILE))
+    table = build_alias_table(base_dir, pmid_list_file)
+    for key, stems in table.items():
+        print(f"{key}  ←  {', '.join(stems)}")
+        if not apply:
+            continue
+        target = find_variant_file(base_dir, key)
+        merged = load_variant_data(target) if target else {}
+        sources = []
+        for stem in stems:
+            path = find_variant_file(base_dir, stem)
+            if path is None:
+                continue
+            for pmid, content in load_variant_data(path).items():
+                merged.setdefault(pmid, content)
+            sources.append(path)
+        save_variant_data(merged, target or variant_data_path(base_dir, key))
+        for path in sources:
+            os.remove(path)
+            sidecar = os.path.join(base_dir, variant_stem(os.path.basename(path)) + SIDECAR_SUFFIX)
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+
+    all_pmids = load_all_pmids(pmid_list_file)
+    rekeyed = {}
+    for variant, pmids in all_pmids.items():
+        merged = rekeyed.setdefault(canonical_variant(variant), [])
+        merged.extend(p for p in pmids if p not in merged)
+    if rekeyed.keys() != all_pmids.keys():
+        print(f"pmid_list.json: {len(all_pmids)} → {len(rekeyed)} variants")
+        if apply:
+            save_all_pmids(rekeyed, pmid_list_file)
+
+    if apply:
+        alias_file = alias_file_for(base_dir)
+        save_alias_table({}, alias_file)
+        if os.path.abspath(alias_file) == os.path.abspath(ALIAS_FILE):
+            with _aliases_lock:
+                _aliases = {}
+    else:
+        print("(dry run, pass --apply to write)")
+    return table
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Variant notation normalization")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_norm = sub.add_parser("normalize", help="print canonical forms")
+    p_norm.add_argument("variants", nargs="+")
+    p_mig = sub.add_parser("migrate", help="fold legacy keys into canonical ones")
+    p_mig.add_argument("--data-dir", default=FULLTEXT_DIR)
+    p_mig.add_argument("--pmid-list", default=None,
+                       help="default: pmid_list.json next to --data-dir")
+    p_mig.add_argument("--apply", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "normalize":
+        for v in args.variants:
+            print(f"{v!r:32} → {canonical_variant(v)!r}  (key {variant_key(v)!r})")
+    else:
+        migrate(args.data_dir, args.pmid_list, args.apply)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
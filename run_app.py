@@ -1,11 +1,18 @@
 # pubtator_inference/run_app.py
 
-from pubtator.app import app
+from pubtator.app import create_app
+from pubtator.asgi import create_asgi_app
+
+app = create_app()
+# same app for an ASGI server (async SSE streams, see pubtator/asgi.py)
+asgi_app = create_asgi_app(app)
 
 if __name__ == "__main__":
     app.run(debug=False, host='0.0.0.0', port=8080)
 
 # -------Linux command to run the app-------
 # gunicorn -w 4 -b 0.0.0.0:8080 run_app:app
+# -------Async serving (long SSE streams)-------
+# uvicorn run_app:asgi_app --host 0.0.0.0 --port 8080
 # -------Windows command to run the app-------
 # waitress-serve --listen=10.22.24.176:8080 run_app:app
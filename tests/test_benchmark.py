@@ -0,0 +1,44 @@
+"""
+Smoke run of pubtator.benchmark: the same stages as the CLI, on a tiny
+random model over a slice of the bundled corpus, so regressions in any hot
+path show up in `python -m pytest`.  For real numbers use the CLI:
+
+    python -m pubtator.benchmark --repeat 3 --output bench/before.json
+"""
+
+import os
+import json
+
+from pubtator import benchmark, ner_entity
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "PubTator3_data", "full_text")
+
+STAGES = ["parse_biocxml", "variant_json_load", "paragraph_extraction", "paragraph_selection",
+          "tokenization", "predict_classification", "lime", "ner_highlight_html"]
+
+
+def test_benchmark_stages(tmp_path):
+    output = tmp_path / "bench.json"
+    result = benchmark.main([
+        "--data-dir", CORPUS_DIR, "--max-variants", "2", "--max-pmids", "8",
+        "--lime-pmids", "1", "--num-samples", "10", "--repeat", "1",
+        "--threads", "1", "--output", str(output),
+    ])
+
+    assert list(result["stages"]) == STAGES
+    for name, stage in result["stages"].items():
+        assert stage["items"] > 0, name
+        assert 0 < stage["min_s"] <= stage["median_s"] <= stage["max_s"], name
+    assert result["meta"]["checkpoint"] == "tiny-random"
+    assert json.loads(output.read_text()) == result
+
+
+def test_benchmark_restores_ner_pipe(tmp_path):
+    sentinel = object()
+    ner_entity._ner_pipe = sentinel
+    try:
+        benchmark.main(["--data-dir", CORPUS_DIR, "--max-variants", "1", "--max-pmids", "2",
+                        "--lime-pmids", "1", "--num-samples", "10", "--repeat", "1"])
+        assert ner_entity._ner_pipe is sentinel
+    finally:
+        ner_entity._ner_pipe = None
@@ -0,0 +1,49 @@
+import io
+import json
+
+import pytest
+
+from pubtator.file_utils import _iter_json_object, iter_variant_data, save_variant_data
+
+
+DOCS = [
+    '{"a":1.5e10}',
+    '{"a": -12.25E-3, "b": 7}',
+    '{"a":0,"b":[1,2.5,{"c":3e2}],"d":true,"e":null,"f":"x\\u00e9y"}',
+    '{"12345": {"title": "T", "abstract": "A c.608T>C"}, "67890": {}}',
+    '{ }',
+]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 1 << 16])
+def test_iter_json_object_matches_json_loads(doc, chunk_size):
+    items = list(_iter_json_object(io.StringIO(doc), chunk_size=chunk_size))
+    assert dict(items) == json.loads(doc)
+    assert [k for k, _ in items] == list(json.loads(doc))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3])
+def test_number_cut_at_chunk_boundary(chunk_size):
+    assert list(_iter_json_object(io.StringIO('{"a":1.5e10}'), chunk_size=chunk_size)) \
+        == [("a", 1.5e10)]
+
+
+def test_truncated_document_raises():
+    with pytest.raises(ValueError):
+        list(_iter_json_object(io.StringIO('{"a": {"b": 1'), chunk_size=3))
+
+
+def test_iter_variant_data_round_trip(tmp_path):
+    data = {"1": {"title": "T1", "abstract": "p.Arg911Ter"}, "2": {"title": "T2"}}
+    path = str(tmp_path / "v.json")
+    save_variant_data(data, path)
+    assert dict(iter_variant_data(path)) == data
+
+
+def test_save_variant_data_replaces_atomically(tmp_path):
+    path = str(tmp_path / "v.json")
+    save_variant_data({"1": {"title": "old"}}, path)
+    save_variant_data({"1": {"title": "new"}}, path)
+    assert dict(iter_variant_data(path)) == {"1": {"title": "new"}}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v.json"]